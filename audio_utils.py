@@ -0,0 +1,151 @@
+import subprocess
+import numpy as np
+
+# Whisper works on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+
+def decode_audio(path, sample_rate=SAMPLE_RATE):
+    """Decode any ffmpeg-readable file to a mono float32 array at sample_rate."""
+    cmd = [
+        'ffmpeg', '-nostdin', '-threads', '0',
+        '-i', path,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate),
+        '-'
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio {path}: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def open_pcm_stream(path, start_seconds=0, sample_rate=SAMPLE_RATE):
+    """Start ffmpeg decoding path from start_seconds as 16-bit mono PCM on its stdout."""
+    cmd = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0',
+        '-ss', f"{start_seconds:.3f}", '-i', path,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate),
+        '-'
+    ]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def stream_windows(path, window_seconds, overlap_seconds, start_seconds=0, frame_seconds=0.03, sample_rate=SAMPLE_RATE):
+    """Decode audio through an ffmpeg pipe and yield it in windows of at most window_seconds.
+
+    Only about one window is held in memory at a time, however long the
+    audio. Consecutive windows overlap by up to overlap_seconds for context;
+    each window is cut at the quietest frame inside its overlap region and
+    owns the audio between the previous cut and its own. Yields dicts with
+    'audio' (float32), 'start' and 'end' (seconds of the window), and
+    'keep_from'/'keep_until' (seconds it owns; keep_until is None for the
+    last window). Decoding starts at start_seconds.
+    """
+    window = int(window_seconds * sample_rate)
+    overlap = min(int(overlap_seconds * sample_rate), window // 4)
+    half = overlap // 2
+    frame_size = max(1, int(frame_seconds * sample_rate))
+
+    keep_from = int(start_seconds * sample_rate)
+    buf_start = max(0, keep_from - half)
+    buf = np.empty(0, dtype=np.float32)
+    eof = False
+    proc = open_pcm_stream(path, buf_start / sample_rate, sample_rate)
+    try:
+        while True:
+            need = window - len(buf)
+            if need > 0 and not eof:
+                data = proc.stdout.read(need * 2)
+                eof = len(data) < need * 2
+                samples = np.frombuffer(data[:len(data) // 2 * 2], np.int16).astype(np.float32) / 32768.0
+                buf = np.concatenate([buf, samples])
+            end = buf_start + len(buf)
+            if end <= keep_from:
+                break
+            if eof:
+                yield {'audio': buf, 'start': buf_start / sample_rate, 'end': end / sample_rate,
+                       'keep_from': keep_from / sample_rate, 'keep_until': None}
+                break
+
+            # Cut at the quietest frame of the overlap region, leaving half the
+            # overlap on each side of the cut as context for both windows
+            lo = max(keep_from + 1, end - overlap) - buf_start
+            hi = end - half - buf_start
+            cut = end - half
+            if hi - lo >= frame_size:
+                energy = frame_energy(buf[lo:hi], frame_size)
+                cut = buf_start + lo + int(np.argmin(energy)) * frame_size
+            yield {'audio': buf, 'start': buf_start / sample_rate, 'end': end / sample_rate,
+                   'keep_from': keep_from / sample_rate, 'keep_until': cut / sample_rate}
+
+            keep_from = cut
+            next_start = cut - half
+            buf = buf[next_start - buf_start:].copy()
+            buf_start = next_start
+
+        if proc.wait() != 0:
+            raise RuntimeError(f"Failed to decode audio {path}: {proc.stderr.read().decode(errors='ignore')}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def probe_duration(path):
+    """Return the duration of an audio file in seconds, read from its container with ffprobe."""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        path
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        return float(out.strip())
+    except (subprocess.CalledProcessError, ValueError) as e:
+        raise RuntimeError(f"Failed to read duration of {path}") from e
+
+
+def frame_energy(audio, frame_size):
+    """Return the RMS energy of consecutive frames of frame_size samples."""
+    n_frames = len(audio) // frame_size
+    energy = np.empty(n_frames, dtype=np.float32)
+    # Work in blocks so multi-hour audio doesn't need a second full-size temporary
+    block = 100000
+    for start in range(0, n_frames, block):
+        end = min(start + block, n_frames)
+        frames = audio[start * frame_size:end * frame_size].reshape(end - start, frame_size)
+        energy[start:end] = np.sqrt(np.mean(np.square(frames), axis=1))
+    return energy
+
+
+def split_on_silence(audio, chunk_seconds, search_seconds=30, frame_seconds=0.03, sample_rate=SAMPLE_RATE):
+    """Split audio into roughly chunk_seconds pieces, cutting at the quietest nearby frame.
+
+    Each cut is placed at the lowest-energy frame within search_seconds of the
+    target position, so words are rarely split between chunks. Returns a list
+    of (start_sample, end_sample) tuples covering the whole array in order.
+    """
+    total = len(audio)
+    chunk_size = int(chunk_seconds * sample_rate)
+    if total <= chunk_size * 1.5:
+        return [(0, total)]
+
+    frame_size = max(1, int(frame_seconds * sample_rate))
+    energy = frame_energy(audio, frame_size)
+    chunk_frames = chunk_size // frame_size
+    search_frames = int(search_seconds * sample_rate) // frame_size
+
+    cuts = [0]
+    target = chunk_frames
+    # Stop once the remainder would make a short trailing chunk
+    while target + chunk_frames // 2 < len(energy):
+        lo = max(cuts[-1] // frame_size + 1, target - search_frames)
+        hi = min(len(energy), target + search_frames)
+        cut = lo + int(np.argmin(energy[lo:hi]))
+        cuts.append(cut * frame_size)
+        target = cut + chunk_frames
+    cuts.append(total)
+
+    return list(zip(cuts[:-1], cuts[1:]))
@@ -0,0 +1,77 @@
+"""Compare the MP3 re-encode download path with native audio downloads.
+
+Usage:
+    python benchmarks/bench_audio_acquisition.py https://www.youtube.com/watch?v=VIDEO_ID [...]
+
+For each video and each AUDIO_FORMAT mode ('mp3', 'native') this downloads the
+audio into a temporary directory and reports download time (including any
+re-encode), file size on disk and the time to decode the file to the 16 kHz
+PCM that Whisper consumes. Requires network access and ffmpeg.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+import audio_utils
+from youtube_monitor import build_ydl_opts
+
+
+def measure(video_url, audio_format):
+    output_dir = tempfile.mkdtemp(prefix=f'bench_{audio_format}_')
+    try:
+        start = time.time()
+        with yt_dlp.YoutubeDL(build_ydl_opts(audio_format, output_dir)) as ydl:
+            ydl.download([video_url])
+        download_time = time.time() - start
+
+        files = [os.path.join(output_dir, f) for f in os.listdir(output_dir)]
+        if not files:
+            raise RuntimeError(f"No audio downloaded for {video_url}")
+        audio_path = files[0]
+        size_mb = os.path.getsize(audio_path) / (1024**2)
+
+        start = time.time()
+        audio = audio_utils.decode_audio(audio_path)
+        decode_time = time.time() - start
+
+        return {
+            'ext': os.path.splitext(audio_path)[1],
+            'download': download_time,
+            'size_mb': size_mb,
+            'decode': decode_time,
+            'duration': len(audio) / audio_utils.SAMPLE_RATE
+        }
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('video_urls', nargs='+')
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'ext':<6} {'audio s':>8} {'download s':>11} {'decode s':>9} {'size MB':>8}")
+    totals = {}
+    for video_url in args.video_urls:
+        print(video_url)
+        for audio_format in ('mp3', 'native'):
+            result = measure(video_url, audio_format)
+            total = totals.setdefault(audio_format, {'download': 0.0, 'decode': 0.0, 'size_mb': 0.0})
+            for key in total:
+                total[key] += result[key]
+            print(f"{audio_format:<8} {result['ext']:<6} {result['duration']:>8.0f} "
+                  f"{result['download']:>11.1f} {result['decode']:>9.1f} {result['size_mb']:>8.1f}")
+
+    print("Totals:")
+    for audio_format, total in totals.items():
+        print(f"{audio_format:<8} download+decode {total['download'] + total['decode']:.1f}s, {total['size_mb']:.1f} MB on disk")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Micro-benchmark of transcript chunking on a ~100k-token transcript.
+
+Usage:
+    python benchmarks/bench_chunk_planner.py [--tokens 100000] [--no-punctuation]
+
+Compares the old sentence-by-sentence chunk_text (run twice, once for
+formatting and once for the summary, as before) with ChunkPlanner, which
+encodes the transcript once and reuses the cached plan for the second stage.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tiktoken
+from chunking import ChunkPlanner
+
+WORDS = (
+    "so today we are going to talk about how the system works and why it matters "
+    "for people who build things at scale with a lot of moving parts and data"
+).split()
+
+
+def legacy_chunk_text(encoding, text, max_tokens=4000):
+    """The previous VideoTranscriber.chunk_text, kept here for comparison."""
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for sentence in text.split('. '):
+        sentence_tokens = len(encoding.encode(sentence))
+        if current_length + sentence_tokens > max_tokens:
+            chunks.append('. '.join(current_chunk) + '.')
+            current_chunk = [sentence]
+            current_length = sentence_tokens
+        else:
+            current_chunk.append(sentence)
+            current_length += sentence_tokens
+    if current_chunk:
+        chunks.append('. '.join(current_chunk) + '.')
+    return chunks
+
+
+def make_transcript(encoding, target_tokens, punctuation):
+    rng = random.Random(42)
+    lines = []
+    tokens = 0
+    while tokens < target_tokens:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 25))]
+        line = " ".join(words) + ("." if punctuation else "")
+        lines.append(line)
+        tokens += len(encoding.encode(line)) + 1
+    return "\n".join(lines) if punctuation else " ".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=100000)
+    parser.add_argument('--no-punctuation', action='store_true', help='Simulate unpunctuated Whisper output')
+    args = parser.parse_args()
+
+    encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+    text = make_transcript(encoding, args.tokens, not args.no_punctuation)
+    print(f"Transcript: {len(encoding.encode(text))} tokens, {len(text)} characters")
+
+    start = time.perf_counter()
+    for _ in range(2):
+        legacy = legacy_chunk_text(encoding, text)
+    legacy_time = time.perf_counter() - start
+    legacy_sizes = [len(encoding.encode(chunk)) for chunk in legacy]
+
+    planner = ChunkPlanner(encoding)
+    start = time.perf_counter()
+    planned = planner.chunks(text)
+    first_time = time.perf_counter() - start
+    start = time.perf_counter()
+    planner.chunks(text)
+    second_time = time.perf_counter() - start
+    planned_sizes = [len(encoding.encode(chunk)) for chunk in planned]
+
+    print(f"legacy chunk_text x2: {legacy_time * 1000:8.1f} ms, {len(legacy)} chunks, largest {max(legacy_sizes)} tokens")
+    print(f"ChunkPlanner first:   {first_time * 1000:8.1f} ms, {len(planned)} chunks, largest {max(planned_sizes)} tokens")
+    print(f"ChunkPlanner cached:  {second_time * 1000:8.1f} ms")
+    print(f"Speed-up for both stages: {legacy_time / (first_time + second_time):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
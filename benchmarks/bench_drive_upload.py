@@ -0,0 +1,70 @@
+"""Compare the two ways of creating transcript Google Docs.
+
+Usage:
+    python benchmarks/bench_drive_upload.py [--hours 1 3 6] [--keep]
+
+For a synthetic transcript of each length, creates a Doc with the HTML media
+upload (GDRIVE_UPLOAD_MODE=media) and with files.create + insertText
+(GDRIVE_UPLOAD_MODE=insert) and prints both timings. Uses the Drive
+credentials and unread folder from .env; the test Docs are deleted afterwards
+unless --keep is given. The insert path may fail on long transcripts, which
+is reported as such.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gdrive_handler import GoogleDriveHandler
+
+# Roughly what a speaker produces per hour: ~150 words/minute
+WORDS_PER_HOUR = 9000
+
+
+def synthetic_document(hours):
+    """Markdown shaped like create_transcript_doc output for a video of the given length."""
+    sentence = "This is a sentence from a synthetic transcript used to time document uploads."
+    words_per_sentence = len(sentence.split())
+    sentences = int(hours * WORDS_PER_HOUR / words_per_sentence)
+    paragraphs = [" ".join([sentence] * 5) for _ in range(max(1, sentences // 5))]
+    transcript = "\n\n".join(paragraphs)
+    return f"""# Upload benchmark ({hours}h)
+
+## Summary
+A synthetic summary paragraph.
+
+## Transcript
+{transcript}
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hours', nargs='+', type=float, default=[1, 3, 6])
+    parser.add_argument('--keep', action='store_true', help="Don't delete the created Docs")
+    args = parser.parse_args()
+
+    gdrive = GoogleDriveHandler()
+    print(f"{'length':>7} {'size':>9} {'media upload':>13} {'create+insert':>14}")
+    for hours in args.hours:
+        content = synthetic_document(hours)
+        timings = []
+        for method in (gdrive.upload_doc, gdrive.insert_doc):
+            start = time.time()
+            try:
+                doc_id = method(f"Upload benchmark {hours}h ({method.__name__})", content)
+                timings.append(f"{time.time() - start:.2f}s")
+            except Exception as e:
+                timings.append("failed")
+                print(f"{method.__name__} failed for {hours}h: {str(e)}")
+                continue
+            if not args.keep:
+                gdrive.service.files().delete(fileId=doc_id).execute()
+        size_kb = len(content.encode('utf-8')) / 1024
+        print(f"{hours:>6.1f}h {size_kb:>7.0f}KB {timings[0]:>13} {timings[1]:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""End-to-end throughput of the bot against local fakes of every external service.
+
+Usage:
+    python benchmarks/bench_end_to_end.py [--videos 20] [--seconds 300] [--mode pipeline|sequential]
+        [--whisper-speed 20] [--openai-latency 0.5] [--drive-latency 0.1] [--download-seconds 0.5]
+        [--local] [--captions] [--real-whisper tiny]
+
+Runs one iteration of the main loop (playlist poll, the job queue feeding the
+download -> transcribe -> publish pipeline, Drive sync) or main.process_video per video
+against the fakes in benchmarks/fakes.py: a playlistItems API, yt-dlp writing
+synthetic audio of --seconds, Whisper sleeping at --whisper-speed times
+realtime (or a real model with --real-whisper), an OpenAI-compatible HTTP
+server and an in-memory Drive. Prints videos/hour, per-stage latency
+percentiles and peak RSS. Everything runs in a temporary directory; no API
+keys are needed, ffmpeg is used when installed.
+"""
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fakes
+
+
+def configure_environment(args, work_dir, openai_url):
+    """Point config.py at the fakes and the temporary directory; must run before importing the bot."""
+    os.environ.update({
+        'YOUTUBE_API_KEY': 'benchmark',
+        'PLAYLIST_ID': 'PLbenchmark',
+        'OPENAI_API_KEY': 'benchmark',
+        'OPENAI_BASE_URL': openai_url,
+        'STATE_DB_FILE': os.path.join(work_dir, 'video_state.db'),
+        'CHECKPOINT_DIR': os.path.join(work_dir, 'checkpoints'),
+        'JOB_QUEUE_DB': os.path.join(work_dir, 'job_queue.db'),
+        'LLM_CACHE_ENABLED': 'false',
+        'CAPTIONS_FIRST': 'true' if args.captions else 'false',
+        'WHISPER_BACKEND': 'openai-whisper' if args.real_whisper else 'fake',
+        'WHISPER_MODEL': args.real_whisper or 'base',
+        'WHISPER_MODEL_BY_DURATION': '',
+        # The fake backend only exists in this process, not in spawned pool workers
+        'WHISPER_PARALLEL': 'true' if args.real_whisper else 'false',
+        'OBSIDIAN_VAULT_PATH': os.path.join(work_dir, 'vault'),
+        'GDRIVE_UNREAD_FOLDER_ID': 'unread',
+        'GDRIVE_PROCESSED_FOLDER_ID': 'processed',
+        'METRICS_ENABLED': 'false',
+    })
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024  # ru_maxrss is in KB on Linux
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--videos', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=300, help='Audio length per video')
+    parser.add_argument('--mode', choices=['pipeline', 'sequential'], default='pipeline')
+    parser.add_argument('--whisper-speed', type=float, default=20, help='Fake Whisper speed, x realtime')
+    parser.add_argument('--openai-latency', type=float, default=0.5, help='Seconds per fake OpenAI request')
+    parser.add_argument('--drive-latency', type=float, default=0.1, help='Seconds per fake Drive round-trip')
+    parser.add_argument('--download-seconds', type=float, default=0.5, help='Seconds per fake download')
+    parser.add_argument('--local', action='store_true', help='Save transcripts locally instead of to the fake Drive')
+    parser.add_argument('--captions', action='store_true', help='Enable the caption fast path (fakes have none)')
+    parser.add_argument('--real-whisper', metavar='MODEL', help='Use a real openai-whisper model')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary directory')
+    args = parser.parse_args()
+
+    openai_server = fakes.FakeOpenAIServer(latency=args.openai_latency).start()
+    work_dir = tempfile.mkdtemp(prefix='yt-bench-')
+    configure_environment(args, work_dir, openai_server.base_url)
+    os.chdir(work_dir)
+    use_ffmpeg = shutil.which('ffmpeg') is not None
+
+    # Import the bot only now, so config.py sees the environment above
+    import audio_utils
+    import whisper_backends
+    import youtube_monitor
+    import transcriber as transcriber_module
+    import main as bot
+    from metrics import metrics
+    from checkpoints import CheckpointStore
+    from job_queue import JobQueue
+    bot.setup_logging()
+
+    fakes.FakeWhisperBackend.speed = args.whisper_speed
+    whisper_backends.BACKENDS['fake'] = fakes.FakeWhisperBackend
+    if not use_ffmpeg:
+        audio_utils.decode_audio = fakes.read_wav
+        audio_utils.open_pcm_stream = fakes.open_wav_stream
+        audio_utils.probe_duration = fakes.wav_duration
+    try:
+        transcriber_module.tiktoken.encoding_for_model("gpt-3.5-turbo")
+    except Exception:
+        print("tiktoken vocabulary unavailable, using a word-level fake encoding")
+        transcriber_module.tiktoken.encoding_for_model = lambda model: fakes.FakeEncoding()
+
+    fake_youtube = fakes.FakeYouTube(args.videos, http_error_class=youtube_monitor.HttpError)
+    youtube_monitor.build = lambda *a, **k: fake_youtube
+    youtube_monitor.yt_dlp = fakes.FakeYtDlp(args.seconds, args.download_seconds, use_ffmpeg)
+
+    gdrive = None
+    fake_drive = None
+    if not args.local:
+        fake_drive = fakes.FakeDrive('unread', 'processed', latency=args.drive_latency)
+        gdrive = fakes.fake_drive_handler(fake_drive, os.environ['OBSIDIAN_VAULT_PATH'])
+        gdrive.monitor_drive()  # Establish the changes feed position, like the first real poll
+
+    # Keep every observation so we can report percentiles, not just histogram buckets
+    samples = {}
+    observe = metrics.observe
+
+    def recording_observe(name, value, **labels):
+        if name in ('stage_seconds', 'llm_task_seconds'):
+            label = labels.get('stage') or labels.get('task')
+            samples.setdefault(f"{name[:-8]}:{label}", []).append(value)
+        observe(name, value, **labels)
+    metrics.observe = recording_observe
+
+    monitor = youtube_monitor.YouTubeMonitor()
+    video_transcriber = transcriber_module.VideoTranscriber(gdrive)
+    checkpoints = CheckpointStore()
+
+    print(f"{args.videos} videos x {args.seconds:.0f}s audio, mode={args.mode}, "
+          f"whisper={'real ' + args.real_whisper if args.real_whisper else f'fake {args.whisper_speed}x'}, "
+          f"ffmpeg={'yes' if use_ffmpeg else 'no'}, target={'local' if args.local else 'fake Drive'}")
+
+    start = time.time()
+    videos = monitor.get_new_videos()
+    if args.mode == 'pipeline':
+        job_queue = JobQueue()
+        bot.enqueue_videos(videos, job_queue, monitor)
+        pipeline = bot.build_pipeline(
+            monitor,
+            video_transcriber,
+            checkpoints,
+            on_result=lambda video, success: bot.complete_job(video, success, job_queue, monitor)
+        )
+        results = pipeline.run(job_queue.claims())
+    else:
+        results = {}
+        for video in videos:
+            with metrics.timer('stage_seconds', stage='video'):
+                results[video['id']] = bot.process_video(video, monitor, video_transcriber, checkpoints)
+    if gdrive:
+        gdrive.monitor_drive()
+    elapsed = time.time() - start
+    video_transcriber.llm.shutdown()
+
+    succeeded = sum(1 for success in results.values() if success)
+    print(f"\nProcessed {succeeded}/{len(videos)} videos in {elapsed:.1f}s "
+          f"= {succeeded / elapsed * 3600:.0f} videos/hour")
+    print(f"OpenAI requests: {openai_server.requests}, YouTube calls: {fake_youtube.calls}"
+          + (f", Drive calls: {fake_drive.calls}" if fake_drive else ""))
+    own_rss, child_rss = peak_rss_mb()
+    print(f"Peak RSS: {own_rss:.0f} MB (largest child process: {child_rss:.0f} MB)\n")
+
+    print(f"{'latency':<22} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for name in sorted(samples):
+        values = samples[name]
+        print(f"{name:<22} {len(values):>6} {percentile(values, 0.5):>7.2f}s {percentile(values, 0.9):>7.2f}s "
+              f"{percentile(values, 0.99):>7.2f}s {max(values):>7.2f}s")
+
+    openai_server.stop()
+    if args.keep:
+        print(f"\nWork directory kept at {work_dir}")
+    else:
+        os.chdir('/')
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
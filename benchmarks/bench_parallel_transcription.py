@@ -0,0 +1,56 @@
+"""Compare single-call Whisper transcription with chunked parallel transcription.
+
+Usage:
+    python benchmarks/bench_parallel_transcription.py path/to/long_audio.mp3 [--model base] [--backend openai-whisper] [--workers N]
+
+Prints wall-clock time for both paths and the speed-up. Use audio of at least
+20-30 minutes; short files don't split into enough chunks to show a gain.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_utils
+from transcriber import VideoTranscriber
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('audio_path')
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--backend', default='openai-whisper', choices=['openai-whisper', 'faster-whisper'])
+    parser.add_argument('--workers', type=int, default=0, help='0 = one per CPU core')
+    parser.add_argument('--chunk-seconds', type=int, default=600)
+    args = parser.parse_args()
+
+    audio = audio_utils.decode_audio(args.audio_path)
+    duration = len(audio) / audio_utils.SAMPLE_RATE
+    print(f"Audio duration: {duration:.0f}s, CPU cores: {os.cpu_count()}")
+
+    # Bypass VideoTranscriber.__init__ so no OpenAI/Drive clients are created
+    transcriber = VideoTranscriber.__new__(VideoTranscriber)
+    transcriber.model_name = args.model
+    transcriber.backend_name = args.backend
+    transcriber._models = {}
+    transcriber._model_lock = threading.Lock()
+    model = transcriber.get_model()
+
+    start = time.time()
+    single = model.transcribe(audio)
+    single_time = time.time() - start
+    print(f"Single call: {single_time:.1f}s ({duration / single_time:.2f}x realtime, {len(single['segments'])} segments)")
+
+    start = time.time()
+    parallel = transcriber.transcribe_parallel(audio, args.chunk_seconds, args.workers or None)
+    parallel_time = time.time() - start
+    print(f"Parallel:    {parallel_time:.1f}s ({duration / parallel_time:.2f}x realtime, {len(parallel['segments'])} segments)")
+
+    print(f"Speed-up: {single_time / parallel_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
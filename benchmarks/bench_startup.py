@@ -0,0 +1,78 @@
+"""Measure how long the bot takes to start up.
+
+Usage:
+    python benchmarks/bench_startup.py [--load-model]
+
+Times the module imports and the construction of the clients main.py creates
+before its first poll, using the settings from .env. Whisper models are
+loaded lazily, so --load-model additionally times the first model load that
+the first transcription would pay for. Run it a few times: the first run
+includes cold disk caches.
+
+Everything runs in a temporary directory with its own state database,
+checkpoints, job queue and vault, so no real state is created or migrated.
+Drive is the in-memory fake from benchmarks/fakes.py; the OAuth flow is not
+part of the measurement.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fakes
+
+
+def timed(label, func):
+    start = time.time()
+    result = func()
+    print(f"{label:<28} {time.time() - start:>7.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--load-model', action='store_true', help='Also time loading the default Whisper model')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='yt-bench-startup-')
+    vault_path = os.path.join(work_dir, 'vault')
+    # Must be set before config is imported; relative paths land in work_dir too
+    os.environ.update({
+        'STATE_DB_FILE': os.path.join(work_dir, 'video_state.db'),
+        'CHECKPOINT_DIR': os.path.join(work_dir, 'checkpoints'),
+        'JOB_QUEUE_DB': os.path.join(work_dir, 'job_queue.db'),
+        'AUDIO_SPOOL_DIR': os.path.join(work_dir, 'audio_spool'),
+        'LLM_CACHE_DIR': os.path.join(work_dir, 'llm_cache'),
+        'OBSIDIAN_VAULT_PATH': vault_path,
+        'METRICS_ENABLED': 'false',
+    })
+    os.chdir(work_dir)
+    try:
+        total_start = time.time()
+        timed("import config", lambda: __import__('config'))
+        youtube_monitor = timed("import youtube_monitor", lambda: __import__('youtube_monitor'))
+        transcriber = timed("import transcriber", lambda: __import__('transcriber'))
+        timed("import gdrive_handler", lambda: __import__('gdrive_handler'))
+
+        fake_drive = fakes.FakeDrive('unread', 'processed', latency=0)
+        gdrive = timed("GoogleDriveHandler() (fake)", lambda: fakes.fake_drive_handler(fake_drive, vault_path))
+        timed("YouTubeMonitor()", youtube_monitor.YouTubeMonitor)
+        video_transcriber = timed("VideoTranscriber()", lambda: transcriber.VideoTranscriber(gdrive))
+        print(f"{'startup total':<28} {time.time() - total_start:>7.2f}s")
+
+        if args.load_model:
+            label = f"load {video_transcriber.backend_name} {video_transcriber.model_name}"
+            timed(label, video_transcriber.get_model)
+    finally:
+        os.chdir('/')
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
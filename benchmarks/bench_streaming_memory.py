@@ -0,0 +1,127 @@
+"""Peak memory of streaming versus whole-file audio decoding for long audio.
+
+Usage:
+    python benchmarks/bench_streaming_memory.py [--hours 1 3 6] [--modes streaming whole] [--keep]
+
+For each length, writes synthetic speech-like audio (Opus with ffmpeg, WAV
+without it) and runs VideoTranscriber.transcribe_segments over it in a fresh
+process, once with WHISPER_STREAMING=true and once with false. Whisper is the
+instant fake backend from benchmarks/fakes.py, so the numbers show the memory
+and time spent on audio alone. Prints peak RSS and wall time per run.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import resource
+import tempfile
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fakes
+
+
+def write_audio(path, seconds, use_ffmpeg):
+    """Write seconds of synthetic audio a minute at a time, so long files don't need the RAM either."""
+    if use_ffmpeg:
+        proc = subprocess.Popen(
+            ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-f', 's16le', '-ar', str(fakes.SAMPLE_RATE),
+             '-ac', '1', '-i', '-', '-c:a', 'libopus', '-b:a', '24k', path],
+            stdin=subprocess.PIPE
+        )
+        out = proc.stdin
+    else:
+        out = wave.open(path, 'wb')
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(fakes.SAMPLE_RATE)
+    for minute in range(0, int(seconds), 60):
+        samples = fakes.synthetic_audio(min(60, seconds - minute), seed=minute).tobytes()
+        if use_ffmpeg:
+            out.write(samples)
+        else:
+            out.writeframes(samples)
+    out.close()
+    if use_ffmpeg and proc.wait() != 0:
+        raise RuntimeError("ffmpeg failed to encode the test audio")
+
+
+def run_child(audio_path, use_ffmpeg):
+    """Transcribe audio_path with the fake backend and print peak RSS and time as JSON."""
+    import threading
+    import audio_utils
+    import whisper_backends
+    from transcriber import VideoTranscriber
+
+    fakes.FakeWhisperBackend.speed = 1e9
+    whisper_backends.BACKENDS['fake'] = fakes.FakeWhisperBackend
+    if not use_ffmpeg:
+        audio_utils.decode_audio = fakes.read_wav
+        audio_utils.open_pcm_stream = fakes.open_wav_stream
+        audio_utils.probe_duration = fakes.wav_duration
+
+    # Bypass VideoTranscriber.__init__ so no OpenAI/Drive clients are created
+    transcriber = VideoTranscriber.__new__(VideoTranscriber)
+    transcriber.model_name = 'base'
+    transcriber.backend_name = 'fake'
+    transcriber._models = {}
+    transcriber._model_lock = threading.Lock()
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    segments = sum(1 for _ in transcriber.transcribe_segments(audio_path))
+    print(json.dumps({
+        'seconds': time.time() - start,
+        'segments': segments,
+        'baseline_mb': baseline / 1024,  # ru_maxrss is in KB on Linux
+        'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'decoder_peak_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hours', nargs='+', type=float, default=[1, 3, 6])
+    parser.add_argument('--modes', nargs='+', choices=['streaming', 'whole'], default=['streaming', 'whole'])
+    parser.add_argument('--keep', action='store_true', help='Keep the generated audio files')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    use_ffmpeg = shutil.which('ffmpeg') is not None
+    if args.child:
+        run_child(args.child, use_ffmpeg)
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='yt-bench-memory-')
+    print(f"Audio as {'Opus (ffmpeg)' if use_ffmpeg else 'WAV (no ffmpeg)'} in {work_dir}\n")
+    print(f"{'length':>7} {'mode':>10} {'peak RSS':>9} {'decoder':>8} {'time':>7} {'segments':>9}")
+    try:
+        for hours in args.hours:
+            audio_path = os.path.join(work_dir, f"{hours:g}h.{'opus' if use_ffmpeg else 'wav'}")
+            write_audio(audio_path, hours * 3600, use_ffmpeg)
+            for mode in args.modes:
+                env = dict(os.environ, WHISPER_STREAMING='true' if mode == 'streaming' else 'false',
+                           WHISPER_PARALLEL='false', WHISPER_MODEL_BY_DURATION='', METRICS_ENABLED='false')
+                proc = subprocess.run([sys.executable, __file__, '--child', audio_path],
+                                      env=env, capture_output=True, text=True)
+                if proc.returncode != 0:
+                    print(f"{hours:>6g}h {mode:>10} failed: {proc.stderr.strip().splitlines()[-1:]}")
+                    continue
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+                print(f"{hours:>6g}h {mode:>10} {result['peak_mb']:>7.0f}MB {result['decoder_peak_mb']:>6.0f}MB "
+                      f"{result['seconds']:>6.1f}s {result['segments']:>9}")
+            if not args.keep:
+                os.remove(audio_path)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Tree-reduce summaries versus the single combine request for long transcripts.
+
+Usage:
+    python benchmarks/bench_summary_tree.py [--hours 1 3 6] [--latency 1.0] [--latency-per-1k-words 0.5]
+                                         [--context-tokens 16385]
+
+For each length, summarizes a synthetic transcript (about 9000 words per hour)
+against the fake OpenAI server, once the old way (chunk summaries, then one
+request combining all of them) and once with TreeSummarizer. Prints the
+depth, fan-in and wall time of every tree level, the largest request of each
+approach and whether it fits the context window.
+"""
+import os
+import sys
+import time
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import tiktoken
+from openai import OpenAI
+import fakes
+import summarizer
+from chunking import ChunkPlanner
+from llm_executor import LLMExecutor
+from config import SUMMARY_CONTEXT_TOKENS, LLM_MAX_CONCURRENCY
+
+WORDS_PER_HOUR = 9000
+
+
+def flat_summary(tree, text):
+    """The previous generate_summary: every chunk summary combined in one request."""
+    started = time.time()
+    chunks = tree.chunk_planner.chunks(text, max_tokens=4000)
+    futures = [
+        tree.llm.submit(tree._complete, summarizer.MAP_PROMPT, summarizer.MAP_PREFIX, chunk, f"chunk {i}")
+        for i, chunk in enumerate(chunks, 1)
+    ]
+    summaries = [future.result() for future in futures]
+    map_seconds = time.time() - started
+    combined = summarizer.SEPARATOR.join(summaries)
+    tree.llm.complete([
+        {"role": "system", "content": summarizer.REDUCE_PROMPT},
+        {"role": "user", "content": f"{summarizer.REDUCE_PREFIX}{combined}"}
+    ])
+    return map_seconds, time.time() - started, tree.chunk_planner.count_tokens(combined)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hours', nargs='+', type=float, default=[1, 3, 6])
+    parser.add_argument('--latency', type=float, default=1.0, help='Base seconds per fake OpenAI request')
+    parser.add_argument('--latency-per-1k-words', type=float, default=0.5,
+                        help='Extra seconds per thousand prompt words')
+    parser.add_argument('--summary-words', type=int, default=300, help='Words in every fake summary')
+    parser.add_argument('--context-tokens', type=int, default=SUMMARY_CONTEXT_TOKENS,
+                        help='Context window to plan for (4096 for the original gpt-3.5-turbo)')
+    args = parser.parse_args()
+
+    try:
+        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+    except Exception:
+        print("tiktoken vocabulary unavailable, using a word-level fake encoding")
+        encoding = fakes.FakeEncoding()
+    server = fakes.FakeOpenAIServer(latency=args.latency, summary_words=args.summary_words,
+                                    latency_per_1k_words=args.latency_per_1k_words).start()
+    planner = ChunkPlanner(encoding)
+    llm = LLMExecutor(OpenAI(api_key='bench', base_url=server.base_url, max_retries=0), planner.count_tokens,
+                      max_workers=LLM_MAX_CONCURRENCY, requests_per_minute=100000, tokens_per_minute=10 ** 9)
+    tree = summarizer.TreeSummarizer(llm, planner, context_tokens=args.context_tokens)
+    print(f"Context {args.context_tokens} tokens, chunks of {tree.chunk_tokens}, reduce groups of "
+          f"{tree.reduce_tokens}, replies up to {tree.reply_tokens}, {LLM_MAX_CONCURRENCY} concurrent requests\n")
+
+    try:
+        for hours in args.hours:
+            text = fakes.fake_text(int(hours * WORDS_PER_HOUR), seed=int(hours * 10))
+            print(f"{hours:g}h transcript, {planner.count_tokens(text)} tokens")
+
+            map_seconds, flat_seconds, combine_tokens = flat_summary(tree, text)
+            fits = combine_tokens + tree.reply_tokens <= args.context_tokens
+            print(f"  single combine: {flat_seconds:6.1f}s (combine step {flat_seconds - map_seconds:.1f}s), "
+                  f"combine request {combine_tokens} tokens{'' if fits else ' - EXCEEDS CONTEXT'}")
+
+            started = time.time()
+            _, levels = tree.summarize(text)
+            tree_seconds = time.time() - started
+            for stats in levels:
+                print(f"    level {stats['level']}: {stats['inputs']:>3} -> {stats['outputs']:>3}, "
+                      f"fan-in max {stats['max_fan_in']} mean {stats['mean_fan_in']:.1f}, "
+                      f"largest {stats['largest_request_tokens']:>5} tokens, {stats['seconds']:5.1f}s")
+            largest = max(stats['largest_request_tokens'] for stats in levels)
+            print(f"  tree reduce:    {tree_seconds:6.1f}s, depth {len(levels)}, largest request {largest} tokens\n")
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
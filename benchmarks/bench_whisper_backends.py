@@ -0,0 +1,57 @@
+"""Compare Whisper backends and model sizes on the same audio.
+
+Usage:
+    python benchmarks/bench_whisper_backends.py path/to/audio.mp3 [--models tiny base small] [--backends openai-whisper faster-whisper]
+
+For every backend/model pair prints the model load time, transcription time,
+real-time factor and word count, so you can pick WHISPER_BACKEND and
+WHISPER_MODEL_BY_DURATION for your hardware. Backends that aren't installed
+are skipped.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_utils
+from whisper_backends import BACKENDS, load_backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('audio_path')
+    parser.add_argument('--models', nargs='+', default=['tiny', 'base', 'small'])
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument('--compute-type', default='int8', help='faster-whisper quantization')
+    parser.add_argument('--threads', type=int, default=0, help='0 = library default')
+    args = parser.parse_args()
+
+    audio = audio_utils.decode_audio(args.audio_path)
+    duration = len(audio) / audio_utils.SAMPLE_RATE
+    print(f"Audio duration: {duration:.0f}s, CPU cores: {os.cpu_count()}")
+    print(f"{'backend':<16} {'model':<10} {'load':>7} {'transcribe':>11} {'realtime':>9} {'words':>7}")
+
+    for backend_name in args.backends:
+        for model_name in args.models:
+            start = time.time()
+            try:
+                backend = load_backend(backend_name, model_name, args.threads, args.compute_type)
+            except ImportError as e:
+                print(f"{backend_name:<16} skipped ({str(e)})")
+                break
+            load_time = time.time() - start
+
+            start = time.time()
+            result = backend.transcribe(audio)
+            transcribe_time = time.time() - start
+
+            words = len(result['text'].split())
+            print(f"{backend_name:<16} {model_name:<10} {load_time:>6.1f}s {transcribe_time:>10.1f}s "
+                  f"{duration / transcribe_time:>8.2f}x {words:>7}")
+            del backend
+
+
+if __name__ == '__main__':
+    main()
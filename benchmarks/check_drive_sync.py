@@ -0,0 +1,102 @@
+"""Check the Drive changes-feed sync against the in-memory fake Drive.
+
+Usage:
+    python benchmarks/check_drive_sync.py [--files 250] [--page-size 100]
+
+Runs GoogleDriveHandler.check_for_changes through four polls and asserts
+after each one:
+  1. first run: files already in the processed folder are converted, the
+     one that fails is saved as pending and the feed position is recorded;
+  2. incremental: new files are read from a changes feed spread over several
+     pages, and the still failing file stays pending;
+  3. retry: once it can be fetched, the pending file is converted by a poll
+     with no new changes;
+  4. restart: a new handler resumes from the saved state and finds nothing.
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fakes
+
+
+def count_notes(vault_path):
+    return sum(1 for _, _, files in os.walk(vault_path) for name in files if name.endswith('.md'))
+
+
+def create_docs(fake_drive, names):
+    return [fake_drive.create({'name': name, 'parents': ['unread']}).execute()['id'] for name in names]
+
+
+def check(label, condition, detail):
+    print(f"{'ok  ' if condition else 'FAIL'} {label}: {detail}")
+    if not condition:
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=250, help='Files added between the first and second poll')
+    parser.add_argument('--page-size', type=int, default=100, help='Changes per changes.list page')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='yt-check-drive-')
+    vault_path = os.path.join(work_dir, 'vault')
+    os.environ.update({
+        'OBSIDIAN_VAULT_PATH': vault_path,
+        'GDRIVE_UNREAD_FOLDER_ID': 'unread',
+        'GDRIVE_PROCESSED_FOLDER_ID': 'processed',
+        'GDRIVE_SYNC_MODE': 'changes',
+        'METRICS_ENABLED': 'false',
+    })
+    # drive_sync.json is written to the working directory
+    os.chdir(work_dir)
+    try:
+        fake_drive = fakes.FakeDrive('unread', 'processed', latency=0, max_page_size=args.page_size)
+        existing = create_docs(fake_drive, [f"Existing {i}" for i in range(5)])
+        broken = existing[2]
+        fake_drive.failing_docs.add(broken)
+        gdrive = fakes.fake_drive_handler(fake_drive, vault_path)
+
+        found = gdrive.check_for_changes()
+        check("first run", found == 5 and count_notes(vault_path) == 4,
+              f"{found} files found, {count_notes(vault_path)} notes written")
+        check("first run", list(gdrive.sync_state['pending']) == [broken],
+              f"pending after first run: {list(gdrive.sync_state['pending'])}")
+        check("first run", gdrive.sync_state['page_token'] is not None,
+              f"feed position {gdrive.sync_state['page_token']}")
+
+        create_docs(fake_drive, [f"New {i}" for i in range(args.files)])
+        pages_before = fake_drive.changes_pages
+        found = gdrive.check_for_changes()
+        pages = fake_drive.changes_pages - pages_before
+        check("incremental", found == args.files + 1 and count_notes(vault_path) == 4 + args.files,
+              f"{found} files found (new plus pending) over {pages} pages, {count_notes(vault_path)} notes written")
+        check("incremental", pages > 1 or args.files <= args.page_size, f"{pages} changes.list pages")
+        check("incremental", list(gdrive.sync_state['pending']) == [broken],
+              f"pending: {list(gdrive.sync_state['pending'])}")
+
+        fake_drive.failing_docs.clear()
+        found = gdrive.check_for_changes()
+        check("retry pending", found == 1 and count_notes(vault_path) == 5 + args.files,
+              f"{found} files found, {count_notes(vault_path)} notes written")
+        check("retry pending", not gdrive.sync_state['pending'], f"pending: {list(gdrive.sync_state['pending'])}")
+
+        restarted = fakes.fake_drive_handler(fake_drive, vault_path)
+        found = restarted.check_for_changes()
+        check("restart", found == 0 and count_notes(vault_path) == 5 + args.files,
+              f"{found} files found after reloading {restarted.sync_state['page_token']}")
+        print(f"\n{fake_drive.calls} fake Drive calls")
+    finally:
+        os.chdir('/')
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,487 @@
+"""Local stand-ins for the external services, used by the offline benchmarks.
+
+Nothing here talks to the network: YouTube, yt-dlp, Whisper and Drive are
+in-process fakes with configurable latency, and OpenAI is a small HTTP server
+that the real openai client is pointed at through OPENAI_BASE_URL.
+"""
+import io
+import re
+import json
+import time
+import wave
+import random
+import hashlib
+import threading
+import subprocess
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_RATE = 16000
+
+WORDS = ("the of and to in is that it for on with as this was are be at by we can "
+         "video model audio transcript speaker system time data result example").split()
+
+
+def fake_text(n_words, seed=0):
+    """Deterministic filler text with sentence breaks."""
+    rng = random.Random(seed)
+    words = []
+    for i in range(n_words):
+        word = rng.choice(WORDS)
+        words.append(word.capitalize() if i % 12 == 0 else word)
+        if i % 12 == 11:
+            words[-1] += "."
+    return " ".join(words)
+
+
+def synthetic_audio(seconds, seed=0):
+    """Speech-like int16 audio: bursts of noise separated by short silences."""
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16)
+    position = 0
+    while position < len(audio):
+        burst = int(rng.uniform(0.5, 3.0) * SAMPLE_RATE)
+        end = min(position + burst, len(audio))
+        audio[position:end] = (rng.standard_normal(end - position) * 3000).astype(np.int16)
+        position = end + int(rng.uniform(0.2, 1.0) * SAMPLE_RATE)
+    return audio
+
+
+def write_wav(path, samples):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+
+
+def read_wav(path):
+    """Decode a file written by FakeYtDlp without ffmpeg, as float32 like audio_utils.decode_audio."""
+    with wave.open(path, 'rb') as f:
+        samples = np.frombuffer(f.readframes(f.getnframes()), np.int16)
+    return samples.astype(np.float32) / 32768.0
+
+
+class _WavStream:
+    """Stand-in for the ffmpeg process of audio_utils.open_pcm_stream reading a WAV file."""
+
+    returncode = 0
+
+    def __init__(self, path, start_seconds):
+        self._wav = wave.open(path, 'rb')
+        self._wav.setpos(min(int(start_seconds * SAMPLE_RATE), self._wav.getnframes()))
+        self.stdout = self
+        self.stderr = io.BytesIO()
+
+    def read(self, size):
+        return self._wav.readframes(size // 2)
+
+    def wait(self):
+        self._wav.close()
+        return 0
+
+    def poll(self):
+        return 0
+
+    def kill(self):
+        pass
+
+
+def open_wav_stream(path, start_seconds=0, sample_rate=SAMPLE_RATE):
+    """Replacement for audio_utils.open_pcm_stream on machines without ffmpeg."""
+    return _WavStream(path, start_seconds)
+
+
+def wav_duration(path):
+    with wave.open(path, 'rb') as f:
+        return f.getnframes() / f.getframerate()
+
+
+class _FakeRequest:
+    """An API request object with execute(), like googleapiclient's HttpRequest."""
+
+    def __init__(self, func, latency=0.0):
+        self.func = func
+        self.latency = latency
+        self.headers = {}
+
+    def execute(self):
+        time.sleep(self.latency)
+        return self.func(self.headers)
+
+    def next_chunk(self):
+        return None, self.execute()
+
+
+class NotModified(Exception):
+    """Raised for a conditional request whose ETag still matches (see FakeYouTube)."""
+
+
+class FakeYouTube:
+    """playlistItems.list over a fixed list of synthetic videos, with ETags.
+
+    http_error_class is the HttpError the caller expects for 304 responses.
+    """
+
+    def __init__(self, n_videos, latency=0.05, http_error_class=None):
+        self.video_ids = [f"bench{i:05d}" for i in range(n_videos)]
+        self.latency = latency
+        self.http_error_class = http_error_class
+        self.calls = 0
+
+    def playlistItems(self):
+        return self
+
+    def list(self, part, playlistId, maxResults=50, pageToken=None):
+        def run(headers):
+            self.calls += 1
+            offset = int(pageToken or 0)
+            ids = self.video_ids[offset:offset + maxResults]
+            body = {'items': [
+                {'snippet': {
+                    'resourceId': {'videoId': video_id},
+                    'title': f"Benchmark video {video_id}",
+                    'publishedAt': '2024-01-01T00:00:00Z',
+                    'channelTitle': 'Benchmark channel'
+                }}
+                for video_id in ids
+            ]}
+            if offset + maxResults < len(self.video_ids):
+                body['nextPageToken'] = str(offset + maxResults)
+            etag = hashlib.md5(json.dumps(body).encode()).hexdigest()
+            if headers.get('If-None-Match') == etag:
+                if self.http_error_class:
+                    from types import SimpleNamespace
+                    raise self.http_error_class(SimpleNamespace(status=304, reason='Not Modified'), b'')
+                raise NotModified()
+            body['etag'] = etag
+            return body
+        return _FakeRequest(run, self.latency)
+
+
+class FakeYtDlp:
+    """Replacement for the yt_dlp module: downloads write synthetic audio.
+
+    Audio is Opus-encoded with ffmpeg when it is installed (like a real
+    bestaudio download); otherwise the file holds WAV data and the caller
+    has to decode it with read_wav.
+    """
+
+    def __init__(self, seconds, download_seconds=0.5, use_ffmpeg=True):
+        self.seconds = seconds
+        self.download_seconds = download_seconds
+        self.use_ffmpeg = use_ffmpeg
+        fake = self
+
+        class YoutubeDL:
+            def __init__(self, params=None):
+                self.params = params or {}
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def extract_info(self, url, download=False):
+                info = {
+                    'id': url.split('v=')[1],
+                    'duration': fake.seconds,
+                    'filesize_approx': int(fake.seconds * 4000),  # 32 kbps Opus
+                    'subtitles': {},
+                    'automatic_captions': {}
+                }
+                if download:
+                    self.process_ie_result(info, download=True)
+                return info
+
+            def process_ie_result(self, info, download=True):
+                template = self.params.get('outtmpl', '%(id)s.%(ext)s')
+                path = template.replace('%(id)s', info['id']).replace('%(ext)s', 'opus')
+                fake.write_audio(path, info['id'])
+                return dict(info, requested_downloads=[{'filepath': path}])
+
+            def download(self, urls):
+                for url in urls:
+                    self.extract_info(url, download=True)
+                return 0
+
+        self.YoutubeDL = YoutubeDL
+
+    def write_audio(self, path, video_id):
+        time.sleep(self.download_seconds)
+        samples = synthetic_audio(self.seconds, seed=int(video_id[-5:]))
+        if not self.use_ffmpeg:
+            write_wav(path, samples)
+            return
+        subprocess.run(
+            ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-f', 's16le', '-ar', str(SAMPLE_RATE),
+             '-ac', '1', '-i', '-', '-c:a', 'libopus', '-b:a', '32k', path],
+            input=samples.tobytes(), check=True
+        )
+
+
+class FakeWhisperBackend:
+    """Whisper backend that sleeps instead of running a model.
+
+    It transcribes at `speed` times realtime and emits a segment with filler
+    text every 5 seconds of audio.
+    """
+
+    name = 'fake'
+    supports_batch = True
+    speed = 20.0
+
+    def __init__(self, model_name, threads=0, compute_type=None):
+        self.model_name = model_name
+
+    def _segments(self, seconds):
+        segments = []
+        for start in range(0, int(seconds), 5):
+            end = min(start + 5, seconds)
+            segments.append({'start': float(start), 'end': float(end), 'text': " " + fake_text(13, seed=start)})
+        return segments
+
+    def transcribe(self, audio):
+        seconds = len(audio) / SAMPLE_RATE
+        time.sleep(seconds / self.speed)
+        segments = self._segments(seconds)
+        return {'text': "".join(s['text'] for s in segments), 'segments': segments, 'language': 'en'}
+
+    def transcribe_batch(self, windows):
+        seconds = sum(len(window) for window in windows) / SAMPLE_RATE
+        # Batching amortizes per-call overhead; model that as a 1.5x speed-up
+        time.sleep(seconds / (self.speed * 1.5))
+        return [{'text': " " + fake_text(75, seed=i), 'language': 'en'} for i in range(len(windows))]
+
+
+class FakeEncoding:
+    """Word-level stand-in for a tiktoken encoding, for machines without the vocab files."""
+
+    _PIECES = re.compile(r'\s*\S+|\s+')
+
+    def __init__(self):
+        self._ids = {}
+        self._pieces = []
+        self._lock = threading.Lock()
+
+    def encode(self, text):
+        tokens = []
+        with self._lock:
+            for piece in self._PIECES.findall(text):
+                if piece not in self._ids:
+                    self._ids[piece] = len(self._pieces)
+                    self._pieces.append(piece)
+                tokens.append(self._ids[piece])
+        return tokens
+
+    def decode(self, tokens):
+        return "".join(self._pieces[token] for token in tokens)
+
+    def decode_single_token_bytes(self, token):
+        return self._pieces[token].encode('utf-8')
+
+
+class FakeOpenAIServer:
+    """Minimal OpenAI-compatible chat completions server.
+
+    Replies after `latency` seconds, plus `latency_per_1k_words` per thousand
+    prompt words, with the text after the first blank line of the last
+    message (so formatting returns the chunk and summaries stay short), plus
+    a usage block.
+    """
+
+    def __init__(self, latency=0.5, summary_words=80, latency_per_1k_words=0.0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                prompt = request['messages'][-1]['content']
+                time.sleep(server.latency + server.latency_per_1k_words * len(prompt.split()) / 1000)
+                body = prompt.split("\n\n", 1)[-1]
+                if 'summary' in request['messages'][0]['content'].lower():
+                    body = fake_text(server.summary_words)
+                server.requests += 1
+                reply = json.dumps({
+                    'id': f"chatcmpl-{server.requests}",
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': request.get('model', 'gpt-3.5-turbo'),
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': body}}],
+                    'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': len(body.split()),
+                              'total_tokens': len(prompt.split()) + len(body.split())}
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.latency = latency
+        self.summary_words = summary_words
+        self.latency_per_1k_words = latency_per_1k_words
+        self.requests = 0
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='fake-openai', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+def fake_drive_handler(fake_drive, vault_path):
+    """A GoogleDriveHandler wired to fake_drive, skipping the OAuth flow of __init__."""
+    from gdrive_handler import GoogleDriveHandler
+    from vault_writer import VaultWriter
+    gdrive = GoogleDriveHandler.__new__(GoogleDriveHandler)
+    gdrive._clients = lambda: (fake_drive, fake_drive)
+    gdrive.sync_state = gdrive._load_sync_state()
+    gdrive.vault = VaultWriter(vault_path)
+    return gdrive
+
+
+class FakeDrive:
+    """In-memory Drive v3 + Docs v1 service covering what GoogleDriveHandler uses.
+
+    Created docs land in the unread folder; with auto_process they are
+    immediately "moved" to the processed folder, so the next monitor_drive()
+    picks them up through the changes feed. changes.list returns at most
+    max_page_size changes per page, and documents.get fails for the IDs in
+    failing_docs.
+    """
+
+    def __init__(self, unread_folder, processed_folder, latency=0.1, auto_process=True, max_page_size=1000):
+        self.unread_folder = unread_folder
+        self.processed_folder = processed_folder
+        self.latency = latency
+        self.auto_process = auto_process
+        self.max_page_size = max_page_size
+        self.failing_docs = set()
+        self.changes_pages = 0
+        self.files_by_id = {}
+        self.created = 0
+        self.changes_log = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _request(self, func):
+        def run(headers):
+            with self._lock:
+                self.calls += 1
+                return func()
+        return _FakeRequest(run, self.latency)
+
+    # Drive v3
+    def files(self):
+        return self
+
+    def comments(self):
+        return self
+
+    def changes(self):
+        return self
+
+    def documents(self):
+        return self
+
+    def create(self, body, media_body=None, fields=None):
+        def run():
+            # Counted separately from files_by_id, so IDs aren't reused after deletes
+            self.created += 1
+            file_id = f"doc{self.created:05d}"
+            parent = self.processed_folder if self.auto_process else body['parents'][0]
+            self.files_by_id[file_id] = {
+                'id': file_id,
+                'name': body['name'],
+                'createdTime': '2024-01-01T00:00:00Z',
+                'parents': [parent],
+                'appProperties': body.get('appProperties', {}),
+                'trashed': False
+            }
+            self.changes_log.append(file_id)
+            return {'id': file_id}
+        return self._request(run)
+
+    def delete(self, fileId):
+        def run():
+            self.files_by_id.pop(fileId, None)
+            self.changes_log.append(fileId)
+            return {}
+        return self._request(run)
+
+    def list(self, **kwargs):
+        if 'fileId' in kwargs:
+            return self._request(lambda: {'comments': []})
+        if 'q' in kwargs:
+            folder = kwargs['q'].split("'")[1]
+            return self._request(lambda: {'files': [
+                dict(f) for f in self.files_by_id.values() if folder in f['parents']
+            ]})
+
+        def changes():
+            start = int(kwargs['pageToken'])
+            page = self.changes_log[start:start + min(kwargs.get('pageSize', 100), self.max_page_size)]
+            self.changes_pages += 1
+            result = {'changes': [
+                {'fileId': file_id, 'removed': file_id not in self.files_by_id,
+                 'file': dict(self.files_by_id[file_id]) if file_id in self.files_by_id else None}
+                for file_id in page
+            ]}
+            if start + len(page) < len(self.changes_log):
+                result['nextPageToken'] = str(start + len(page))
+            else:
+                result['newStartPageToken'] = str(len(self.changes_log))
+            return result
+        return self._request(changes)
+
+    def getStartPageToken(self):
+        return self._request(lambda: {'startPageToken': str(len(self.changes_log))})
+
+    # Docs v1
+    def get(self, documentId):
+        def run():
+            if documentId in self.failing_docs:
+                raise RuntimeError(f"documents.get failed for {documentId}")
+            text = fake_text(400, seed=len(documentId))
+            return {'documentId': documentId, 'body': {'content': [
+                {'paragraph': {'elements': [{'textRun': {'content': text + "\n", 'textStyle': {}}}]}}
+            ]}}
+        return self._request(run)
+
+    def batchUpdate(self, documentId, body):
+        return self._request(lambda: {'documentId': documentId})
+
+    def new_batch_http_request(self, callback):
+        drive = self
+
+        class Batch:
+            def __init__(self):
+                self.requests = []
+
+            def add(self, request, request_id):
+                self.requests.append((request_id, request))
+
+            def execute(self):
+                # One round-trip for the whole batch
+                time.sleep(drive.latency)
+                for request_id, request in self.requests:
+                    request.latency = 0
+                    try:
+                        callback(request_id, request.execute(), None)
+                    except Exception as e:
+                        callback(request_id, None, e)
+
+        return Batch()
@@ -0,0 +1,115 @@
+import re
+import json
+
+# Caption formats we can parse, in order of preference
+SUPPORTED_FORMATS = ('json3', 'vtt')
+
+_VTT_TIMING = re.compile(r'(\d+:)?(\d+):(\d+)\.(\d+)\s+-->\s+(\d+:)?(\d+):(\d+)\.(\d+)')
+_VTT_TAG = re.compile(r'<[^>]+>')
+
+
+def select_track(info, languages, accept_auto=True):
+    """Pick the best caption track from yt-dlp video info.
+
+    Manual subtitles are preferred over automatic captions, then the order of
+    languages, then SUPPORTED_FORMATS. Returns a dict with url, ext, language
+    and kind ('manual' or 'auto'), or None when nothing usable exists.
+    """
+    sources = [('manual', info.get('subtitles') or {})]
+    if accept_auto:
+        sources.append(('auto', info.get('automatic_captions') or {}))
+
+    for kind, tracks in sources:
+        for language in languages:
+            # Manual tracks are often tagged with a region, e.g. en-US or en-GB
+            candidates = [key for key in tracks if key == language or key.startswith(f"{language}-")]
+            for key in candidates:
+                for ext in SUPPORTED_FORMATS:
+                    for track in tracks[key]:
+                        if track.get('ext') == ext and track.get('url'):
+                            return {'url': track['url'], 'ext': ext, 'language': key, 'kind': kind}
+    return None
+
+
+def parse_json3(data):
+    """Parse a YouTube json3 caption track into segments."""
+    segments = []
+    for event in json.loads(data).get('events', []):
+        text = "".join(seg.get('utf8', '') for seg in event.get('segs', []))
+        text = " ".join(text.split())
+        if not text:
+            continue
+        start = event.get('tStartMs', 0) / 1000
+        segments.append({
+            'start': start,
+            'end': start + event.get('dDurationMs', 0) / 1000,
+            'text': f" {text}"
+        })
+    return segments
+
+
+def _vtt_seconds(hours, minutes, seconds, millis):
+    return int((hours or '0:')[:-1]) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def parse_vtt(data):
+    """Parse a WebVTT caption track into segments.
+
+    Automatic captions repeat the previous line at the top of every cue, so
+    lines identical to the last emitted one are skipped.
+    """
+    segments = []
+    last_line = None
+    for block in re.split(r'\n\s*\n', data.replace('\r\n', '\n')):
+        lines = block.strip().split('\n')
+        timing_index = next((i for i, line in enumerate(lines) if _VTT_TIMING.search(line)), None)
+        if timing_index is None:
+            continue
+        match = _VTT_TIMING.search(lines[timing_index])
+        start = _vtt_seconds(*match.group(1, 2, 3, 4))
+        end = _vtt_seconds(*match.group(5, 6, 7, 8))
+
+        new_lines = []
+        for line in lines[timing_index + 1:]:
+            line = " ".join(_VTT_TAG.sub('', line).split())
+            if line and line != last_line:
+                new_lines.append(line)
+                last_line = line
+        if new_lines:
+            segments.append({'start': start, 'end': end, 'text': " " + " ".join(new_lines)})
+    return segments
+
+
+def parse_track(data, ext):
+    """Parse caption data in one of SUPPORTED_FORMATS into segments."""
+    if ext == 'json3':
+        return parse_json3(data)
+    if ext == 'vtt':
+        return parse_vtt(data)
+    raise ValueError(f"Unsupported caption format: {ext}")
+
+
+def check_quality(segments, duration, kind, min_words_per_minute, min_coverage):
+    """Decide whether captions are good enough to skip Whisper.
+
+    Manual captions only need to be non-empty. Automatic captions must also
+    have a plausible speech density and cover enough of the video, which
+    filters out music-only and partially captioned videos. Returns
+    (acceptable, reason).
+    """
+    if not segments:
+        return False, "no caption text"
+    if kind == 'manual' or not duration:
+        return True, f"{kind} captions"
+
+    minutes = duration / 60
+    words = sum(len(segment['text'].split()) for segment in segments)
+    words_per_minute = words / minutes
+    if words_per_minute < min_words_per_minute:
+        return False, f"only {words_per_minute:.0f} words/minute"
+
+    coverage = (segments[-1]['end'] - segments[0]['start']) / duration
+    if coverage < min_coverage:
+        return False, f"captions cover only {coverage:.0%} of the video"
+
+    return True, f"auto captions ({words_per_minute:.0f} words/minute, {coverage:.0%} coverage)"
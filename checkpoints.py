@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import shutil
+import logging
+from config import CHECKPOINT_DIR, CHECKPOINT_MAX_AGE_DAYS
+
+
+class VideoCheckpoint:
+    """Stage results of one video for one transcript variant.
+
+    The variant is the Whisper model that produced the transcript, or
+    'captions' when YouTube captions were used, so switching models never
+    reuses a transcript made by a different one.
+    """
+
+    def __init__(self, root, video_id, variant):
+        self.video_id = video_id
+        self.variant = variant
+        self.dir = os.path.join(root, video_id, variant)
+
+    def path(self, name):
+        """Path of a file inside this checkpoint's directory."""
+        os.makedirs(self.dir, exist_ok=True)
+        return os.path.join(self.dir, name)
+
+    def _touch(self, path):
+        """Mark a checkpoint file as used so expiry measures age from the last retry."""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def has(self, stage):
+        return self._touch(os.path.join(self.dir, f"{stage}.json"))
+
+    def load(self, stage):
+        """Return the saved data of a stage, or None if it hasn't completed."""
+        path = os.path.join(self.dir, f"{stage}.json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return data
+
+    def save(self, stage, data):
+        """Atomically persist the result of a completed stage."""
+        path = self.path(f"{stage}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+class CheckpointStore:
+    """Per-video checkpoints of the transcript, formatted text and summary.
+
+    A failed video is retried from the first stage without a checkpoint
+    instead of being downloaded and transcribed again. Checkpoints are
+    removed once a video is published, and expire() cleans up those of
+    videos that were never retried.
+    """
+
+    STAGES = ('transcript', 'formatted', 'summary')
+
+    def __init__(self, root=CHECKPOINT_DIR, max_age_days=CHECKPOINT_MAX_AGE_DAYS):
+        self.root = root
+        self.max_age = max_age_days * 86400
+        os.makedirs(root, exist_ok=True)
+
+    def get(self, video_id, variant):
+        return VideoCheckpoint(self.root, video_id, variant)
+
+    def find_transcript(self, video_id, preferred=None):
+        """Return a checkpoint that already holds a transcript for the video, or None.
+
+        The preferred variant wins when several exist.
+        """
+        video_dir = os.path.join(self.root, video_id)
+        if not os.path.isdir(video_dir):
+            return None
+        variants = sorted(os.listdir(video_dir), key=lambda variant: variant != preferred)
+        for variant in variants:
+            checkpoint = self.get(video_id, variant)
+            if checkpoint.has('transcript'):
+                return checkpoint
+        return None
+
+    def clear(self, video_id):
+        """Remove all checkpoints of a video."""
+        shutil.rmtree(os.path.join(self.root, video_id), ignore_errors=True)
+
+    def expire(self, keep=()):
+        """Delete checkpoints unused for longer than max age; returns the expired video IDs.
+
+        Loading a checkpoint counts as using it, and videos in keep (e.g.
+        those still queued for a retry) are never expired.
+        """
+        expired = []
+        cutoff = time.time() - self.max_age
+        for video_id in os.listdir(self.root):
+            if video_id in keep:
+                continue
+            video_dir = os.path.join(self.root, video_id)
+            newest = 0
+            for root, _, files in os.walk(video_dir):
+                for name in files:
+                    try:
+                        newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+                    except FileNotFoundError:
+                        pass
+            if newest < cutoff:
+                self.clear(video_id)
+                expired.append(video_id)
+        if expired:
+            logging.info(f"Expired checkpoints of {len(expired)} videos")
+        return expired
@@ -0,0 +1,148 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Token text ending in one of these closes a sentence
+_SENTENCE_END = ('.', '?', '!', '."', '?"', '!"', '…')
+
+# Boundary flags per token
+STARTS_WORD = 1
+ENDS_SENTENCE = 2
+
+
+class ChunkPlanner:
+    """Split transcripts into token-bounded chunks from a single encoding pass.
+
+    A transcript is encoded once; chunks are then cut on token offsets,
+    preferring the end of a sentence or a line break (transcripts put each
+    Whisper segment on its own line), then a word boundary, and only as a
+    last resort mid-word. Encodings and plans are cached per transcript. The
+    streaming formatter tokenizes each segment as it arrives and hands the
+    joined tokens to remember(), so the summary plans the finished transcript
+    without encoding it again.
+    """
+
+    def __init__(self, encoding, cache_size=8):
+        self.encoding = encoding
+        self.cache_size = cache_size
+        self._encoded = OrderedDict()  # digest -> (tokens, boundary flags)
+        self._plans = OrderedDict()    # (digest, max_tokens, overlap) -> spans
+        self._token_kinds = {}         # token id -> boundary flags, shared across texts
+        self._lock = threading.Lock()
+
+    def _token_kind(self, token):
+        """Return boundary flags for a token.
+
+        STARTS_WORD: a chunk may end right before this token.
+        ENDS_SENTENCE: a chunk may end right after it (sentence or line end).
+        """
+        kind = self._token_kinds.get(token)
+        if kind is None:
+            text = self.encoding.decode_single_token_bytes(token).decode('utf-8', errors='ignore')
+            kind = 0
+            if text[:1].isspace():
+                kind |= STARTS_WORD
+            if '\n' in text or text.rstrip().endswith(_SENTENCE_END):
+                kind |= ENDS_SENTENCE
+            self._token_kinds[token] = kind
+        return kind
+
+    def _cache_put(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _cached(self, text):
+        """Return (digest, cached (tokens, kinds) or None) for text."""
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        with self._lock:
+            cached = self._encoded.get(digest)
+            if cached is not None:
+                self._encoded.move_to_end(digest)
+        return digest, cached
+
+    def _store(self, digest, tokens):
+        kinds = [self._token_kind(token) for token in tokens]
+        with self._lock:
+            self._cache_put(self._encoded, digest, (tokens, kinds))
+        return digest, tokens, kinds
+
+    def _encode(self, text):
+        """Return (digest, tokens, kinds) for text, encoding it at most once."""
+        digest, cached = self._cached(text)
+        if cached is not None:
+            return (digest,) + cached
+        return self._store(digest, self.encoding.encode(text))
+
+    def remember(self, text, tokens):
+        """Cache tokens the caller already produced for text (they must decode back to it)."""
+        digest, cached = self._cached(text)
+        if cached is None:
+            self._store(digest, tokens)
+
+    def count_tokens(self, text):
+        """Count tokens, reusing a cached encoding when the text was already planned.
+
+        Other text (prompts, single segments) is encoded without being cached,
+        so counting it never pushes a planned transcript out of the cache.
+        """
+        digest, cached = self._cached(text)
+        if cached is not None:
+            return len(cached[0])
+        return len(self.encoding.encode(text))
+
+    def _find_end(self, kinds, start, limit):
+        """Pick the best chunk end in (start, limit] for a chunk starting at start."""
+        if limit >= len(kinds):
+            return len(kinds)
+
+        # Don't accept a boundary that would leave the chunk less than half full
+        floor = start + max(1, (limit - start) // 2)
+        for end in range(limit, floor - 1, -1):
+            if kinds[end - 1] & ENDS_SENTENCE:
+                return end
+        for end in range(limit, floor - 1, -1):
+            if kinds[end] & STARTS_WORD:
+                return end
+        return limit
+
+    def plan(self, text, max_tokens=4000, overlap=0):
+        """Return the (start, end) token spans for text.
+
+        Consecutive chunks share about `overlap` tokens, which gives LLM
+        stages that need context (e.g. summaries) some continuity.
+        """
+        digest, tokens, kinds = self._encode(text)
+        key = (digest, max_tokens, overlap)
+        with self._lock:
+            spans = self._plans.get(key)
+            if spans is not None:
+                self._plans.move_to_end(key)
+                return spans
+
+        overlap = max(0, min(overlap, max_tokens // 2))
+        spans = []
+        start = 0
+        while start < len(tokens):
+            end = self._find_end(kinds, start, start + max_tokens)
+            spans.append((start, end))
+            if end >= len(tokens):
+                break
+            next_start = end - overlap
+            # Start the overlap at a word boundary when there is one nearby
+            while overlap and next_start < end and not kinds[next_start] & STARTS_WORD:
+                next_start += 1
+            start = next_start if next_start > start else end
+
+        with self._lock:
+            self._cache_put(self._plans, key, spans)
+        return spans
+
+    def chunks(self, text, max_tokens=4000, overlap=0):
+        """Return the chunk texts for text (see plan)."""
+        tokens = self._encode(text)[1]
+        return [
+            self.encoding.decode(tokens[start:end]).strip()
+            for start, end in self.plan(text, max_tokens, overlap)
+        ]
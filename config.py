@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -7,19 +8,129 @@ load_dotenv()
 # YouTube API Configuration
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 PLAYLIST_ID = os.getenv('PLAYLIST_ID')
+# Several playlists, comma-separated; defaults to PLAYLIST_ID
+PLAYLIST_IDS = [p.strip() for p in os.getenv('PLAYLIST_IDS', PLAYLIST_ID or '').split(',') if p.strip()]
+PLAYLIST_SYNC_MODE = os.getenv('PLAYLIST_SYNC_MODE', 'incremental')  # 'incremental' or 'full'
+PLAYLIST_FULL_SYNC_INTERVAL = int(os.getenv('PLAYLIST_FULL_SYNC_INTERVAL', '12'))  # Incremental polls between full resyncs
+
+# Audio download format: 'native' keeps YouTube's smallest suitable audio stream
+# (opus/m4a) and lets Whisper decode it directly, 'mp3' re-encodes to 192 kbps MP3
+AUDIO_FORMAT = os.getenv('AUDIO_FORMAT', 'native')
+
+# Caption fast path: use existing YouTube captions instead of downloading audio for Whisper
+CAPTIONS_FIRST = os.getenv('CAPTIONS_FIRST', 'true').lower() == 'true'
+CAPTION_LANGUAGES = [lang.strip() for lang in os.getenv('CAPTION_LANGUAGES', 'en').split(',') if lang.strip()]
+CAPTION_ACCEPT_AUTO = os.getenv('CAPTION_ACCEPT_AUTO', 'true').lower() == 'true'  # Allow auto-generated captions
+CAPTION_MIN_WORDS_PER_MINUTE = int(os.getenv('CAPTION_MIN_WORDS_PER_MINUTE', '50'))  # Auto captions below this are rejected
+CAPTION_MIN_COVERAGE = float(os.getenv('CAPTION_MIN_COVERAGE', '0.5'))  # Fraction of the video auto captions must span
 
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv('SUMMARY_CHUNK_OVERLAP_TOKENS', '0'))  # Context shared between summary chunks
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '4000'))  # Transcript tokens per chunk summary
+SUMMARY_REDUCE_TOKENS = int(os.getenv('SUMMARY_REDUCE_TOKENS', '4000'))  # Partial summaries combined per request
+SUMMARY_MAX_TOKENS = int(os.getenv('SUMMARY_MAX_TOKENS', '800'))  # Reply limit of every summary request
+SUMMARY_CONTEXT_TOKENS = int(os.getenv('SUMMARY_CONTEXT_TOKENS', '16385'))  # Context window of the summary model
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))  # Parallel OpenAI requests across all videos
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '500'))
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '90000'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '5'))  # Retries for 429/5xx/connection errors
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'  # Reuse replies for identical prompts
+LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', 'llm_cache')
+LLM_CACHE_MAX_MB = int(os.getenv('LLM_CACHE_MAX_MB', '200'))
+
+# Whisper Configuration
+WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')
+WHISPER_BACKEND = os.getenv('WHISPER_BACKEND', 'openai-whisper')  # 'openai-whisper' or 'faster-whisper'
+WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', 'int8')  # faster-whisper quantization
+# Pick the model by audio length, e.g. "900:small,3600:base" (longer audio uses WHISPER_MODEL)
+WHISPER_MODEL_BY_DURATION = sorted(
+    (int(limit), model.strip())
+    for limit, model in (
+        entry.split(':') for entry in os.getenv('WHISPER_MODEL_BY_DURATION', '').split(',') if entry.strip()
+    )
+)
+WHISPER_PARALLEL = os.getenv('WHISPER_PARALLEL', 'true').lower() == 'true'  # Chunked multi-process transcription
+WHISPER_PARALLEL_MIN_SECONDS = int(os.getenv('WHISPER_PARALLEL_MIN_SECONDS', '1200'))  # Only for audio at least this long
+WHISPER_CHUNK_SECONDS = int(os.getenv('WHISPER_CHUNK_SECONDS', '600'))  # Target chunk length, cut at silence
+WHISPER_STREAMING = os.getenv('WHISPER_STREAMING', 'true').lower() == 'true'  # Decode audio window by window instead of whole
+WHISPER_STREAM_OVERLAP_SECONDS = int(os.getenv('WHISPER_STREAM_OVERLAP_SECONDS', '10'))  # Context shared by consecutive windows
+WHISPER_PARALLEL_WORKERS = int(os.getenv('WHISPER_PARALLEL_WORKERS', '0'))  # 0 = one per CPU core
+WHISPER_BATCH = os.getenv('WHISPER_BATCH', 'true').lower() == 'true'  # Transcribe queued short videos together
+WHISPER_BATCH_MAX_SECONDS = int(os.getenv('WHISPER_BATCH_MAX_SECONDS', '600'))  # Only videos up to this long are batched
+WHISPER_BATCH_VIDEOS = int(os.getenv('WHISPER_BATCH_VIDEOS', '4'))  # Max videos per batch
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '8'))  # 30-second windows per forward pass
 
 # Google Drive Configuration
 GOOGLE_DRIVE_CREDS_FILE = os.getenv('GOOGLE_DRIVE_CREDS_FILE')
 GDRIVE_UNREAD_FOLDER_ID = os.getenv('GDRIVE_UNREAD_FOLDER_ID')  # Folder for new transcripts
 GDRIVE_PROCESSED_FOLDER_ID = os.getenv('GDRIVE_PROCESSED_FOLDER_ID')  # Folder for processed docs
 OBSIDIAN_VAULT_PATH = os.getenv('OBSIDIAN_VAULT_PATH')  # Path to Obsidian vault
+GDRIVE_SYNC_MODE = os.getenv('GDRIVE_SYNC_MODE', 'changes')  # 'changes' (incremental) or 'list'
+GDRIVE_UPLOAD_MODE = os.getenv('GDRIVE_UPLOAD_MODE', 'media')  # 'media' (HTML upload) or 'insert' (create + insertText)
+GDRIVE_API_ENDPOINT = os.getenv('GDRIVE_API_ENDPOINT')  # Override the Google API host, e.g. a local fake Drive server
 
 # File Paths
-TRANSCRIPTS_DIR = 'transcripts'
-PROCESSED_VIDEOS_FILE = 'processed_videos.json'
+TRANSCRIPTS_DIR = 'transcripts'  # Local transcript output
+AUDIO_SPOOL_DIR = os.getenv('AUDIO_SPOOL_DIR', 'audio_spool')  # Downloaded audio waiting for Whisper
+AUDIO_SPOOL_BUDGET_MB = int(os.getenv('AUDIO_SPOOL_BUDGET_MB', '4096'))  # Max audio kept on disk at once
+AUDIO_SPOOL_MIN_FREE_MB = int(os.getenv('AUDIO_SPOOL_MIN_FREE_MB', '1024'))  # Free disk space downloads must leave
+AUDIO_SPOOL_MAX_WAIT_SECONDS = int(os.getenv('AUDIO_SPOOL_MAX_WAIT_SECONDS', '900'))  # Then the download fails and is retried later
+PROCESSED_VIDEOS_FILE = 'processed_videos.json'  # Legacy list, migrated into STATE_DB_FILE on first run
+STATE_DB_FILE = os.getenv('STATE_DB_FILE', 'video_state.db')
+PLAYLIST_SYNC_FILE = 'playlist_sync.json'
+DRIVE_SYNC_FILE = 'drive_sync.json'
+CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', 'checkpoints')  # Per-video stage results for resuming failed videos
+CHECKPOINT_MAX_AGE_DAYS = int(os.getenv('CHECKPOINT_MAX_AGE_DAYS', '7'))
+
+# Pipeline Configuration
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', '2'))  # Parallel yt-dlp downloads
+TRANSCRIBE_WORKERS = int(os.getenv('TRANSCRIBE_WORKERS', '1'))  # Whisper workers (each one is CPU heavy)
+PUBLISH_WORKERS = int(os.getenv('PUBLISH_WORKERS', '2'))  # OpenAI formatting/summary + Drive upload
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '4'))  # Max videos waiting between stages
+
+# Polling Schedule: each source polls at its minimum interval after finding work and
+# backs off by POLL_BACKOFF per idle poll up to its maximum
+PLAYLIST_POLL_MIN_SECONDS = int(os.getenv('PLAYLIST_POLL_MIN_SECONDS', '60'))
+PLAYLIST_POLL_MAX_SECONDS = int(os.getenv('PLAYLIST_POLL_MAX_SECONDS', '1800'))
+DRIVE_POLL_MIN_SECONDS = int(os.getenv('DRIVE_POLL_MIN_SECONDS', '60'))
+DRIVE_POLL_MAX_SECONDS = int(os.getenv('DRIVE_POLL_MAX_SECONDS', '900'))
+POLL_BACKOFF = float(os.getenv('POLL_BACKOFF', '2'))
+POLL_JITTER = float(os.getenv('POLL_JITTER', '0.1'))  # Random +/- fraction added to every interval
+
+# WebSub push notifications: a hub POSTs to WEBSUB_CALLBACK_URL (which must reach
+# WEBSUB_HOST:WEBSUB_PORT, e.g. through a reverse proxy) and the playlists are polled at once
+WEBSUB_ENABLED = os.getenv('WEBSUB_ENABLED', 'false').lower() == 'true'
+WEBSUB_HOST = os.getenv('WEBSUB_HOST', '127.0.0.1')
+WEBSUB_PORT = int(os.getenv('WEBSUB_PORT', '9109'))
+WEBSUB_PATH = os.getenv('WEBSUB_PATH', '/websub')
+WEBSUB_CALLBACK_URL = os.getenv('WEBSUB_CALLBACK_URL')  # Public URL of the receiver; no subscriptions without it
+WEBSUB_HUB_URL = os.getenv('WEBSUB_HUB_URL', 'https://pubsubhubbub.appspot.com/subscribe')
+# Feeds to subscribe to, e.g. https://www.youtube.com/xml/feeds/videos.xml?channel_id=...
+WEBSUB_TOPICS = [t.strip() for t in os.getenv('WEBSUB_TOPICS', '').split(',') if t.strip()]
+WEBSUB_SECRET = os.getenv('WEBSUB_SECRET')  # Verifies the hub's X-Hub-Signature
+WEBSUB_LEASE_SECONDS = int(os.getenv('WEBSUB_LEASE_SECONDS', '432000'))
+
+# Job Queue Configuration (put JOB_QUEUE_DB on shared storage to let several nodes share the backlog)
+JOB_QUEUE_DB = os.getenv('JOB_QUEUE_DB', 'job_queue.db')
+NODE_ID = os.getenv('NODE_ID', socket.gethostname())  # Must be unique per node and stable across restarts
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '600'))  # A crashed node's videos are reclaimed after this
+JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', '60'))  # How often held leases are renewed
+JOB_RETRY_SECONDS = int(os.getenv('JOB_RETRY_SECONDS', '300'))  # Delay before a failed video is claimable again
+
+# Metrics Configuration
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))  # Prometheus endpoint; 0 disables the HTTP server
+METRICS_SNAPSHOT_FILE = os.getenv('METRICS_SNAPSHOT_FILE', 'metrics.json')
+METRICS_SNAPSHOT_SECONDS = int(os.getenv('METRICS_SNAPSHOT_SECONDS', '60'))
+
+# Profiling Configuration (SIGUSR1 toggles CPU profiling, SIGUSR2 memory profiling)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'true').lower() == 'true'
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.05'))  # Seconds between stack samples
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '900'))  # Sessions left running stop after this
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv('PROFILE_TRACEMALLOC_FRAMES', '10'))  # Stack depth per allocation
 
 # Markdown Templates
 GDRIVE_DOC_TEMPLATE = """
@@ -33,6 +144,7 @@ Links:
 Created: {created_date}
 Source: {url}
 Author: {channel}
+VideoID: {video_id}
 Collection: YouTube
 Processed: {processed_date}
 Rating:
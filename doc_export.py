@@ -0,0 +1,67 @@
+import re
+import html
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*)$')
+_LIST_ITEM = re.compile(r'^\s*[-*]\s+(.*)$')
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+_ITALIC = re.compile(r'(?<!\*)\*(?!\s)(.+?)(?<!\s)\*(?!\*)')
+
+
+def _inline(text):
+    """Escape text and convert **bold** and *italic* spans."""
+    text = html.escape(text, quote=False)
+    text = _BOLD.sub(r'<b>\1</b>', text)
+    return _ITALIC.sub(r'<i>\1</i>', text)
+
+
+def markdown_to_html(lines):
+    """Convert the Markdown of a transcript document to HTML, yielding it piece by piece.
+
+    Only what create_transcript_doc produces is supported: ATX headings,
+    paragraphs separated by blank lines, "- " list items and bold/italic
+    text. Lines are consumed one at a time, so the input can be a file.
+    """
+    yield '<html><head><meta charset="utf-8"></head><body>\n'
+    paragraph = []
+    in_list = False
+
+    def close_paragraph():
+        if paragraph:
+            text = " ".join(paragraph)
+            paragraph.clear()
+            return f"<p>{_inline(text)}</p>\n"
+        return ""
+
+    for line in lines:
+        line = line.rstrip('\n')
+        heading = _HEADING.match(line)
+        item = _LIST_ITEM.match(line)
+
+        if heading or item or not line.strip():
+            yield close_paragraph()
+        if in_list and not item:
+            yield "</ul>\n"
+            in_list = False
+
+        if heading:
+            level = len(heading.group(1))
+            yield f"<h{level}>{_inline(heading.group(2).strip())}</h{level}>\n"
+        elif item:
+            if not in_list:
+                yield "<ul>\n"
+                in_list = True
+            yield f"<li>{_inline(item.group(1).strip())}</li>\n"
+        elif line.strip():
+            paragraph.append(line.strip())
+
+    yield close_paragraph()
+    if in_list:
+        yield "</ul>\n"
+    yield "</body></html>\n"
+
+
+def write_html(markdown, path):
+    """Write the HTML version of a Markdown string to path."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for piece in markdown_to_html(markdown.splitlines()):
+            f.write(piece)
@@ -1,18 +1,31 @@
 import os
+import json
+import time
+import logging
+import threading
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
 import pickle
 import io
 from datetime import datetime
 import re
+import tempfile
+from doc_export import write_html
+from vault_writer import VaultWriter
+from metrics import metrics
 from config import (
     GOOGLE_DRIVE_CREDS_FILE,
     GDRIVE_UNREAD_FOLDER_ID,
     GDRIVE_PROCESSED_FOLDER_ID,
     OBSIDIAN_VAULT_PATH,
+    GDRIVE_SYNC_MODE,
+    GDRIVE_API_ENDPOINT,
+    GDRIVE_UPLOAD_MODE,
+    TRANSCRIPTS_DIR,
+    DRIVE_SYNC_FILE,
     GDRIVE_DOC_TEMPLATE,
     OBSIDIAN_NOTE_TEMPLATE
 )
@@ -22,11 +35,45 @@ class GoogleDriveHandler:
         'https://www.googleapis.com/auth/drive.file',
         'https://www.googleapis.com/auth/drive.metadata.readonly'
     ]
+    # Google accepts up to 100 calls per batch request; stay well below to keep responses small
+    BATCH_SIZE = 50
+    # Resumable upload chunk size; must be a multiple of 256 KB
+    UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
 
     def __init__(self):
         self.creds = self._get_credentials()
-        self.service = build('drive', 'v3', credentials=self.creds)
-        self.docs_service = build('docs', 'v1', credentials=self.creds)
+        self._local = threading.local()
+        self.sync_state = self._load_sync_state()
+        # Without a vault, transcripts are still uploaded but processed Docs are left in Drive
+        self.vault = VaultWriter(OBSIDIAN_VAULT_PATH) if OBSIDIAN_VAULT_PATH else None
+
+    def _clients(self):
+        """Return the (Drive, Docs) clients of the calling thread.
+
+        googleapiclient clients share one httplib2.Http, which is not
+        thread-safe, so each thread (publish workers, the Drive poller)
+        builds its own from the shared credentials.
+        """
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            client_options = {'api_endpoint': GDRIVE_API_ENDPOINT} if GDRIVE_API_ENDPOINT else None
+            # Use the discovery documents bundled with the client library instead of fetching them
+            clients = (
+                build('drive', 'v3', credentials=self.creds, static_discovery=True,
+                      cache_discovery=False, client_options=client_options),
+                build('docs', 'v1', credentials=self.creds, static_discovery=True,
+                      cache_discovery=False, client_options=client_options)
+            )
+            self._local.clients = clients
+        return clients
+
+    @property
+    def service(self):
+        return self._clients()[0]
+
+    @property
+    def docs_service(self):
+        return self._clients()[1]
 
     def _get_credentials(self):
         """Get valid credentials for Google Drive API."""
@@ -50,16 +97,128 @@ class GoogleDriveHandler:
 
         return creds
 
-    def create_doc(self, title, content, video_info):
-        """Create a new Google Doc in the unread folder."""
+    def _execute(self, label, request):
+        """Execute a single API request, logging its latency."""
+        start_time = time.time()
+        try:
+            response = request.execute()
+        except Exception:
+            metrics.inc('api_calls_total', api='drive', method=label, result='error')
+            raise
+        elapsed = time.time() - start_time
+        logging.info(f"Drive API {label} took {elapsed * 1000:.0f}ms")
+        metrics.observe('api_call_seconds', elapsed, api='drive', method=label)
+        metrics.inc('api_calls_total', api='drive', method=label, result='success')
+        return response
+
+    def _execute_batch(self, label, service, requests):
+        """Execute (key, request) pairs through the batch HTTP endpoint of service.
+
+        The requests are sent BATCH_SIZE per round-trip. Returns a dict of
+        key -> (response, error); a failed call doesn't affect the others, and
+        if a whole batch request fails, each of its calls gets that error.
+        Calls are counted one by one, but latency is only known per round-trip
+        and goes to api_batch_seconds.
+        """
+        results = {}
+
+        def callback(request_id, response, exception):
+            results[request_id] = (response, exception)
+            metrics.inc('api_calls_total', api='drive', method=label, result='error' if exception else 'success')
+
+        for i in range(0, len(requests), self.BATCH_SIZE):
+            chunk = requests[i:i + self.BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=callback)
+            for key, request in chunk:
+                batch.add(request, request_id=key)
+            start_time = time.time()
+            try:
+                batch.execute()
+            except Exception as e:
+                logging.error(f"Drive API batch {label} ({len(chunk)} calls) failed: {str(e)}")
+                for key, _ in chunk:
+                    if key not in results:
+                        results[key] = (None, e)
+                        metrics.inc('api_calls_total', api='drive', method=label, result='error')
+                metrics.observe('api_batch_seconds', time.time() - start_time, api='drive', method=label)
+                continue
+            elapsed = time.time() - start_time
+            failed = sum(1 for key, _ in chunk if results.get(key, (None, None))[1] is not None)
+            logging.info(f"Drive API batch {label} ({len(chunk)} calls, {failed} failed) took {elapsed * 1000:.0f}ms")
+            metrics.observe('api_batch_seconds', elapsed, api='drive', method=label)
+        return results
+
+    def _doc_metadata(self, title, video_info=None):
+        """File metadata for a new transcript Doc.
+
+        The video's ID, URL and channel are stored as appProperties so the
+        Obsidian note can be filled in when the Doc is processed.
+        """
         doc_metadata = {
             'name': title,
             'parents': [GDRIVE_UNREAD_FOLDER_ID],
             'mimeType': 'application/vnd.google-apps.document'
         }
+        if video_info:
+            # Key plus value of an appProperty may be at most 124 bytes
+            doc_metadata['appProperties'] = {
+                'video_id': video_info.get('id', ''),
+                'url': video_info.get('url', '')[:100],
+                'channel': video_info.get('channel', '').encode('utf-8')[:100].decode('utf-8', errors='ignore')
+            }
+        return doc_metadata
+
+    def create_doc(self, title, content, video_info):
+        """Create a new Google Doc in the unread folder."""
+        if GDRIVE_UPLOAD_MODE == 'media':
+            return self.upload_doc(title, content, video_info)
+        return self.insert_doc(title, content, video_info)
+
+    def upload_doc(self, title, content, video_info=None):
+        """Create the Google Doc in one resumable upload of the content converted to HTML.
+
+        Drive converts the HTML into a Doc, keeping headings and paragraphs.
+        The HTML is written to a temporary file and streamed from disk in
+        UPLOAD_CHUNK_SIZE pieces, so long transcripts don't hit the request
+        size limits of documents.batchUpdate. The Markdown content itself is
+        still passed in as one string, so the document is held in memory
+        once while it is converted.
+        """
+        doc_metadata = self._doc_metadata(title, video_info)
 
-        # Create empty doc
-        doc = self.service.files().create(body=doc_metadata).execute()
+        os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
+        fd, html_path = tempfile.mkstemp(suffix='.html', dir=TRANSCRIPTS_DIR)
+        os.close(fd)
+        try:
+            write_html(GDRIVE_DOC_TEMPLATE.format(transcript=content), html_path)
+            media = MediaFileUpload(html_path, mimetype='text/html', chunksize=self.UPLOAD_CHUNK_SIZE, resumable=True)
+            request = self.service.files().create(body=doc_metadata, media_body=media, fields='id')
+
+            start_time = time.time()
+            response = None
+            try:
+                while response is None:
+                    _, response = request.next_chunk()
+            except Exception:
+                logging.error(f"Drive API files.create upload failed after {(time.time() - start_time) * 1000:.0f}ms")
+                metrics.observe('api_call_seconds', time.time() - start_time, api='drive', method='files.create upload')
+                metrics.inc('api_calls_total', api='drive', method='files.create upload', result='error')
+                raise
+            size_kb = os.path.getsize(html_path) / 1024
+            elapsed = time.time() - start_time
+            logging.info(f"Drive API files.create upload ({size_kb:.0f} KB) took {elapsed * 1000:.0f}ms")
+            metrics.observe('api_call_seconds', elapsed, api='drive', method='files.create upload')
+            metrics.inc('api_calls_total', api='drive', method='files.create upload', result='success')
+            return response.get('id')
+        finally:
+            os.remove(html_path)
+
+    def insert_doc(self, title, content, video_info=None):
+        """Create an empty Google Doc, then insert the content as plain text."""
+        doc_metadata = self._doc_metadata(title, video_info)
+
+        # Create empty doc; the text insert depends on its ID, so these two calls can't be batched
+        doc = self._execute("files.create", self.service.files().create(body=doc_metadata, fields='id'))
         doc_id = doc.get('id')
 
         # Format content using template
@@ -73,15 +232,18 @@ class GoogleDriveHandler:
             }
         }]
 
-        self.docs_service.documents().batchUpdate(
+        self._execute("documents.batchUpdate", self.docs_service.documents().batchUpdate(
             documentId=doc_id,
             body={'requests': requests}
-        ).execute()
+        ))
 
         return doc_id
 
-    def _extract_highlights(self, doc_content):
-        """Extract highlighted text and comments from Google Doc content."""
+    def _extract_highlights(self, doc_content, comments=None):
+        """Extract highlighted text from fetched Google Doc content, plus its comments.
+
+        comments is the Drive comments list of the document, if fetched.
+        """
         highlights = []
         
         # Extract text with background color (highlights)
@@ -97,32 +259,147 @@ class GoogleDriveHandler:
                             highlights.append(f"- {text}")
 
         # Extract comments
-        comments = self.docs_service.documents().get(
-            documentId=doc_content['documentId'],
-            suggestionsViewMode='PREVIEW_WITHOUT_SUGGESTIONS'
-        ).execute()
-        
-        for comment in comments.get('replies', []):
+        for comment in comments or []:
             content = comment.get('content', '').strip()
-            if content:
+            quoted = comment.get('quotedFileContent', {}).get('value', '').strip()
+            if content and quoted:
+                highlights.append(f"- Comment on \"{quoted}\": {content}")
+            elif content:
                 highlights.append(f"- Comment: {content}")
 
         return "\n".join(highlights) if highlights else "No highlights or comments found."
 
+    def _load_sync_state(self):
+        """Load the changes feed position for the processed folder."""
+        if os.path.exists(DRIVE_SYNC_FILE):
+            try:
+                with open(DRIVE_SYNC_FILE, 'r') as f:
+                    state = json.load(f)
+                if state.get('folder_id') == GDRIVE_PROCESSED_FOLDER_ID:
+                    return state
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable Drive sync state: {str(e)}")
+        return {'folder_id': GDRIVE_PROCESSED_FOLDER_ID, 'page_token': None, 'pending': {}}
+
+    def _save_sync_state(self):
+        """Atomically persist the changes feed position."""
+        tmp_path = f"{DRIVE_SYNC_FILE}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.sync_state, f)
+        os.replace(tmp_path, DRIVE_SYNC_FILE)
+
+    def _list_processed_files(self):
+        """List every file in the processed folder, following all result pages."""
+        files = []
+        page_token = None
+        while True:
+            results = self._execute("files.list", self.service.files().list(
+                q=f"'{GDRIVE_PROCESSED_FOLDER_ID}' in parents and trashed = false",
+                fields="nextPageToken, files(id, name, createdTime, appProperties)",
+                pageSize=1000,
+                pageToken=page_token
+            ))
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return files
+
     def check_for_processed_files(self):
-        """Check for files moved to the processed folder and convert them."""
-        # Query files in processed folder
-        results = self.service.files().list(
-            q=f"'{GDRIVE_PROCESSED_FOLDER_ID}' in parents",
-            fields="files(id, name, createdTime)"
-        ).execute()
-
-        for file in results.get('files', []):
-            # Get the document content
-            doc = self.docs_service.documents().get(documentId=file['id']).execute()
-            
+        """Check for files moved to the processed folder and convert them; return how many were found."""
+        files = self._list_processed_files()
+        self.convert_files(files)
+        return len(files)
+
+    def check_for_changes(self):
+        """Convert files that arrived in the processed folder since the last poll.
+
+        Uses the Drive changes feed, so a poll without changes costs a single
+        call. The first run lists the folder once to pick up files that were
+        already there, then follows the feed from its current position.
+        Returns the number of files found.
+        """
+        page_token = self.sync_state.get('page_token')
+        if not page_token:
+            start = self._execute("changes.getStartPageToken", self.service.changes().getStartPageToken())
+            files = self._list_processed_files()
+            failed = self.convert_files(files)
+            # The feed starts after these files, so failures have to be remembered for the retry
+            self.sync_state['page_token'] = start['startPageToken']
+            self.sync_state['pending'] = {file['id']: file for file in failed}
+            self._save_sync_state()
+            return len(files)
+
+        # Files whose conversion failed last time are retried even without a new change
+        files = dict(self.sync_state.get('pending', {}))
+        while True:
+            results = self._execute("changes.list", self.service.changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                includeRemoved=False,
+                pageSize=1000,
+                fields="nextPageToken, newStartPageToken, "
+                       "changes(fileId, removed, file(id, name, createdTime, parents, trashed, appProperties))"
+            ))
+            for change in results.get('changes', []):
+                file = change.get('file')
+                if change.get('removed') or not file or file.get('trashed'):
+                    files.pop(change.get('fileId'), None)
+                elif GDRIVE_PROCESSED_FOLDER_ID in file.get('parents', []):
+                    files[file['id']] = file
+                else:
+                    # Moved out again before we saw it
+                    files.pop(file['id'], None)
+            if 'newStartPageToken' in results:
+                new_page_token = results['newStartPageToken']
+                break
+            page_token = results['nextPageToken']
+
+        if files:
+            logging.info(f"Drive changes feed: {len(files)} new files in the processed folder")
+        failed = self.convert_files(list(files.values()))
+        # Only advance once the files are converted, so a crash re-reads the same changes
+        self.sync_state['page_token'] = new_page_token
+        self.sync_state['pending'] = {file['id']: file for file in failed}
+        self._save_sync_state()
+        return len(files)
+
+    def convert_files(self, files):
+        """Convert processed docs to Obsidian notes and delete them from Drive.
+
+        Documents, comments and deletes are each fetched with one batch
+        request per BATCH_SIZE files instead of several calls per file.
+        Returns the files that could not be fetched.
+        """
+        if not files:
+            return []
+
+        # Get the document content and comments
+        docs = self._execute_batch("documents.get", self.docs_service, [
+            (file['id'], self.docs_service.documents().get(documentId=file['id']))
+            for file in files
+        ])
+        comments = self._execute_batch("comments.list", self.service, [
+            (file['id'], self.service.comments().list(
+                fileId=file['id'],
+                fields="comments(content, quotedFileContent)",
+                pageSize=100
+            ))
+            for file in files
+        ])
+
+        converted, failed = [], []
+        for file in files:
+            doc, error = docs[file['id']]
+            if error:
+                logging.error(f"Failed to fetch document {file['name']}: {str(error)}")
+                failed.append(file)
+                continue
+            file_comments, error = comments[file['id']]
+            if error:
+                logging.warning(f"Failed to fetch comments of {file['name']}: {str(error)}")
+
             # Extract highlights and full content
-            highlights = self._extract_highlights(doc)
+            highlights = self._extract_highlights(doc, (file_comments or {}).get('comments'))
             full_content = self._extract_full_content(doc)
             
             # Create markdown file
@@ -130,11 +407,20 @@ class GoogleDriveHandler:
                 file['name'],
                 highlights,
                 full_content,
-                file['createdTime']
+                file['createdTime'],
+                file.get('appProperties')
             )
+            converted.append(file)
             
-            # Move file to archive or delete
-            self.service.files().delete(fileId=file['id']).execute()
+        # Move file to archive or delete
+        deleted = self._execute_batch("files.delete", self.service, [
+            (file['id'], self.service.files().delete(fileId=file['id']))
+            for file in converted
+        ])
+        for file in converted:
+            if deleted[file['id']][1]:
+                logging.error(f"Failed to delete {file['name']} from Drive: {str(deleted[file['id']][1])}")
+        return failed
 
     def _extract_full_content(self, doc):
         """Extract full content from Google Doc."""
@@ -150,8 +436,12 @@ class GoogleDriveHandler:
         
         return ''.join(content)
 
-    def _create_markdown_note(self, title, highlights, content, created_date):
-        """Create markdown note in Obsidian vault."""
+    def _create_markdown_note(self, title, highlights, content, created_date, properties=None):
+        """Create markdown note in Obsidian vault.
+
+        properties are the Doc's appProperties (video_id, url, channel), if any.
+        """
+        properties = properties or {}
         # Clean title for filename
         clean_title = re.sub(r'[^\w\s-]', '', title)
         clean_title = re.sub(r'[-\s]+', '-', clean_title).strip('-')
@@ -167,15 +457,21 @@ class GoogleDriveHandler:
             highlights=highlights,
             transcript=content,
             summary="", # Could be generated using OpenAI if needed
-            url="",  # Would need to be passed from video info
-            channel=""  # Would need to be passed from video info
+            url=properties.get('url', ''),
+            channel=properties.get('channel', ''),
+            video_id=properties.get('video_id', '')
         )
 
         # Save markdown file
-        filepath = os.path.join(OBSIDIAN_VAULT_PATH, f"{clean_title}.md")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(md_content)
+        filepath = self.vault.write(clean_title, md_content, properties.get('video_id'))
+        logging.info(f"Saved Obsidian note: {filepath}")
 
     def monitor_drive(self):
-        """Main monitoring function to be run periodically."""
-        self.check_for_processed_files()
+        """Main monitoring function to be run periodically; returns the number of processed files found."""
+        if self.vault is None:
+            # Converting would delete the Docs from Drive with nowhere to save the notes
+            logging.warning("OBSIDIAN_VAULT_PATH is not set, leaving processed Docs in Drive")
+            return 0
+        if GDRIVE_SYNC_MODE == 'changes':
+            return self.check_for_changes()
+        return self.check_for_processed_files()
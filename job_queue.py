@@ -0,0 +1,231 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from metrics import metrics
+from config import JOB_QUEUE_DB, NODE_ID, JOB_LEASE_SECONDS, JOB_HEARTBEAT_SECONDS, JOB_RETRY_SECONDS
+
+
+class JobQueue:
+    """Lease-based queue of videos shared by every node processing the playlists.
+
+    Polling enqueues videos, nodes claim them one at a time with a lease that
+    a heartbeat thread keeps extending, and finished videos are marked done so
+    no node picks them up again. A node that crashes stops renewing its
+    leases, and once they expire the videos are claimed by the next node that
+    asks. Claims rotate over the playlists so one long backlog cannot starve
+    the others.
+
+    The queue is a SQLite database; point JOB_QUEUE_DB at shared storage to
+    spread work over several machines, or leave it local for a single node.
+    """
+
+    PENDING = 'pending'
+    LEASED = 'leased'
+    DONE = 'done'
+
+    def __init__(self, db_path=JOB_QUEUE_DB, node_id=NODE_ID, lease_seconds=JOB_LEASE_SECONDS,
+                 retry_seconds=JOB_RETRY_SECONDS):
+        self.db_path = db_path
+        self.node_id = node_id
+        self.lease_seconds = lease_seconds
+        self.retry_seconds = retry_seconds
+        self._held = set()  # video IDs leased by this node
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly; the default rollback journal is used
+        # because WAL needs shared memory, which network filesystems don't provide
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                video_id TEXT PRIMARY KEY,
+                playlist_id TEXT NOT NULL,
+                video TEXT NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                lease_expires REAL,
+                available_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                enqueued_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (status, available_at)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS queue_meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._release_stale_own_leases()
+
+    def _release_stale_own_leases(self):
+        """Return leases this node held before a restart; nothing is in flight yet."""
+        with self._lock:
+            released = self._conn.execute(
+                'UPDATE jobs SET status = ?, owner = NULL, lease_expires = NULL WHERE status = ? AND owner = ?',
+                (self.PENDING, self.LEASED, self.node_id)
+            ).rowcount
+        if released:
+            logging.info(f"Released {released} leases left over from a previous run of node {self.node_id}")
+
+    def enqueue(self, videos):
+        """Add polled videos to the queue.
+
+        Videos already queued are left alone. Returns the number of videos
+        added and the IDs of videos that another node has already finished,
+        so the caller can record them.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                added = 0
+                for video in videos:
+                    added += self._conn.execute("""
+                        INSERT OR IGNORE INTO jobs (video_id, playlist_id, video, status, available_at, enqueued_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (video['id'], video.get('playlist_id', ''), json.dumps(video), self.PENDING, now, now)).rowcount
+                done = []
+                ids = [video['id'] for video in videos]
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    done.extend(row[0] for row in self._conn.execute(
+                        f"SELECT video_id FROM jobs WHERE status = ? AND video_id IN ({','.join('?' * len(chunk))})",
+                        [self.DONE] + chunk
+                    ))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        if added:
+            logging.info(f"Enqueued {added} new videos")
+        return added, done
+
+    def claim(self):
+        """Lease the next video, or return None if nothing is claimable.
+
+        Pending videos whose retry delay has passed and videos whose lease has
+        expired are claimable. Playlists take turns: the oldest claimable video
+        of the playlist after the one served last is taken.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('SELECT value FROM queue_meta WHERE key = ?', ('last_playlist',)).fetchone()
+                last_playlist = row[0] if row else ''
+                row = self._conn.execute("""
+                    SELECT video_id, playlist_id, video, status, owner FROM jobs
+                    WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?)
+                    ORDER BY playlist_id <= ?, playlist_id, enqueued_at
+                    LIMIT 1
+                """, (self.PENDING, now, self.LEASED, now, last_playlist)).fetchone()
+                if row is None:
+                    self._conn.execute('COMMIT')
+                    return None
+                video_id, playlist_id, video, status, owner = row
+                self._conn.execute("""
+                    UPDATE jobs SET status = ?, owner = ?, lease_expires = ?, attempts = attempts + 1
+                    WHERE video_id = ?
+                """, (self.LEASED, self.node_id, now + self.lease_seconds, video_id))
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO queue_meta (key, value) VALUES (?, ?)', ('last_playlist', playlist_id)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._held.add(video_id)
+
+        if status == self.LEASED:
+            logging.warning(f"Reclaimed video {video_id} from node {owner}, whose lease expired")
+            metrics.inc('job_leases_reclaimed_total')
+        metrics.inc('job_claims_total')
+        return json.loads(video)
+
+    def claims(self, should_exit=None):
+        """Yield claimed videos until nothing is claimable or should_exit() is True.
+
+        Videos are claimed only when the consumer asks for the next one, so a
+        node never holds more work than it is ready to start.
+        """
+        should_exit = should_exit or (lambda: False)
+        while not should_exit():
+            video = self.claim()
+            if video is None:
+                return
+            yield video
+
+    def complete(self, video_id, success, error=None):
+        """Finish a claimed video: done on success, else pending again after the retry delay.
+
+        A published video is marked done even if its lease was lost meanwhile.
+        """
+        with self._lock:
+            self._held.discard(video_id)
+            if success:
+                updated = self._conn.execute(
+                    'UPDATE jobs SET status = ?, owner = NULL, lease_expires = NULL, last_error = NULL '
+                    'WHERE video_id = ?',
+                    (self.DONE, video_id)
+                ).rowcount
+            else:
+                updated = self._conn.execute(
+                    'UPDATE jobs SET status = ?, owner = NULL, lease_expires = NULL, available_at = ?, last_error = ? '
+                    'WHERE video_id = ? AND owner = ? AND status = ?',
+                    (self.PENDING, time.time() + self.retry_seconds, error, video_id, self.node_id, self.LEASED)
+                ).rowcount
+        if not updated:
+            logging.warning(f"Lease on video {video_id} was lost before it finished; another node has taken it over")
+
+    def release(self):
+        """Return every lease this node holds to the queue, e.g. on shutdown."""
+        with self._lock:
+            held, self._held = self._held, set()
+            for video_id in held:
+                self._conn.execute(
+                    'UPDATE jobs SET status = ?, owner = NULL, lease_expires = NULL '
+                    'WHERE video_id = ? AND owner = ? AND status = ?',
+                    (self.PENDING, video_id, self.node_id, self.LEASED)
+                )
+        if held:
+            logging.info(f"Released {len(held)} unfinished leases")
+
+    def heartbeat(self):
+        """Extend the leases of every video this node holds."""
+        expires = time.time() + self.lease_seconds
+        with self._lock:
+            for video_id in list(self._held):
+                renewed = self._conn.execute(
+                    'UPDATE jobs SET lease_expires = ? WHERE video_id = ? AND owner = ? AND status = ?',
+                    (expires, video_id, self.node_id, self.LEASED)
+                ).rowcount
+                if not renewed:
+                    self._held.discard(video_id)
+                    logging.warning(f"Lease on video {video_id} was lost; another node has taken it over")
+
+    def start_heartbeat(self, interval=JOB_HEARTBEAT_SECONDS):
+        """Call heartbeat() every interval seconds from a background thread."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.heartbeat()
+                except sqlite3.Error as e:
+                    logging.warning(f"Could not renew job leases: {str(e)}")
+
+        thread = threading.Thread(target=run, name='job-heartbeat', daemon=True)
+        thread.start()
+        return thread
+
+    def active_ids(self):
+        """Return the IDs of videos still pending or leased by any node."""
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                'SELECT video_id FROM jobs WHERE status IN (?, ?)', (self.PENDING, self.LEASED)
+            )}
+
+    def counts(self):
+        """Return the number of jobs per status."""
+        with self._lock:
+            return dict(self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
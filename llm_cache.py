@@ -0,0 +1,102 @@
+import os
+import json
+import logging
+import hashlib
+import threading
+
+
+class LLMCache:
+    """Content-addressed on-disk cache of chat completion replies.
+
+    Entries are stored as one JSON file per request, named by the SHA-256 of
+    the model and messages, so a retried video gets identical prompts
+    answered from disk. A file's mtime is refreshed on every hit and the
+    least recently used entries are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        """Yield (path, mtime, size) for every cache file."""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def key(self, model, messages, max_tokens=None):
+        """Return the cache key for a request."""
+        payload = json.dumps({'model': model, 'messages': messages, 'max_tokens': max_tokens}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Return the cached reply for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = json.load(f)['content']
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, key, content):
+        """Store a reply, evicting least recently used entries if over budget."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'content': content}, f)
+        size = os.path.getsize(tmp_path)
+
+        with self._lock:
+            # Overwriting an entry replaces its size rather than adding to it
+            try:
+                size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete the oldest entries until the cache is at 90% of its budget."""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for path, _, size in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            removed += 1
+        logging.info(f"Evicted {removed} LLM cache entries, {self._size / (1024**2):.1f} MB remaining")
+
+    def stats(self):
+        """Summary of cache usage for logging."""
+        with self._lock:
+            return f"{self.hits} hits, {self.misses} misses, {self._size / (1024**2):.1f} MB"
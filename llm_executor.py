@@ -0,0 +1,150 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import openai
+from metrics import metrics
+
+
+class RateLimiter:
+    """Token buckets for requests per minute and tokens per minute.
+
+    Both buckets refill continuously; acquire() blocks until a request with
+    the given token estimate fits into both. pause() holds everybody back,
+    e.g. after the API answered 429 with a Retry-After header.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens=0):
+        """Block until one request using `tokens` tokens is allowed."""
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    self._paused_until - now,
+                    (1 - self._requests) * 60 / self.requests_per_minute,
+                    (tokens - self._tokens) * 60 / self.tokens_per_minute,
+                    0.01
+                )
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out requests for the next `seconds` seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class LLMExecutor:
+    """Run OpenAI chat completions concurrently under rate limits, with retries.
+
+    complete() performs one rate-limited request in the calling thread and
+    retries 429, 5xx and connection errors with exponential backoff, honouring
+    Retry-After. submit() runs any callable on the shared worker pool, so
+    callers can fan out per-chunk work and collect the futures in order.
+    """
+
+    def __init__(self, client, count_tokens, max_workers=4, requests_per_minute=500,
+                 tokens_per_minute=90000, max_retries=5, cache=None):
+        self.client = client
+        self.count_tokens = count_tokens
+        self.max_retries = max_retries
+        self.cache = cache  # Optional LLMCache consulted before every request
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn on the LLM worker pool and return its Future."""
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def _estimate_tokens(self, messages, max_tokens):
+        prompt_tokens = sum(self.count_tokens(message['content']) for message in messages)
+        # The API counts max_tokens against the limit; without it assume a reply about as long as the prompt
+        return prompt_tokens + (max_tokens or prompt_tokens)
+
+    def _retry_delay(self, error, attempt):
+        """Seconds to wait before retrying, preferring the server's Retry-After."""
+        response = getattr(error, 'response', None)
+        if response is not None:
+            headers = response.headers
+            try:
+                if headers.get('retry-after-ms'):
+                    return float(headers['retry-after-ms']) / 1000
+                if headers.get('retry-after'):
+                    return float(headers['retry-after'])
+            except ValueError:
+                pass
+        return min(60, 2 ** attempt) + random.uniform(0, 1)
+
+    def _is_retryable(self, error):
+        if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def complete(self, messages, model="gpt-3.5-turbo", max_tokens=None):
+        """Send one chat completion request and return the reply text."""
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.key(model, messages, max_tokens)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics.inc('openai_cache_hits_total')
+                return cached
+
+        estimate = self._estimate_tokens(messages, max_tokens)
+        kwargs = {'model': model, 'messages': messages}
+        if max_tokens:
+            kwargs['max_tokens'] = max_tokens
+
+        attempt = 0
+        while True:
+            self.limiter.acquire(estimate)
+            try:
+                with metrics.timer('api_call_seconds', api='openai', method='chat.completions'):
+                    response = self.client.chat.completions.create(**kwargs)
+                metrics.inc('api_calls_total', api='openai', method='chat.completions', result='success')
+                break
+            except Exception as e:
+                metrics.inc('api_calls_total', api='openai', method='chat.completions', result='error')
+                if not self._is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                attempt += 1
+                logging.warning(f"OpenAI request failed ({str(e)}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                if isinstance(e, openai.RateLimitError):
+                    self.limiter.pause(delay)
+                time.sleep(delay)
+
+        content = response.choices[0].message.content
+        if response.usage:
+            metrics.inc('openai_tokens_total', response.usage.prompt_tokens, model=model, direction='in')
+            metrics.inc('openai_tokens_total', response.usage.completion_tokens, model=model, direction='out')
+        if cache_key:
+            try:
+                self.cache.put(cache_key, content)
+            except OSError as e:
+                logging.warning(f"Could not write LLM cache entry: {str(e)}")
+        return content
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
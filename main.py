@@ -3,26 +3,70 @@ import sys
 import time
 import signal
 import logging
+import audio_utils
 from logging.handlers import RotatingFileHandler
 from youtube_monitor import YouTubeMonitor
-from transcriber import VideoTranscriber
+from transcriber import VideoTranscriber, StreamingFormatter
 from gdrive_handler import GoogleDriveHandler
-from config import GOOGLE_DRIVE_CREDS_FILE
-
-# Configure logging with rotation
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        RotatingFileHandler(
-            'youtube_monitor.log',
-            maxBytes=10485760,  # 10MB
-            backupCount=5
-        ),
-        logging.StreamHandler(sys.stdout)  # Ensure output goes to stdout
-    ]
+from pipeline import Stage, VideoPipeline
+from state_store import VideoStateStore
+from checkpoints import CheckpointStore
+from job_queue import JobQueue
+from scheduler import PollScheduler, WebSubReceiver
+from metrics import metrics, start_metrics_server, start_snapshot_writer
+from profiling import Profiler
+from config import (
+    GOOGLE_DRIVE_CREDS_FILE,
+    CAPTIONS_FIRST,
+    WHISPER_MODEL,
+    WHISPER_BATCH,
+    WHISPER_BATCH_MAX_SECONDS,
+    WHISPER_BATCH_VIDEOS,
+    DOWNLOAD_WORKERS,
+    TRANSCRIBE_WORKERS,
+    PUBLISH_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    METRICS_ENABLED,
+    METRICS_HOST,
+    METRICS_PORT,
+    METRICS_SNAPSHOT_FILE,
+    METRICS_SNAPSHOT_SECONDS,
+    PROFILING_ENABLED,
+    JOB_RETRY_SECONDS,
+    PLAYLIST_POLL_MIN_SECONDS,
+    PLAYLIST_POLL_MAX_SECONDS,
+    DRIVE_POLL_MIN_SECONDS,
+    DRIVE_POLL_MAX_SECONDS,
+    WEBSUB_ENABLED,
+    WEBSUB_HOST,
+    WEBSUB_PORT,
+    WEBSUB_PATH,
+    WEBSUB_CALLBACK_URL,
+    WEBSUB_HUB_URL,
+    WEBSUB_TOPICS,
+    WEBSUB_SECRET,
+    WEBSUB_LEASE_SECONDS
 )
 
+def setup_logging():
+    """Configure logging with rotation.
+
+    Done in main() rather than at import: the spawned Whisper pool workers
+    re-import this module and must not open (or roll over) the log file.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            RotatingFileHandler(
+                'youtube_monitor.log',
+                maxBytes=10485760,  # 10MB
+                backupCount=5
+            ),
+            logging.StreamHandler(sys.stdout)  # Ensure output goes to stdout
+        ]
+    )
+
 # Global flag for graceful shutdown
 should_exit = False
 
@@ -32,62 +76,324 @@ def signal_handler(signum, frame):
     logging.info("Received shutdown signal, cleaning up...")
     should_exit = True
 
-# Register signal handlers
-signal.signal(signal.SIGTERM, signal_handler)
-signal.signal(signal.SIGINT, signal_handler)
+def fetch_captions(video_info, youtube_monitor):
+    """Try the caption fast path, returning caption info or None to fall back to Whisper."""
+    if not CAPTIONS_FIRST:
+        return None
+    try:
+        return youtube_monitor.get_video_captions(video_info['url'])
+    except Exception as e:
+        logging.warning(f"Caption lookup failed for {video_info['title']}, falling back to Whisper: {str(e)}")
+        return None
 
-def process_video(video_info, youtube_monitor, transcriber):
-    """Process a single video."""
+def download_audio(video_info, youtube_monitor):
+    """Download the audio for a video, returning its path or None on failure."""
+    logging.info(f"Downloading audio for: {video_info['title']}")
     try:
-        logging.info(f"Starting to process video: {video_info['title']}")
-        
-        # Download audio
-        logging.info("Downloading audio...")
+        audio_path = youtube_monitor.get_video_audio_url(video_info['url'])
+        if not os.path.exists(audio_path):
+            raise Exception(f"Audio file not found at {audio_path}")
+        logging.info(f"Successfully downloaded audio to: {audio_path}")
+        youtube_monitor.mark_video_status(video_info['id'], VideoStateStore.DOWNLOADED)
+        return audio_path
+    except Exception as e:
+        logging.error(f"Failed to download audio: {str(e)}")
+        youtube_monitor.mark_video_status(video_info['id'], VideoStateStore.FAILED, f"download: {str(e)}")
+        return None
+
+def acquire_media(video_info, youtube_monitor, checkpoints):
+    """Start processing a video and get something to build its transcript from.
+
+    A transcript checkpoint from an earlier attempt is used as-is; otherwise
+    acceptable captions are checkpointed, and only then is the audio
+    downloaded. Returns (audio_path, checkpoint); both are None on failure.
+    """
+    youtube_monitor.mark_video_status(video_info['id'], VideoStateStore.QUEUED)
+
+    checkpoint = checkpoints.find_transcript(video_info['id'], preferred=WHISPER_MODEL)
+    if checkpoint:
+        logging.info(f"Found {checkpoint.variant} transcript checkpoint for: {video_info['title']}")
+        return None, checkpoint
+
+    captions = fetch_captions(video_info, youtube_monitor)
+    if captions:
+        checkpoint = checkpoints.get(video_info['id'], 'captions')
+        checkpoint.save('transcript', {'segments': captions['segments'], 'source': captions['source']})
+        return None, checkpoint
+
+    return download_audio(video_info, youtube_monitor), None
+
+def transcribe_audio(video_info, audio_path, youtube_monitor, transcriber, checkpoints, checkpoint=None, batched=None):
+    """Transcribe downloaded audio (or replay a transcript checkpoint), formatting finished chunks as they arrive.
+
+    batched is a (model name, segments) pair when the audio was already
+    transcribed as part of a batch. Returns the StreamingFormatter holding
+    the transcript, or None on failure.
+    """
+    if checkpoint:
+        saved = checkpoint.load('transcript')
+        logging.info(f"Using {saved['source']} transcript for: {video_info['title']}")
+        formatter = StreamingFormatter(transcriber, source=saved['source'], checkpoint=checkpoint)
+        segments = saved['segments']
+    elif batched:
+        model_name, segments = batched
+        checkpoint = checkpoints.get(video_info['id'], model_name)
+        formatter = StreamingFormatter(transcriber, source='whisper batch', checkpoint=checkpoint)
+    else:
+        logging.info(f"Transcribing audio for: {video_info['title']}")
+        model_name = transcriber.model_for_audio(audio_path)
+        checkpoint = checkpoints.get(video_info['id'], model_name)
+        formatter = StreamingFormatter(transcriber, source='whisper', checkpoint=checkpoint)
+        segments = transcriber.transcribe_segments(audio_path, checkpoint.path('partial.jsonl'), model_name)
+    try:
+        for segment in segments:
+            formatter.add_segment(segment)
+        if not formatter.transcript:
+            raise ValueError("Transcription produced no text")
+        if not checkpoint.has('transcript'):
+            checkpoint.save('transcript', {'segments': formatter.segments, 'source': formatter.source})
+        logging.info("Successfully transcribed audio")
+        youtube_monitor.mark_video_status(video_info['id'], VideoStateStore.TRANSCRIBED)
+        return formatter
+    except Exception as e:
+        # Keep the audio and partial transcript so the retry resumes where this one stopped
+        logging.error(f"Failed to transcribe audio: {str(e)}")
+        formatter.cancel()
+        youtube_monitor.mark_video_status(video_info['id'], VideoStateStore.FAILED, f"transcribe: {str(e)}")
+        return None
+
+def transcribe_batch(jobs, youtube_monitor, transcriber, checkpoints):
+    """Transcribe several queued pipeline jobs, batching short Whisper videos together.
+
+    Videos up to WHISPER_BATCH_MAX_SECONDS that use the same model are
+    decoded in one batch; everything else (checkpointed transcripts, long
+    videos, or a failed batch) goes through transcribe_audio one by one.
+    Returns the transcription result per job, in order.
+    """
+    groups = {}  # model name -> indexes of batchable jobs
+    for i, job in enumerate(jobs):
+        if job['checkpoint'] is not None:
+            continue
         try:
-            audio_path = youtube_monitor.get_video_audio_url(video_info['url'])
-            if not os.path.exists(audio_path):
-                raise Exception(f"Audio file not found at {audio_path}")
-            logging.info(f"Successfully downloaded audio to: {audio_path}")
-        except Exception as e:
-            logging.error(f"Failed to download audio: {str(e)}")
-            return False
-        
-        # Transcribe audio
-        logging.info("Transcribing audio...")
+            duration = audio_utils.probe_duration(job['audio_path'])
+        except Exception:
+            continue
+        if duration <= WHISPER_BATCH_MAX_SECONDS:
+            groups.setdefault(transcriber.model_for_duration(duration), []).append(i)
+
+    batched = {}
+    for model_name, indexes in groups.items():
+        if len(indexes) < 2:
+            continue
+        logging.info(f"Batch transcribing {len(indexes)} short videos with model '{model_name}'")
         try:
-            transcript = transcriber.transcribe_audio(audio_path)
-            logging.info("Successfully transcribed audio")
+            transcripts = transcriber.transcribe_batch([jobs[i]['audio_path'] for i in indexes], model_name)
         except Exception as e:
-            logging.error(f"Failed to transcribe audio: {str(e)}")
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-            return False
+            logging.error(f"Batch transcription failed, transcribing videos one by one: {str(e)}")
+            continue
+        for i, segments in zip(indexes, transcripts):
+            batched[i] = (model_name, segments)
+
+    return [
+        transcribe_audio(
+            job['video'],
+            job['audio_path'],
+            youtube_monitor,
+            transcriber,
+            checkpoints,
+            job['checkpoint'],
+            batched.get(i)
+        )
+        for i, job in enumerate(jobs)
+    ]
+
+def publish_transcript(video_info, audio_path, transcription, youtube_monitor, transcriber, checkpoints):
+    """Create the transcript document and mark the video as processed."""
+    logging.info(f"Creating transcript document for: {video_info['title']}")
+
+    # The transcript is checkpointed, so the audio is no longer needed either way
+    if audio_path:
+        youtube_monitor.remove_audio(audio_path)
+        logging.info("Cleaned up audio file")
+    try:
+        doc_id = transcriber.create_transcript_doc(
+            video_info,
+            transcription.transcript,
+            transcription,
+            transcription.checkpoint
+        )
+        logging.info(f"Successfully created transcript document: {doc_id}")
+    except Exception as e:
+        logging.error(f"Failed to create transcript document: {str(e)}")
+        youtube_monitor.mark_video_status(video_info['id'], VideoStateStore.FAILED, f"publish: {str(e)}")
+        return False
+    
+    # Mark video as processed
+    youtube_monitor.mark_video_processed(video_info['id'])
+    checkpoints.clear(video_info['id'])
         
-        # Create transcript document
-        logging.info("Creating transcript document...")
-        try:
-            doc_id = transcriber.create_transcript_doc(video_info, transcript)
-            logging.info(f"Successfully created transcript document: {doc_id}")
-        except Exception as e:
-            logging.error(f"Failed to create transcript document: {str(e)}")
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
+    logging.info(f"Successfully processed video: {video_info['title']} (transcript from {transcription.source})")
+    return True
+
+def process_video(video_info, youtube_monitor, transcriber, checkpoints):
+    """Process a single video."""
+    success = False
+    try:
+        logging.info(f"Starting to process video: {video_info['title']}")
+        
+        with metrics.timer('stage_seconds', stage='download'):
+            audio_path, checkpoint = acquire_media(video_info, youtube_monitor, checkpoints)
+        if audio_path is None and checkpoint is None:
             return False
         
-        # Mark video as processed
-        youtube_monitor.mark_video_processed(video_info['id'])
+        with metrics.timer('stage_seconds', stage='transcribe'):
+            transcription = transcribe_audio(video_info, audio_path, youtube_monitor, transcriber, checkpoints, checkpoint)
+        if transcription is None:
+            return False
         
-        # Clean up audio file
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-            logging.info("Cleaned up audio file")
-            
-        logging.info(f"Successfully processed video: {video_info['title']}")
-        return True
+        with metrics.timer('stage_seconds', stage='publish'):
+            success = publish_transcript(video_info, audio_path, transcription, youtube_monitor, transcriber, checkpoints)
+        return success
         
     except Exception as e:
         logging.error(f"Error processing video {video_info['title']}: {str(e)}")
         return False
+    finally:
+        metrics.inc('videos_processed_total', result='success' if success else 'failure')
+
+def expire_checkpoints(youtube_monitor, checkpoints, job_queue):
+    """Remove stale checkpoints together with the audio of their videos.
+
+    Videos still waiting in the queue keep theirs, however long their retries take.
+    """
+    try:
+        for video_id in checkpoints.expire(keep=job_queue.active_ids()):
+            youtube_monitor.remove_audio(youtube_monitor.find_audio_file(video_id))
+    except Exception as e:
+        logging.error(f"Error expiring checkpoints: {str(e)}")
+
+def complete_job(video_info, success, job_queue, youtube_monitor):
+    """Report a finished video to the job queue."""
+    error = None
+    if not success:
+        state = youtube_monitor.state.get(video_info['id'])
+        error = state['last_error'] if state else None
+        logging.warning(f"Failed to process video: {video_info['title']}, will retry in {JOB_RETRY_SECONDS}s")
+    job_queue.complete(video_info['id'], success, error)
+
+def enqueue_videos(videos, job_queue, youtube_monitor):
+    """Add polled videos to the job queue and record those other nodes already finished.
+
+    Returns the number of videos that were new to the queue.
+    """
+    added, done = job_queue.enqueue(videos)
+    for video_id in done:
+        youtube_monitor.mark_video_processed(video_id)
+    for status, count in job_queue.counts().items():
+        metrics.set_gauge('job_queue_jobs', count, status=status)
+    return added
+
+def poll_playlists(youtube_monitor, job_queue, scheduler):
+    """Poll the playlists and enqueue their unprocessed videos; return how many were newly discovered.
+
+    Videos already queued (e.g. waiting for a retry) don't count, so a video
+    that keeps failing doesn't hold the poll interval at its minimum.
+    """
+    check_system_resources()
+
+    logging.info("Checking for new videos...")
+    new_videos = youtube_monitor.get_new_videos()
+    if not new_videos:
+        logging.info("No new videos found")
+    else:
+        logging.info(f"Found {len(new_videos)} unprocessed videos")
+    added = enqueue_videos(new_videos, job_queue, youtube_monitor)
+    if added:
+        scheduler.trigger('queue')
+    return added
+
+def drain_queue(job_queue, pipeline, youtube_monitor, checkpoints):
+    """Process claimable videos from the shared queue until none are left; return how many succeeded.
+
+    Runs on its own timer, so polling and push notifications carry on while
+    a long backlog is transcribed. Stale checkpoints are expired between
+    drains, when none of this node's videos are in flight.
+    """
+    try:
+        # Videos are claimed one at a time as the pipeline takes them
+        results = pipeline.run(job_queue.claims(lambda: should_exit))
+    finally:
+        job_queue.release()  # A video claimed just before shutdown or an error was never started
+    expire_checkpoints(youtube_monitor, checkpoints, job_queue)
+    return sum(1 for success in results.values() if success)
+
+def start_websub_receiver(scheduler):
+    """Poll the playlists as soon as a WebSub notification arrives."""
+    try:
+        receiver = WebSubReceiver(
+            lambda video_ids: scheduler.trigger('playlist'),
+            WEBSUB_HOST,
+            WEBSUB_PORT,
+            WEBSUB_PATH,
+            WEBSUB_TOPICS,
+            WEBSUB_SECRET
+        )
+    except OSError as e:
+        logging.warning(f"Could not start WebSub receiver on port {WEBSUB_PORT}: {str(e)}")
+        return None
+    receiver.start()
+    if WEBSUB_CALLBACK_URL and WEBSUB_TOPICS:
+        receiver.start_subscriptions(WEBSUB_HUB_URL, WEBSUB_CALLBACK_URL, WEBSUB_LEASE_SECONDS)
+    return receiver
+
+def build_pipeline(youtube_monitor, transcriber, checkpoints, on_result=None):
+    """Build the download -> transcribe -> publish pipeline used by the main loop."""
+    def download_stage(job):
+        job['audio_path'], job['checkpoint'] = acquire_media(job['video'], youtube_monitor, checkpoints)
+        return job['audio_path'] is not None or job['checkpoint'] is not None
+
+    def transcribe_stage(job):
+        job['transcription'] = transcribe_audio(
+            job['video'],
+            job['audio_path'],
+            youtube_monitor,
+            transcriber,
+            checkpoints,
+            job['checkpoint']
+        )
+        return job['transcription'] is not None
+
+    def transcribe_batch_stage(jobs):
+        for job, transcription in zip(jobs, transcribe_batch(jobs, youtube_monitor, transcriber, checkpoints)):
+            job['transcription'] = transcription
+        return [job['transcription'] is not None for job in jobs]
+
+    def publish_stage(job):
+        return publish_transcript(
+            job['video'],
+            job['audio_path'],
+            job['transcription'],
+            youtube_monitor,
+            transcriber,
+            checkpoints
+        )
+
+    return VideoPipeline(
+        [
+            Stage('download', download_stage, DOWNLOAD_WORKERS),
+            Stage(
+                'transcribe',
+                transcribe_stage,
+                TRANSCRIBE_WORKERS,
+                batch_func=transcribe_batch_stage if WHISPER_BATCH else None,
+                batch_size=WHISPER_BATCH_VIDEOS
+            ),
+            Stage('publish', publish_stage, PUBLISH_WORKERS),
+        ],
+        queue_size=PIPELINE_QUEUE_SIZE,
+        should_exit=lambda: should_exit,
+        on_result=on_result
+    )
 
 def check_system_resources():
     """Check system resources and log warnings if necessary."""
@@ -105,66 +411,79 @@ def check_system_resources():
         logging.error(f"Error checking system resources: {str(e)}")
 
 def main():
+    setup_logging()
+    signal.signal(signal.SIGTERM, signal_handler)
+    signal.signal(signal.SIGINT, signal_handler)
     logging.info("Starting YouTube transcription bot...")
+    start_time = time.time()
     
-    youtube_monitor = YouTubeMonitor()
-    transcriber = VideoTranscriber()
+    if METRICS_ENABLED:
+        if METRICS_PORT:
+            try:
+                start_metrics_server(METRICS_HOST, METRICS_PORT)
+            except OSError as e:
+                logging.warning(f"Could not start metrics endpoint on port {METRICS_PORT}: {str(e)}")
+        start_snapshot_writer(METRICS_SNAPSHOT_FILE, METRICS_SNAPSHOT_SECONDS)
+    
+    profiler = None
+    if PROFILING_ENABLED:
+        profiler = Profiler()
+        profiler.install()
     
     # Only initialize Google Drive if credentials are configured
     gdrive = None
     if GOOGLE_DRIVE_CREDS_FILE:
+        # Shared by the publish workers and the Drive poller; each thread builds its own API clients
         gdrive = GoogleDriveHandler()
         logging.info("Google Drive integration enabled")
     else:
         logging.info("Google Drive integration disabled - transcripts will be saved locally")
     
-    retry_delay = 60
-    max_delay = 3600  # 1 hour
+    youtube_monitor = YouTubeMonitor()
+    # The transcriber shares the Drive client instead of authenticating a second one
+    transcriber = VideoTranscriber(gdrive)
+    checkpoints = CheckpointStore()
+    # Spooled audio can make room for new downloads once its transcript is checkpointed
+    youtube_monitor.spool.is_evictable = lambda video_id: checkpoints.find_transcript(video_id) is not None
+    job_queue = JobQueue()
+    job_queue.start_heartbeat()
+    pipeline = build_pipeline(
+        youtube_monitor,
+        transcriber,
+        checkpoints,
+        on_result=lambda video, success: complete_job(video, success, job_queue, youtube_monitor)
+    )
+    logging.info(f"Startup completed in {time.time() - start_time:.1f}s")
+    metrics.set_gauge('startup_seconds', time.time() - start_time)
     
-    while not should_exit:
-        try:
-            # Check system resources
-            check_system_resources()
-            
-            # Check for new videos
-            logging.info("Checking for new videos...")
-            new_videos = youtube_monitor.get_new_videos()
-            
-            if not new_videos:
-                logging.info("No new videos found")
-            else:
-                logging.info(f"Found {len(new_videos)} new videos")
-            
-            for video in new_videos:
-                if should_exit:
-                    break
-                    
-                logging.info(f"Processing video: {video['title']}")
-                success = process_video(video, youtube_monitor, transcriber)
-                if not success:
-                    logging.warning(f"Failed to process video: {video['title']}, will retry on next run")
-            
-            # Check Google Drive for processed files if enabled
-            if gdrive:
-                logging.info("Checking Google Drive for processed files...")
-                gdrive.monitor_drive()
-            
-            # Reset retry delay on successful iteration
-            retry_delay = 60
-            
-            # Wait before next check
-            logging.info("Waiting 5 minutes before next check...")
-            for _ in range(30):  # Break up 5-minute sleep into 10-second intervals
-                if should_exit:
-                    break
-                time.sleep(10)
-            
-        except Exception as e:
-            logging.error(f"Error in main loop: {str(e)}")
-            time.sleep(min(retry_delay, max_delay))
-            retry_delay *= 2  # Exponential backoff
+    # Playlists, the job queue and Drive run on independent, adaptive timers;
+    # a playlist poll that enqueues videos wakes the queue right away
+    scheduler = PollScheduler(lambda: should_exit)
+    scheduler.add(
+        'playlist',
+        lambda: poll_playlists(youtube_monitor, job_queue, scheduler),
+        PLAYLIST_POLL_MIN_SECONDS,
+        PLAYLIST_POLL_MAX_SECONDS
+    )
+    # Failed videos become claimable again after JOB_RETRY_SECONDS, so the idle queue is checked at least that often
+    scheduler.add(
+        'queue',
+        lambda: drain_queue(job_queue, pipeline, youtube_monitor, checkpoints),
+        PLAYLIST_POLL_MIN_SECONDS,
+        JOB_RETRY_SECONDS
+    )
+    if gdrive:
+        scheduler.add('drive', gdrive.monitor_drive, DRIVE_POLL_MIN_SECONDS, DRIVE_POLL_MAX_SECONDS)
+    if WEBSUB_ENABLED:
+        start_websub_receiver(scheduler)
+    
+    scheduler.start()
+    scheduler.join()
     
     logging.info("Shutting down YouTube transcription bot...")
+    job_queue.release()
+    if profiler:
+        profiler.stop()  # Keep the reports of a session that was still running
     sys.exit(0)
 
 if __name__ == "__main__":
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets (seconds) for stage and API call durations
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (extra or [])
+    if not items:
+        return ""
+    # Prometheus label values escape backslash, quote and newline
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and duration histograms.
+
+    Metrics are created on first use and identified by name plus keyword
+    labels, e.g. ``metrics.inc('openai_requests_total', model='gpt-3.5-turbo')``.
+    The registry renders itself in the Prometheus text format and as a JSON
+    snapshot.
+    """
+
+    def __init__(self):
+        self._counters = {}    # name -> {label key: value}
+        self._gauges = {}      # name -> {label key: value}
+        self._histograms = {}  # name -> {label key: [bucket counts..., count, sum]}
+        self._help = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def describe(self, name, text):
+        """Set the HELP text of a metric."""
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        """Record one observation (e.g. a duration in seconds) in a histogram."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(DURATION_BUCKETS) + 2)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of a with block in seconds, also when it raises."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, **labels)
+
+    def render_prometheus(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for kind, metrics in (('counter', self._counters), ('gauge', self._gauges)):
+                for name in sorted(metrics):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in sorted(metrics[name].items()):
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+            for name in sorted(self._histograms):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, counts in sorted(self._histograms[name].items()):
+                    for bound, count in zip(DURATION_BUCKETS, counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {counts[-2]}")
+                    lines.append(f"{name}_count{_format_labels(key)} {counts[-2]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {counts[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Return all metrics as a JSON-serializable dict."""
+        def series(metrics):
+            return {
+                name: [dict(key, value=value) for key, value in values.items()]
+                for name, values in metrics.items()
+            }
+
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'uptime_seconds': time.time() - self.started,
+                'counters': series(self._counters),
+                'gauges': series(self._gauges),
+                'histograms': {
+                    name: [
+                        dict(key, count=counts[-2], sum=counts[-1], avg=counts[-1] / counts[-2] if counts[-2] else 0)
+                        for key, counts in values.items()
+                    ]
+                    for name, values in self._histograms.items()
+                }
+            }
+
+    def write_snapshot(self, path):
+        """Atomically write the JSON snapshot to path."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+# Process-wide registry used by all modules
+metrics = MetricsRegistry()
+for _name, _text in (
+    ('stage_seconds', 'Time spent per video in each pipeline stage'),
+    ('stage_jobs_total', 'Videos leaving each pipeline stage, by result'),
+    ('videos_processed_total', 'Videos finished, by result'),
+    ('pipeline_queue_depth', 'Videos waiting in front of each pipeline stage'),
+    ('download_seconds', 'yt-dlp audio download time'),
+    ('download_bytes_total', 'Audio bytes downloaded'),
+    ('whisper_audio_seconds_total', 'Seconds of audio transcribed by Whisper'),
+    ('whisper_wall_seconds_total', 'Wall-clock seconds spent in Whisper'),
+    ('whisper_realtime_factor', 'Audio seconds per wall-clock second of the latest Whisper chunk'),
+    ('llm_task_seconds', 'Time per formatting chunk and per summary'),
+    ('summary_level_seconds', 'Time per level of the summary tree (0 = chunk summaries)'),
+    ('summary_tree_depth', 'Levels in the summary tree of each transcript'),
+    ('openai_tokens_total', 'OpenAI tokens sent (in) and received (out)'),
+    ('api_calls_total', 'External API calls, by API, method and result'),
+    ('api_call_seconds', 'External API call latency'),
+    ('api_batch_seconds', 'Latency of batched API round-trips, each carrying several calls'),
+    ('audio_spool_bytes', 'Bytes of downloaded audio in the spool and reserved for running downloads'),
+    ('audio_spool_wait_seconds', 'Time downloads waited for spool space'),
+    ('audio_spool_evictions_total', 'Spooled audio deleted to make room, after its transcript was checkpointed'),
+    ('job_queue_jobs', 'Videos in the shared job queue, by status'),
+    ('job_leases_reclaimed_total', 'Videos taken over from a node whose lease expired'),
+):
+    metrics.describe(_name, _text)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = metrics
+
+    def do_GET(self):
+        if self.path in ('/metrics', '/'):
+            body = self.registry.render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(self.registry.snapshot()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the log
+
+
+def start_metrics_server(host, port):
+    """Serve /metrics (Prometheus text) and /metrics.json from a background thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logging.info(f"Metrics endpoint listening on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_snapshot_writer(path, interval):
+    """Write the JSON snapshot to path every interval seconds from a background thread."""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                metrics.write_snapshot(path)
+            except OSError as e:
+                logging.warning(f"Could not write metrics snapshot: {str(e)}")
+
+    thread = threading.Thread(target=run, name='metrics-snapshot', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,152 @@
+import time
+import queue
+import logging
+import threading
+from metrics import metrics
+
+# Marks the end of a stage's input queue
+_STOP = object()
+
+
+class Stage:
+    """A single pipeline step run by a fixed number of worker threads.
+
+    ``func`` receives the job dict for one video, may add keys to it for the
+    following stages and returns True on success. A job whose stage returns
+    False (or raises) is dropped and recorded as failed.
+
+    With a ``batch_func``, a worker that finds more jobs already waiting takes
+    up to ``batch_size`` of them at once and passes the list to batch_func,
+    which returns one success flag per job.
+    """
+
+    def __init__(self, name, func, workers=1, batch_func=None, batch_size=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.batch_func = batch_func
+        self.batch_size = max(1, int(batch_size)) if batch_func else 1
+
+
+class VideoPipeline:
+    """Run videos through a chain of stages connected by bounded queues.
+
+    on_result, if given, is called with the video dict and success flag as
+    soon as each video leaves the pipeline.
+    """
+
+    def __init__(self, stages, queue_size=4, should_exit=None, on_result=None):
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.should_exit = should_exit or (lambda: False)
+        self.on_result = on_result
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _record(self, job, success):
+        with self._lock:
+            self._results[job['video']['id']] = success
+        metrics.inc('videos_processed_total', result='success' if success else 'failure')
+        if self.on_result:
+            try:
+                self.on_result(job['video'], success)
+            except Exception as e:
+                logging.error(f"Error recording result of {job['video']['title']}: {str(e)}")
+
+    def _take_batch(self, stage, inbox, job):
+        """Collect up to stage.batch_size jobs that are already queued.
+
+        Returns (jobs, stopped); stopped is True if the stop marker was taken.
+        """
+        jobs = [job]
+        while len(jobs) < stage.batch_size:
+            try:
+                job = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                return jobs, True
+            jobs.append(job)
+        return jobs, False
+
+    def _run_jobs(self, stage, jobs):
+        """Run a stage on one job or a batch, returning a success flag per job."""
+        start_time = time.time()
+        try:
+            if len(jobs) > 1:
+                results = stage.batch_func(jobs)
+            else:
+                results = [stage.func(jobs[0])]
+        except Exception as e:
+            titles = ", ".join(job['video']['title'] for job in jobs)
+            logging.error(f"Unhandled error in {stage.name} stage for {titles}: {str(e)}")
+            results = [False] * len(jobs)
+
+        # A batch counts as one observation per job, each with its share of the time
+        elapsed = (time.time() - start_time) / len(jobs)
+        for success in results:
+            metrics.observe('stage_seconds', elapsed, stage=stage.name)
+            metrics.inc('stage_jobs_total', stage=stage.name, result='success' if success else 'failure')
+        return results
+
+    def _worker(self, stage, inbox, outbox):
+        while True:
+            job = inbox.get()
+            metrics.set_gauge('pipeline_queue_depth', inbox.qsize(), stage=stage.name)
+            if job is _STOP:
+                return
+
+            jobs, stopped = self._take_batch(stage, inbox, job)
+            for job, success in zip(jobs, self._run_jobs(stage, jobs)):
+                if not success:
+                    self._record(job, False)
+                elif outbox is None:
+                    self._record(job, True)
+                else:
+                    outbox.put(job)
+            if stopped:
+                return
+
+    def _feed(self, videos, inbox):
+        for video in videos:
+            # Stop admitting new work on shutdown; jobs already in flight drain normally
+            if self.should_exit():
+                logging.info("Shutdown requested, not starting remaining videos")
+                break
+            inbox.put({'video': video})
+
+    def run(self, videos):
+        """Process videos and return a dict of video ID -> success flag.
+
+        videos can be any iterable; it is consumed only as fast as the first
+        stage accepts work. Blocks until every admitted video has left the
+        pipeline.
+        """
+        self._results = {}
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+
+        threads = []
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            stage_threads = []
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[i], outbox),
+                    name=f"{stage.name}-{n + 1}",
+                    daemon=True
+                )
+                thread.start()
+                stage_threads.append(thread)
+            threads.append(stage_threads)
+
+        self._feed(videos, queues[0])
+
+        # Close each stage once everything upstream of it has finished
+        for i, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                queues[i].put(_STOP)
+            for thread in threads[i]:
+                thread.join()
+
+        return dict(self._results)
@@ -0,0 +1,224 @@
+import os
+import sys
+import time
+import signal
+import pstats
+import cProfile
+import logging
+import threading
+import traceback
+import tracemalloc
+from collections import Counter
+from config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_MAX_SECONDS, PROFILE_TRACEMALLOC_FRAMES
+
+# From Python 3.12 cProfile is built on sys.monitoring: one profiler records every
+# thread, including those already running, and only one can be active at a time
+_SHARED_PROFILER = sys.version_info >= (3, 12)
+
+
+class Profiler:
+    """Signal-controlled CPU and memory profiling of the running bot.
+
+    SIGUSR1 toggles CPU profiling: cProfile plus a sampler that records the
+    stacks of all threads every sample_interval seconds. On Python 3.12+ one
+    cProfile covers every thread. Before 3.12, cProfile only reaches the
+    calling thread and threads started while it is on, so long-lived
+    threads started at boot (pollers, LLM workers) appear in the stack
+    samples only.
+
+    SIGUSR2 toggles tracemalloc. Stopping either one writes its reports into
+    profile_dir; processing carries on throughout. A session left running
+    is stopped after max_seconds.
+    """
+
+    def __init__(self, profile_dir=PROFILE_DIR, sample_interval=PROFILE_SAMPLE_INTERVAL,
+                 max_seconds=PROFILE_MAX_SECONDS, tracemalloc_frames=PROFILE_TRACEMALLOC_FRAMES):
+        self.profile_dir = profile_dir
+        self.sample_interval = sample_interval
+        self.max_seconds = max_seconds
+        self.tracemalloc_frames = tracemalloc_frames
+        self._profiles = []       # one cProfile.Profile per profiled thread
+        self._stacks = Counter()  # folded stack -> samples
+        self._cpu_started = None
+        self._sampler = None
+        self._memory_started = None
+        self._memory_baseline = None
+        self._installed = False
+        self._lock = threading.Lock()
+
+    def install(self):
+        """Register the SIGUSR1/SIGUSR2 handlers; must be called from the main thread."""
+        self._installed = True
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.toggle_cpu())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.toggle_memory())
+        logging.info(f"Profiling hooks installed: kill -USR1 {os.getpid()} toggles CPU profiling, "
+                     f"kill -USR2 {os.getpid()} toggles memory profiling (reports in {self.profile_dir})")
+
+    def _report_path(self, kind, started, extension):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(started))
+        return os.path.join(self.profile_dir, f"{kind}-{stamp}.{extension}")
+
+    # CPU profiling
+
+    def toggle_cpu(self):
+        if self._cpu_started is None:
+            self.start_cpu()
+        else:
+            self.stop_cpu()
+
+    def start_cpu(self):
+        with self._lock:
+            if self._cpu_started is not None:
+                return
+            self._cpu_started = time.time()
+            self._profiles = []
+            self._stacks = Counter()
+        self._sampler = threading.Thread(target=self._sample_stacks, name='profiler-sampler', daemon=True)
+        self._sampler.start()
+        self._enable_thread_profile()
+        if not _SHARED_PROFILER:
+            # The calling thread (normally the main thread, running the signal handler)
+            # is profiled directly, threads started from now on enable their own profile
+            threading.setprofile(self._bootstrap_thread_profile)
+            running = [thread.name for thread in threading.enumerate()
+                       if thread is not threading.current_thread() and thread is not self._sampler]
+            if running:
+                logging.info(f"Threads already running are covered by stack samples only: {', '.join(running)}")
+        logging.info(f"CPU profiling started (stack samples every {self.sample_interval * 1000:.0f}ms, "
+                     f"stops automatically after {self.max_seconds}s)")
+
+    def _enable_thread_profile(self):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Another profiler (or debugger) holds the interpreter's profiling hook
+            logging.warning(f"cProfile unavailable, relying on stack samples: {str(e)}")
+            return
+        with self._lock:
+            self._profiles.append((threading.current_thread().name, profile))
+
+    def _bootstrap_thread_profile(self, frame, event, arg):
+        # Runs once as the first profile event of a new thread; enable() replaces it
+        sys.setprofile(None)
+        if self._cpu_started is not None:
+            self._enable_thread_profile()
+
+    def _sample_stacks(self):
+        own_id = threading.get_ident()
+        started = self._cpu_started
+        while self._cpu_started == started:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                calls = [f"{os.path.basename(f.filename)}:{f.name}" for f in traceback.extract_stack(frame)]
+                self._stacks[";".join([names.get(thread_id, str(thread_id))] + calls)] += 1
+            if time.time() - started > self.max_seconds:
+                self._time_limit_reached('CPU', signal.SIGUSR1)
+                return
+            time.sleep(self.sample_interval)
+
+    def _time_limit_reached(self, kind, signum):
+        logging.info(f"{kind} profiling reached its {self.max_seconds}s limit, stopping")
+        if self._installed:
+            # Signal ourselves so the session is stopped from the main thread
+            os.kill(os.getpid(), signum)
+
+    def stop_cpu(self):
+        with self._lock:
+            started, self._cpu_started = self._cpu_started, None
+            if started is None:
+                return
+            profiles = self._profiles
+        threading.setprofile(None)
+        # A profile can only be switched off by its own thread: worker threads
+        # still running keep recording until they exit, the report covers what
+        # they recorded up to now
+        for name, profile in profiles:
+            if _SHARED_PROFILER or name == threading.current_thread().name:
+                profile.disable()
+        if self._sampler is not None:
+            self._sampler.join()
+        elapsed = time.time() - started
+
+        try:
+            reports = []
+            if profiles:
+                stats_path = self._report_path('cpu', started, 'prof')
+                stats = pstats.Stats(profiles[0][1])
+                for _, profile in profiles[1:]:
+                    stats.add(profile)
+                stats.dump_stats(stats_path)
+                reports.append(stats_path)
+                threads = 'all threads' if _SHARED_PROFILER else f"threads: {', '.join(name for name, _ in profiles)}"
+                with open(self._report_path('cpu', started, 'txt'), 'w') as f:
+                    f.write(f"CPU profile of {elapsed:.0f}s over {threads}\n\n")
+                    stats.stream = f
+                    stats.sort_stats('cumulative').print_stats(60)
+                    stats.sort_stats('tottime').print_stats(30)
+
+            stacks_path = self._report_path('stacks', started, 'folded')
+            with open(stacks_path, 'w') as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            reports.append(stacks_path)
+            logging.info(f"CPU profiling stopped after {elapsed:.0f}s, "
+                         f"{sum(self._stacks.values())} stack samples, reports: {', '.join(reports)}")
+        except Exception as e:
+            logging.error(f"Error writing CPU profile: {str(e)}")
+
+    # Memory profiling
+
+    def toggle_memory(self):
+        if self._memory_started is None:
+            self.start_memory()
+        else:
+            self.stop_memory()
+
+    def start_memory(self):
+        if self._memory_started is not None:
+            return
+        tracemalloc.start(self.tracemalloc_frames)
+        self._memory_started = time.time()
+        self._memory_baseline = tracemalloc.take_snapshot()
+        started = self._memory_started
+        timer = threading.Timer(self.max_seconds, lambda: self._memory_started == started
+                                and self._time_limit_reached('Memory', signal.SIGUSR2))
+        timer.daemon = True
+        timer.start()
+        logging.info(f"Memory profiling started ({self.tracemalloc_frames} frames per allocation)")
+
+    def stop_memory(self):
+        started, self._memory_started = self._memory_started, None
+        if started is None:
+            return
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            path = self._report_path('memory', started, 'txt')
+            with open(path, 'w') as f:
+                f.write(f"Traced memory after {time.time() - started:.0f}s: "
+                        f"{current / 1048576:.1f} MB current, {peak / 1048576:.1f} MB peak\n")
+                f.write("\nLargest allocations by line:\n")
+                for stat in snapshot.statistics('lineno')[:30]:
+                    f.write(f"{stat}\n")
+                f.write("\nGrowth since profiling started:\n")
+                for stat in snapshot.compare_to(self._memory_baseline, 'lineno')[:30]:
+                    f.write(f"{stat}\n")
+                f.write("\nLargest allocation stacks:\n")
+                for stat in snapshot.statistics('traceback')[:5]:
+                    f.write(f"\n{stat.count} blocks, {stat.size / 1024:.1f} KiB\n")
+                    f.write("\n".join(stat.traceback.format()) + "\n")
+            logging.info(f"Memory profiling stopped, report: {path}")
+        except Exception as e:
+            logging.error(f"Error writing memory profile: {str(e)}")
+        finally:
+            self._memory_baseline = None
+            tracemalloc.stop()
+
+    def stop(self):
+        """Write the reports of any running session, e.g. on shutdown."""
+        self.stop_cpu()
+        self.stop_memory()
@@ -0,0 +1,198 @@
+import re
+import hmac
+import time
+import random
+import hashlib
+import logging
+import threading
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from metrics import metrics
+from config import POLL_BACKOFF, POLL_JITTER
+
+# Video IDs in a YouTube WebSub (Atom) notification
+_VIDEO_ID = re.compile(r'<yt:videoId>([^<]+)</yt:videoId>')
+
+
+class AdaptiveInterval:
+    """Poll interval that drops to min_seconds after activity and backs off while idle."""
+
+    def __init__(self, min_seconds, max_seconds, backoff=POLL_BACKOFF, jitter=POLL_JITTER):
+        self.min_seconds = min_seconds
+        self.max_seconds = max(min_seconds, max_seconds)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.current = min_seconds
+
+    def record(self, active):
+        """Update the interval after a poll that did (or didn't) find work."""
+        if active:
+            self.current = self.min_seconds
+        else:
+            self.current = min(self.max_seconds, self.current * self.backoff)
+
+    def next_delay(self):
+        """Return the current interval with random jitter, so sources and nodes don't poll in lockstep."""
+        return self.current * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class PollScheduler:
+    """Run each polling source on its own timer thread.
+
+    A source is a function returning something truthy when it found work;
+    its interval adapts to that (see AdaptiveInterval). trigger() runs a
+    source right away, e.g. when a push notification arrives, or as soon as
+    its current poll finishes.
+    """
+
+    def __init__(self, should_exit=None):
+        self.should_exit = should_exit or (lambda: False)
+        self._sources = {}  # name -> (func, interval, wake event)
+        self._threads = []
+
+    def add(self, name, func, min_seconds, max_seconds):
+        self._sources[name] = (func, AdaptiveInterval(min_seconds, max_seconds), threading.Event())
+
+    def trigger(self, name):
+        """Poll a source now instead of waiting for its timer."""
+        if name in self._sources:
+            self._sources[name][2].set()
+
+    def _run(self, name):
+        func, interval, wake = self._sources[name]
+        while not self.should_exit():
+            wake.clear()
+            try:
+                interval.record(bool(func()))
+            except Exception as e:
+                logging.error(f"Error polling {name}: {str(e)}")
+                interval.record(False)
+
+            delay = interval.next_delay()
+            metrics.set_gauge('poll_interval_seconds', interval.current, source=name)
+            logging.info(f"Next {name} poll in {delay:.0f}s")
+            deadline = time.time() + delay
+            # Wake up every second to notice shutdown requests
+            while not self.should_exit() and time.time() < deadline:
+                if wake.wait(min(1, max(0, deadline - time.time()))):
+                    logging.info(f"Polling {name} early on request")
+                    break
+
+    def start(self):
+        for name in self._sources:
+            thread = threading.Thread(target=self._run, args=(name,), name=f"poll-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self):
+        """Block until every source has stopped after should_exit() became True."""
+        for thread in self._threads:
+            # Short timeouts keep the main thread responsive to signals
+            while thread.is_alive():
+                thread.join(1)
+
+
+class WebSubReceiver:
+    """Local HTTP endpoint for WebSub (PubSubHubbub) push notifications.
+
+    Answers the hub's subscription checks for the configured topics and
+    calls on_notify with the video IDs of every verified notification.
+    Any other POST to the callback path (e.g. from a script) also counts as
+    a notification.
+    """
+
+    def __init__(self, on_notify, host, port, path='/websub', topics=None, secret=None):
+        self.on_notify = on_notify
+        self.path = path
+        self.topics = set(topics or [])
+        self.secret = secret
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                receiver._handle_verification(self)
+
+            def do_POST(self):
+                receiver._handle_notification(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever, name='websub-receiver', daemon=True)
+        thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"WebSub receiver listening on http://{host}:{port}{self.path}")
+        return thread
+
+    def _reply(self, request, status, body=b''):
+        request.send_response(status)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def _handle_verification(self, request):
+        url = urllib.parse.urlsplit(request.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        topic = params.get('hub.topic')
+        if url.path != self.path or 'hub.challenge' not in params or (self.topics and topic not in self.topics):
+            self._reply(request, 404)
+            return
+        logging.info(f"WebSub hub confirmed {params.get('hub.mode')} for {topic}")
+        self._reply(request, 200, params['hub.challenge'].encode('utf-8'))
+
+    def _handle_notification(self, request):
+        if urllib.parse.urlsplit(request.path).path != self.path:
+            self._reply(request, 404)
+            return
+        length = min(int(request.headers.get('Content-Length') or 0), 1048576)
+        body = request.rfile.read(length)
+        # The hub expects a 2xx even for notifications we ignore
+        self._reply(request, 204)
+
+        if self.secret:
+            expected = 'sha1=' + hmac.new(self.secret.encode('utf-8'), body, hashlib.sha1).hexdigest()
+            if not hmac.compare_digest(expected, request.headers.get('X-Hub-Signature', '')):
+                logging.warning("Ignoring WebSub notification with a missing or wrong signature")
+                metrics.inc('websub_notifications_total', result='bad_signature')
+                return
+        video_ids = _VIDEO_ID.findall(body.decode('utf-8', errors='ignore'))
+        logging.info(f"WebSub notification for {', '.join(video_ids) or 'no videos'}")
+        metrics.inc('websub_notifications_total', result='accepted')
+        self.on_notify(video_ids)
+
+    def subscribe(self, hub_url, topic, callback_url, lease_seconds):
+        """Ask the hub to push updates of topic to callback_url; the hub verifies via GET."""
+        data = {
+            'hub.mode': 'subscribe',
+            'hub.topic': topic,
+            'hub.callback': callback_url,
+            'hub.verify': 'async',
+            'hub.lease_seconds': str(lease_seconds),
+        }
+        if self.secret:
+            data['hub.secret'] = self.secret
+        request = urllib.request.Request(hub_url, data=urllib.parse.urlencode(data).encode('utf-8'))
+        with urllib.request.urlopen(request, timeout=30) as response:
+            logging.info(f"Requested WebSub subscription to {topic} (HTTP {response.status})")
+
+    def start_subscriptions(self, hub_url, callback_url, lease_seconds):
+        """Subscribe to every topic now and renew the subscriptions before they lapse."""
+        def run():
+            while True:
+                failed = False
+                for topic in self.topics:
+                    try:
+                        self.subscribe(hub_url, topic, callback_url, lease_seconds)
+                    except Exception as e:
+                        logging.error(f"WebSub subscription to {topic} failed: {str(e)}")
+                        failed = True
+                # Retry failures after a few minutes, renew the rest well before the lease ends
+                time.sleep(300 if failed else lease_seconds * 0.8)
+
+        thread = threading.Thread(target=run, name='websub-subscriptions', daemon=True)
+        thread.start()
+        return thread
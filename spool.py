@@ -0,0 +1,135 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from metrics import metrics
+from config import AUDIO_SPOOL_DIR, AUDIO_SPOOL_BUDGET_MB, AUDIO_SPOOL_MIN_FREE_MB, AUDIO_SPOOL_MAX_WAIT_SECONDS
+
+
+class SpoolFull(Exception):
+    """Raised when a download could not be admitted within the maximum wait."""
+
+
+class AudioSpool:
+    """Disk budget for downloaded audio.
+
+    Downloads are admitted with their expected size before they start:
+    while the spool's files plus outstanding reservations would exceed
+    budget_bytes, or leave less than min_free_bytes free on the disk, the
+    least recently used audio whose video is_evictable() (its transcript is
+    checkpointed) is deleted, and if that isn't enough the download waits
+    for space to be released.
+    """
+
+    def __init__(self, root=AUDIO_SPOOL_DIR, budget_bytes=AUDIO_SPOOL_BUDGET_MB * 1048576,
+                 min_free_bytes=AUDIO_SPOOL_MIN_FREE_MB * 1048576, max_wait=AUDIO_SPOOL_MAX_WAIT_SECONDS,
+                 is_evictable=None):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+        self.max_wait = max_wait
+        self.is_evictable = is_evictable or (lambda video_id: False)
+        self._files = OrderedDict()  # path -> size, least recently used first
+        self._reserved = {}          # video ID -> bytes reserved for a running download
+        self._cond = threading.Condition()
+        os.makedirs(root, exist_ok=True)
+
+        entries = sorted((entry for entry in os.scandir(root) if entry.is_file()), key=lambda e: e.stat().st_mtime)
+        for entry in entries:
+            self._files[entry.path] = entry.stat().st_size
+        self._update_gauge()
+        logging.info(f"Audio spool {root}: {len(self._files)} files, {self.used_bytes() / 1048576:.0f} MB "
+                     f"of {budget_bytes / 1048576:.0f} MB")
+
+    def used_bytes(self):
+        """Bytes held by spooled files and reservations."""
+        return sum(self._files.values()) + sum(self._reserved.values())
+
+    def _update_gauge(self):
+        metrics.set_gauge('audio_spool_bytes', sum(self._files.values()), kind='files')
+        metrics.set_gauge('audio_spool_bytes', sum(self._reserved.values()), kind='reserved')
+
+    def _fits(self, size):
+        if self.used_bytes() + size > self.budget_bytes:
+            return False
+        # Reserved bytes aren't on disk yet but will be
+        free = shutil.disk_usage(self.root).free - sum(self._reserved.values())
+        return free - size >= self.min_free_bytes
+
+    def _evict(self, size):
+        """Delete evictable audio, least recently used first, until size fits."""
+        for path in list(self._files):
+            if self._fits(size):
+                return
+            video_id = os.path.splitext(os.path.basename(path))[0]
+            if not self.is_evictable(video_id):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            logging.info(f"Evicted spooled audio with a checkpointed transcript: {path} "
+                         f"({self._files[path] / 1048576:.1f} MB)")
+            del self._files[path]
+            metrics.inc('audio_spool_evictions_total')
+
+    @contextmanager
+    def admit(self, video_id, expected_bytes):
+        """Reserve expected_bytes for a download running inside the with block.
+
+        Waits up to max_wait seconds for space; raises SpoolFull after that.
+        A download larger than the whole budget is admitted once nothing else
+        is spooled, so it can't wait forever.
+        """
+        start = time.time()
+        with self._cond:
+            while not self._fits(expected_bytes):
+                self._evict(expected_bytes)
+                if self._fits(expected_bytes):
+                    break
+                if not self._files and not self._reserved:
+                    logging.warning(f"Audio for {video_id} ({expected_bytes / 1048576:.0f} MB) exceeds "
+                                    f"the spool budget, downloading it anyway")
+                    break
+                remaining = start + self.max_wait - time.time()
+                if remaining <= 0:
+                    raise SpoolFull(f"No spool space for {expected_bytes / 1048576:.0f} MB of audio "
+                                    f"after {self.max_wait}s ({self.used_bytes() / 1048576:.0f} MB in use)")
+                logging.info(f"Audio spool full, waiting to download {video_id} "
+                             f"({expected_bytes / 1048576:.0f} MB needed)")
+                self._cond.wait(min(remaining, 30))
+            self._reserved[video_id] = expected_bytes
+            self._update_gauge()
+        metrics.observe('audio_spool_wait_seconds', time.time() - start)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._reserved.pop(video_id, None)
+                self._update_gauge()
+                self._cond.notify_all()
+
+    def add(self, path):
+        """Account for a finished download."""
+        with self._cond:
+            self._files[path] = os.path.getsize(path)
+            self._files.move_to_end(path)
+            self._update_gauge()
+
+    def touch(self, path):
+        """Mark spooled audio as recently used."""
+        with self._cond:
+            if path in self._files:
+                self._files.move_to_end(path)
+
+    def remove(self, path):
+        """Delete spooled audio and wake downloads waiting for space."""
+        with self._cond:
+            if path and os.path.exists(path):
+                os.remove(path)
+            self._files.pop(path, None)
+            self._update_gauge()
+            self._cond.notify_all()
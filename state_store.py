@@ -0,0 +1,114 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from config import STATE_DB_FILE, PROCESSED_VIDEOS_FILE
+
+
+class VideoStateStore:
+    """Durable per-video processing state backed by SQLite.
+
+    Every status change is a single-row upsert committed in its own
+    transaction, so a crash never loses previously recorded videos. Published
+    video IDs are also kept in an in-memory set for O(1) membership checks.
+    """
+
+    QUEUED = 'queued'
+    DOWNLOADED = 'downloaded'
+    TRANSCRIBED = 'transcribed'
+    PUBLISHED = 'published'
+    FAILED = 'failed'
+    STATUSES = (QUEUED, DOWNLOADED, TRANSCRIBED, PUBLISHED, FAILED)
+
+    def __init__(self, db_path=STATE_DB_FILE, legacy_file=PROCESSED_VIDEOS_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        self._migrate_legacy_file(legacy_file)
+        self._published = {
+            row[0] for row in self._conn.execute(
+                'SELECT video_id FROM videos WHERE status = ?', (self.PUBLISHED,)
+            )
+        }
+        logging.info(f"Loaded state for {len(self._published)} processed videos from {db_path}")
+
+    def _migrate_legacy_file(self, legacy_file):
+        """Import video IDs from the old processed_videos.json once."""
+        if not legacy_file or not os.path.exists(legacy_file):
+            return
+
+        with open(legacy_file, 'r') as f:
+            video_ids = json.load(f)
+
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO videos (video_id, status, attempts, updated_at) VALUES (?, ?, 1, ?)',
+                [(video_id, self.PUBLISHED, now) for video_id in video_ids]
+            )
+
+        # Keep the old file around for reference but never import it again
+        os.replace(legacy_file, f"{legacy_file}.migrated")
+        logging.info(f"Migrated {len(video_ids)} processed videos from {legacy_file}")
+
+    def __contains__(self, video_id):
+        return video_id in self._published
+
+    def __len__(self):
+        return len(self._published)
+
+    def is_processed(self, video_id):
+        """Return True if the video has been published."""
+        return video_id in self._published
+
+    def set_status(self, video_id, status, error=None):
+        """Record a status change; entering 'queued' counts as a new attempt."""
+        if status not in self.STATUSES:
+            raise ValueError(f"Unknown video status: {status}")
+
+        attempt = 1 if status == self.QUEUED else 0
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO videos (video_id, status, attempts, last_error, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = videos.attempts + ?,
+                    last_error = excluded.last_error,
+                    updated_at = excluded.updated_at
+            """, (video_id, status, attempt, error, datetime.now().isoformat(), attempt))
+
+            if status == self.PUBLISHED:
+                self._published.add(video_id)
+            else:
+                self._published.discard(video_id)
+
+    def get(self, video_id):
+        """Return the stored state of a video as a dict, or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT video_id, status, attempts, last_error, updated_at FROM videos WHERE video_id = ?',
+                (video_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('video_id', 'status', 'attempts', 'last_error', 'updated_at'), row))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
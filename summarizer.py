@@ -0,0 +1,176 @@
+import time
+import logging
+from metrics import metrics
+from config import (
+    SUMMARY_CONTEXT_TOKENS,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_CHUNK_OVERLAP_TOKENS,
+    SUMMARY_REDUCE_TOKENS
+)
+
+MAP_PROMPT = "Create a brief summary of the text."
+MAP_PREFIX = "Summarize this text:\n\n"
+REDUCE_PROMPT = "Create a cohesive summary from these section summaries."
+REDUCE_PREFIX = "Combine these summaries:\n\n"
+SEPARATOR = "\n\n"
+
+# Chat message framing, plus slack for chunks re-tokenizing slightly differently once decoded
+_REQUEST_OVERHEAD_TOKENS = 32
+
+
+class TreeSummarizer:
+    """Summarize text of any length as a tree of LLM requests.
+
+    The text is cut into chunks that are summarized in parallel (the map
+    level). The partial summaries are then packed, in order, into groups of
+    at most reduce_tokens, each group is combined into one summary, and this
+    repeats level by level until a single summary is left. Every request,
+    prompt plus the reply limit, fits into context_tokens.
+    """
+
+    def __init__(self, llm, chunk_planner, context_tokens=SUMMARY_CONTEXT_TOKENS, reply_tokens=SUMMARY_MAX_TOKENS,
+                 chunk_tokens=SUMMARY_CHUNK_TOKENS, overlap=SUMMARY_CHUNK_OVERLAP_TOKENS,
+                 reduce_tokens=SUMMARY_REDUCE_TOKENS):
+        self.llm = llm
+        self.chunk_planner = chunk_planner
+        self.reply_tokens = reply_tokens
+        self.overlap = overlap
+
+        count = chunk_planner.count_tokens
+        overhead = _REQUEST_OVERHEAD_TOKENS + max(
+            count(MAP_PROMPT) + count(MAP_PREFIX),
+            count(REDUCE_PROMPT) + count(REDUCE_PREFIX)
+        )
+        input_tokens = context_tokens - reply_tokens - overhead
+        self.chunk_tokens = min(chunk_tokens, input_tokens)
+        self.reduce_tokens = min(reduce_tokens, input_tokens)
+        # Each reduce must be able to take at least two full-length summaries, or the tree can't shrink
+        if self.reduce_tokens < 2 * (reply_tokens + count(SEPARATOR)):
+            raise ValueError(f"A reduce budget of {self.reduce_tokens} tokens can't combine two summaries of "
+                             f"{reply_tokens} tokens; raise SUMMARY_CONTEXT_TOKENS/SUMMARY_REDUCE_TOKENS "
+                             f"or lower SUMMARY_MAX_TOKENS")
+
+    def _complete(self, system, prefix, text, label):
+        """Send one summary request, returning None if it fails."""
+        try:
+            return self.llm.complete([
+                {"role": "system", "content": system},
+                {"role": "user", "content": f"{prefix}{text}"}
+            ], max_tokens=self.reply_tokens)
+        except Exception as e:
+            logging.error(f"Error summarizing {label}, skipping: {str(e)}")
+            return None
+
+    def _fit(self, items):
+        """Split any item longer than the reduce budget, e.g. a concatenation left by a failed reduce."""
+        limit = self.reduce_tokens - self.chunk_planner.count_tokens(SEPARATOR)
+        fitted = []
+        for item in items:
+            if self.chunk_planner.count_tokens(item) > limit:
+                fitted.extend(self.chunk_planner.chunks(item, max_tokens=limit))
+            else:
+                fitted.append(item)
+        return fitted
+
+    def _pack(self, sizes, budget):
+        """Split item sizes, in order, into groups of at most budget tokens; returns group lengths."""
+        lengths = []
+        used = 0
+        for size in sizes:
+            if lengths and used + size <= budget:
+                lengths[-1] += 1
+                used += size
+            else:
+                lengths.append(1)
+                used = size
+        return lengths
+
+    def group(self, items):
+        """Pack consecutive items into groups whose joined text fits the reduce budget.
+
+        Uses as few groups as greedy packing into the full budget would, but
+        with the smallest budget that still gives that many, so the groups
+        come out about equally large and a level has no straggler request.
+        """
+        separator = self.chunk_planner.count_tokens(SEPARATOR)
+        sizes = [self.chunk_planner.count_tokens(item) + separator for item in items]
+        count = len(self._pack(sizes, self.reduce_tokens))
+        low, high = max(sizes + [sum(sizes) // count]), self.reduce_tokens
+        while low < high:
+            mid = (low + high) // 2
+            if len(self._pack(sizes, mid)) <= count:
+                high = mid
+            else:
+                low = mid + 1
+        groups = []
+        start = 0
+        for length in self._pack(sizes, low):
+            groups.append(items[start:start + length])
+            start += length
+        return groups
+
+    def _reduce(self, group, label):
+        joined = SEPARATOR.join(group)
+        summary = self._complete(REDUCE_PROMPT, REDUCE_PREFIX, joined, label)
+        # Keep the section summaries if the request failed; a later level may still combine them
+        return summary if summary else joined
+
+    def _record_level(self, levels, level, inputs, fan_ins, largest, started):
+        stats = {
+            'level': level,
+            'inputs': inputs,
+            'outputs': len(fan_ins),
+            'max_fan_in': max(fan_ins) if fan_ins else 0,
+            'mean_fan_in': sum(fan_ins) / len(fan_ins) if fan_ins else 0,
+            'largest_request_tokens': largest,
+            'seconds': time.time() - started,
+        }
+        levels.append(stats)
+        metrics.observe('summary_level_seconds', stats['seconds'], level=str(level))
+        logging.info(f"Summary level {level}: {inputs} -> {stats['outputs']} "
+                     f"(fan-in max {stats['max_fan_in']}, mean {stats['mean_fan_in']:.1f}), "
+                     f"largest request {largest} tokens, {stats['seconds']:.1f}s")
+
+    def summarize(self, text):
+        """Return (summary, levels) for text; summary is None if every chunk failed.
+
+        levels holds per-level stats (inputs, outputs, fan-in, largest
+        request and wall time), level 0 being the chunk summaries.
+        """
+        levels = []
+        started = time.time()
+        chunks = self.chunk_planner.chunks(text, max_tokens=self.chunk_tokens, overlap=self.overlap)
+        logging.info(f"Summarizing {len(chunks)} chunks...")
+        futures = [
+            self.llm.submit(self._complete, MAP_PROMPT, MAP_PREFIX, chunk, f"chunk {i}")
+            for i, chunk in enumerate(chunks, 1)
+        ]
+        items = [summary for summary in (future.result() for future in futures) if summary]
+        largest = max((self.chunk_planner.count_tokens(chunk) for chunk in chunks), default=0)
+        self._record_level(levels, 0, len(chunks), [1] * len(items), largest, started)
+        if not items:
+            return None, levels
+
+        level = 0
+        while len(items) > 1:
+            level += 1
+            started = time.time()
+            items = self._fit(items)
+            groups = self.group(items)
+            if len(groups) == len(items):
+                # Nothing could be merged (only after repeated failures); fall back to the sections as they are
+                logging.error("Summary tree stopped shrinking, using concatenated summaries")
+                return SEPARATOR.join(items), levels
+            # Single-item groups (the tail of a level) pass through without a request
+            futures = [
+                self.llm.submit(self._reduce, group, f"level {level} group {i}") if len(group) > 1 else group[0]
+                for i, group in enumerate(groups, 1)
+            ]
+            largest = max(self.chunk_planner.count_tokens(SEPARATOR.join(group)) for group in groups)
+            inputs = len(items)
+            items = [future if isinstance(future, str) else future.result() for future in futures]
+            self._record_level(levels, level, inputs, [len(group) for group in groups], largest, started)
+
+        metrics.observe('summary_tree_depth', len(levels))
+        return items[0], levels
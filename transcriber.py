@@ -1,102 +1,453 @@
 import os
-import whisper
+import json
+import time
+import threading
 from openai import OpenAI
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from collections import deque
 import tiktoken
 import logging
+import audio_utils
+from whisper_backends import load_backend
+from chunking import ChunkPlanner
+from summarizer import TreeSummarizer
+from llm_executor import LLMExecutor
+from llm_cache import LLMCache
+from vault_writer import VaultWriter
+from metrics import metrics
 from config import (
     OPENAI_API_KEY,
-    TRANSCRIPTS_DIR
+    TRANSCRIPTS_DIR,
+    WHISPER_MODEL,
+    WHISPER_BACKEND,
+    WHISPER_COMPUTE_TYPE,
+    WHISPER_MODEL_BY_DURATION,
+    WHISPER_PARALLEL,
+    WHISPER_PARALLEL_MIN_SECONDS,
+    WHISPER_CHUNK_SECONDS,
+    WHISPER_PARALLEL_WORKERS,
+    WHISPER_BATCH_SIZE,
+    WHISPER_STREAMING,
+    WHISPER_STREAM_OVERLAP_SECONDS,
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_RETRIES,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_DIR,
+    LLM_CACHE_MAX_MB
 )
-from gdrive_handler import GoogleDriveHandler
+
+# Whisper model loaded once per worker process of the parallel transcription pool
+_worker_model = None
+
+def _init_transcription_worker(backend_name, model_name, threads, compute_type):
+    """Load the Whisper model in a pool worker, limited to its share of the CPU threads."""
+    global _worker_model
+    _worker_model = load_backend(backend_name, model_name, threads, compute_type)
+
+def _shift_result(result, offset):
+    """Reduce a Whisper result to text/segments with timestamps shifted by offset seconds."""
+    segments = []
+    for segment in result.get('segments', []):
+        segments.append({
+            'start': segment['start'] + offset,
+            'end': segment['end'] + offset,
+            'text': segment['text']
+        })
+    return {'text': result.get('text', ''), 'segments': segments, 'language': result.get('language')}
+
+def _transcribe_chunk(audio, offset):
+    """Transcribe one audio chunk in a pool worker."""
+    return _shift_result(_worker_model.transcribe(audio), offset)
+
+def stitch_results(results):
+    """Combine per-chunk Whisper results (in audio order) into a single result."""
+    segments = []
+    for result in results:
+        for segment in result['segments']:
+            segments.append(dict(segment, id=len(segments)))
+    text = " ".join(r['text'].strip() for r in results if r['text'].strip())
+    language = next((r['language'] for r in results if r.get('language')), None)
+    return {'text': text, 'segments': segments, 'language': language}
+
+def segments_to_text(segments):
+    """Join transcript segments into plain text, one segment per line."""
+    return "\n".join(s['text'].strip() for s in segments if s['text'].strip())
+
+def load_partial_transcript(partial_path):
+    """Read the committed part of a partial transcript file.
+
+    Returns (segments, resume_seconds, complete). Segments written after the
+    last chunk marker belong to an interrupted chunk and are dropped, and the
+    file is truncated back to the last marker so appends start cleanly.
+    """
+    segments, pending = [], []
+    resume_seconds, complete = 0.0, False
+    if not os.path.exists(partial_path):
+        return segments, resume_seconds, complete
+
+    committed_bytes = offset = 0
+    with open(partial_path, 'rb') as f:
+        for line in f:
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # Torn write at the end of the file
+            if 'chunk_end' in record:
+                segments.extend(pending)
+                pending = []
+                resume_seconds = record['chunk_end']
+                committed_bytes = offset
+            elif record.get('complete'):
+                complete = True
+                committed_bytes = offset
+            else:
+                pending.append(record)
+
+    if committed_bytes < os.path.getsize(partial_path):
+        with open(partial_path, 'r+b') as f:
+            f.truncate(committed_bytes)
+    return segments, resume_seconds, complete
 
 class VideoTranscriber:
-    def __init__(self):
-        self.model = whisper.load_model("base")
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, gdrive=None):
+        self.model_name = WHISPER_MODEL
+        self.backend_name = WHISPER_BACKEND
+        # Whisper models are loaded on first use, so startup stays fast when there is nothing to transcribe
+        self._models = {}
+        self._model_lock = threading.Lock()
+        # Retries are handled by the LLM executor so they respect the rate limits
+        self.client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
         self.encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        self.chunk_planner = ChunkPlanner(self.encoding)
+        self.llm = LLMExecutor(
+            self.client,
+            self.count_tokens,
+            max_workers=LLM_MAX_CONCURRENCY,
+            requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+            max_retries=LLM_MAX_RETRIES,
+            cache=LLMCache(LLM_CACHE_DIR, LLM_CACHE_MAX_MB * 1024**2) if LLM_CACHE_ENABLED else None
+        )
+        self.summarizer = TreeSummarizer(self.llm, self.chunk_planner)
         
-        # Only initialize Google Drive if credentials are configured
-        self.gdrive = None
-        if os.getenv('GOOGLE_DRIVE_CREDS_FILE'):
-            self.gdrive = GoogleDriveHandler()
+        # Shared GoogleDriveHandler, or None to save transcripts locally
+        self.gdrive = gdrive
         
         # Create necessary directories if they don't exist
         os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
+        self.vault = None if gdrive else VaultWriter(TRANSCRIPTS_DIR)
 
     def count_tokens(self, text):
-        """Count the number of tokens in a text."""
-        return len(self.encoding.encode(text))
-
-    def chunk_text(self, text, max_tokens=4000):
-        """Split text into chunks that fit within token limits."""
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        # Split into sentences (rough approximation)
-        sentences = text.split('. ')
-        
-        for sentence in sentences:
-            sentence_tokens = self.count_tokens(sentence)
-            
-            if current_length + sentence_tokens > max_tokens:
-                # Join the current chunk and add to chunks
-                chunks.append('. '.join(current_chunk) + '.')
-                current_chunk = [sentence]
-                current_length = sentence_tokens
-            else:
-                current_chunk.append(sentence)
-                current_length += sentence_tokens
-        
-        # Add the last chunk if it exists
-        if current_chunk:
-            chunks.append('. '.join(current_chunk) + '.')
-        
-        return chunks
+        """Count the number of tokens in a text (see ChunkPlanner.count_tokens)."""
+        return self.chunk_planner.count_tokens(text)
 
-    def transcribe_audio(self, audio_path):
-        """Transcribe audio file using Whisper."""
+    def chunk_text(self, text, max_tokens=4000, overlap=0):
+        """Split text into chunks that fit within token limits (see ChunkPlanner)."""
+        return self.chunk_planner.chunks(text, max_tokens, overlap)
+
+    def get_model(self, model_name=None):
+        """Return the Whisper backend for model_name, loading it on first use."""
+        model_name = model_name or self.model_name
+        with self._model_lock:
+            if model_name not in self._models:
+                self._models[model_name] = load_backend(self.backend_name, model_name, compute_type=WHISPER_COMPUTE_TYPE)
+            return self._models[model_name]
+
+    def model_for_duration(self, duration):
+        """Pick the Whisper model for audio of the given length (see WHISPER_MODEL_BY_DURATION)."""
+        if duration:
+            for max_seconds, model_name in WHISPER_MODEL_BY_DURATION:
+                if duration <= max_seconds:
+                    return model_name
+        return self.model_name
+
+    def model_for_audio(self, audio_path):
+        """Pick the Whisper model for an audio file, falling back to the default model."""
+        if not WHISPER_MODEL_BY_DURATION:
+            return self.model_name
+        try:
+            return self.model_for_duration(audio_utils.probe_duration(audio_path))
+        except Exception as e:
+            logging.warning(f"Could not read audio duration, using {self.model_name} model: {str(e)}")
+            return self.model_name
+
+    def _record_whisper(self, audio_seconds, wall_seconds, model_name):
+        """Record transcription throughput metrics."""
+        metrics.inc('whisper_audio_seconds_total', audio_seconds, model=model_name)
+        metrics.inc('whisper_wall_seconds_total', wall_seconds, model=model_name)
+        if wall_seconds > 0:
+            metrics.set_gauge('whisper_realtime_factor', audio_seconds / wall_seconds, model=model_name)
+
+    def _parallel_workers(self):
+        """Number of processes to use for chunked transcription."""
+        return WHISPER_PARALLEL_WORKERS or os.cpu_count() or 1
+
+    def _transcribe_spans(self, audio, spans, workers=1, model_name=None):
+        """Yield a shifted Whisper result per (start, end) span, in audio order.
+
+        With more than one worker the spans are transcribed in a process pool;
+        each worker loads its own copy of the model and gets an equal share of
+        the CPU cores. Results are still yielded in order as they complete.
+        """
+        model_name = model_name or self.model_name
+        if workers <= 1 or len(spans) <= 1:
+            model = self.get_model(model_name)
+            for start, end in spans:
+                yield _shift_result(model.transcribe(audio[start:end]), start / audio_utils.SAMPLE_RATE)
+            return
+
+        workers = min(workers, len(spans))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        logging.info(f"Transcribing {len(spans)} chunks with {workers} workers ({threads} threads each)")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_transcription_worker,
+            initargs=(self.backend_name, model_name, threads, WHISPER_COMPUTE_TYPE)
+        ) as pool:
+            futures = [
+                pool.submit(_transcribe_chunk, audio[start:end], start / audio_utils.SAMPLE_RATE)
+                for start, end in spans
+            ]
+            for future in futures:
+                yield future.result()
+
+    def _transcribe_windows(self, windows, workers=1, model_name=None):
+        """Yield (window, shifted Whisper result) for streamed windows (see audio_utils.stream_windows), in order.
+
+        With more than one worker, windows go to a process pool as they are
+        decoded, with at most workers + 1 of them in flight, so memory stays
+        bounded however long the audio is.
+        """
+        model_name = model_name or self.model_name
+        if workers <= 1:
+            model = self.get_model(model_name)
+            for window in windows:
+                yield window, _shift_result(model.transcribe(window['audio']), window['start'])
+            return
+
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        logging.info(f"Transcribing streamed windows with {workers} workers ({threads} threads each)")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_transcription_worker,
+            initargs=(self.backend_name, model_name, threads, WHISPER_COMPUTE_TYPE)
+        ) as pool:
+            in_flight = deque()
+            for window in windows:
+                future = pool.submit(_transcribe_chunk, window['audio'], window['start'])
+                in_flight.append((dict(window, audio=None), future))
+                if len(in_flight) > workers:
+                    window, future = in_flight.popleft()
+                    yield window, future.result()
+            while in_flight:
+                window, future = in_flight.popleft()
+                yield window, future.result()
+
+    def _stream_chunks(self, audio_path, start_seconds, workers, model_name):
+        """Yield (chunk end, audio seconds, segments) per streamed window, keeping only the segments it owns.
+
+        Audio seconds is the span the window owns, without the overlap it
+        shares with its neighbours, so the windows add up to the audio length.
+        """
+        windows = audio_utils.stream_windows(audio_path, WHISPER_CHUNK_SECONDS, WHISPER_STREAM_OVERLAP_SECONDS, start_seconds)
+        for window, result in self._transcribe_windows(windows, workers, model_name):
+            keep_until = window['keep_until'] if window['keep_until'] is not None else float('inf')
+            # A segment belongs to the window holding its midpoint, so overlapping windows don't repeat it
+            segments = [
+                segment for segment in result['segments']
+                if window['keep_from'] <= (segment['start'] + segment['end']) / 2 < keep_until
+            ]
+            chunk_end = window['keep_until'] if window['keep_until'] is not None else window['end']
+            yield chunk_end, chunk_end - window['keep_from'], segments
+
+    def transcribe_parallel(self, audio, chunk_seconds=WHISPER_CHUNK_SECONDS, workers=None, model_name=None):
+        """Transcribe decoded audio by splitting it at silences and using a process pool."""
+        spans = audio_utils.split_on_silence(audio, chunk_seconds)
+        start_time = time.time()
+        results = list(self._transcribe_spans(audio, spans, workers or self._parallel_workers(), model_name))
+        logging.info(f"Parallel transcription of {len(audio) / audio_utils.SAMPLE_RATE:.0f}s audio took {time.time() - start_time:.1f}s")
+        return stitch_results(results)
+
+    def transcribe_segments(self, audio_path, partial_path=None, model_name=None):
+        """Transcribe audio file, yielding segments with start/end times as they finish.
+
+        With WHISPER_STREAMING the audio is decoded through an ffmpeg pipe in
+        overlapping WHISPER_CHUNK_SECONDS windows (see _stream_chunks), so
+        memory use doesn't grow with its length; otherwise it is decoded whole
+        and split at silences into chunks of that length. Long audio is spread
+        over a process pool either way. With a
+        partial_path, every finished chunk is appended to that file, and a
+        later call resumes after the last completed chunk instead of starting
+        over. model_name defaults to the model chosen for the audio's duration.
+        """
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
             
         if not os.path.getsize(audio_path) > 0:
             raise ValueError(f"Audio file is empty: {audio_path}")
-            
+
+        done_segments, resume_seconds, complete = [], 0.0, False
+        if partial_path:
+            done_segments, resume_seconds, complete = load_partial_transcript(partial_path)
+        for segment in done_segments:
+            yield segment
+        if complete:
+            logging.info(f"Using completed partial transcript: {partial_path}")
+            return
+        if done_segments:
+            logging.info(f"Resuming transcription at {resume_seconds:.0f}s from {partial_path}")
+
+        if WHISPER_STREAMING:
+            try:
+                duration = audio_utils.probe_duration(audio_path)
+            except Exception as e:
+                logging.warning(f"Could not read audio duration: {str(e)}")
+                duration = None
+        else:
+            audio = audio_utils.decode_audio(audio_path)
+            duration = len(audio) / audio_utils.SAMPLE_RATE
+        model_name = model_name or self.model_for_duration(duration)
+        logging.info(f"Transcribing {duration or 0:.0f}s of audio with {self.backend_name} model '{model_name}'")
+        workers = 1
+        if WHISPER_PARALLEL and duration and duration >= WHISPER_PARALLEL_MIN_SECONDS:
+            workers = self._parallel_workers()
+
+        if WHISPER_STREAMING:
+            chunks = self._stream_chunks(audio_path, resume_seconds, workers, model_name)
+        else:
+            spans = [
+                (start, end) for start, end in audio_utils.split_on_silence(audio, WHISPER_CHUNK_SECONDS)
+                if end / audio_utils.SAMPLE_RATE > resume_seconds
+            ]
+            chunks = (
+                (end / audio_utils.SAMPLE_RATE, (end - start) / audio_utils.SAMPLE_RATE, result['segments'])
+                for (start, end), result in zip(spans, self._transcribe_spans(audio, spans, workers, model_name))
+            )
+
+        partial = open(partial_path, 'a', encoding='utf-8') if partial_path else None
+        try:
+            segment_id = len(done_segments)
+            chunk_start_time = time.time()
+            for chunk_end, audio_seconds, chunk_segments in chunks:
+                self._record_whisper(audio_seconds, time.time() - chunk_start_time, model_name)
+                segments = []
+                for segment in chunk_segments:
+                    segments.append(dict(segment, id=segment_id))
+                    segment_id += 1
+
+                if partial:
+                    for segment in segments:
+                        partial.write(json.dumps(segment) + "\n")
+                    partial.write(json.dumps({'chunk_end': chunk_end}) + "\n")
+                    partial.flush()
+                    os.fsync(partial.fileno())
+
+                for segment in segments:
+                    yield segment
+                chunk_start_time = time.time()
+
+            if partial:
+                partial.write(json.dumps({'complete': True}) + "\n")
+                partial.flush()
+                os.fsync(partial.fileno())
+        finally:
+            if partial:
+                partial.close()
+
+    def transcribe_batch(self, audio_paths, model_name=None):
+        """Transcribe several short audio files together, returning a segment list per file.
+
+        Every file is cut into 30-second windows (Whisper's input size) and the
+        windows of all files are decoded WHISPER_BATCH_SIZE at a time in one
+        forward pass, instead of one model call per video. Each window becomes
+        one segment. Backends without batch support transcribe the files one
+        by one.
+        """
+        model_name = model_name or self.model_name
+        model = self.get_model(model_name)
+        audios = [audio_utils.decode_audio(audio_path) for audio_path in audio_paths]
+        start_time = time.time()
+
+        if not model.supports_batch:
+            return [
+                [dict(segment, id=i) for i, segment in enumerate(_shift_result(model.transcribe(audio), 0)['segments'])]
+                for audio in audios
+            ]
+
+        window = 30 * audio_utils.SAMPLE_RATE
+        windows = []  # (file index, start sample, end sample)
+        for index, audio in enumerate(audios):
+            for start in range(0, len(audio), window):
+                windows.append((index, start, min(start + window, len(audio))))
+
+        texts = []
+        for i in range(0, len(windows), WHISPER_BATCH_SIZE):
+            batch = windows[i:i + WHISPER_BATCH_SIZE]
+            results = model.transcribe_batch([audios[index][start:end] for index, start, end in batch])
+            texts.extend(result['text'] for result in results)
+
+        transcripts = [[] for _ in audio_paths]
+        for (index, start, end), text in zip(windows, texts):
+            if text.strip():
+                transcripts[index].append({
+                    'id': len(transcripts[index]),
+                    'start': start / audio_utils.SAMPLE_RATE,
+                    'end': end / audio_utils.SAMPLE_RATE,
+                    'text': text if text.startswith(" ") else f" {text}"
+                })
+
+        total_seconds = sum(len(audio) for audio in audios) / audio_utils.SAMPLE_RATE
+        self._record_whisper(total_seconds, time.time() - start_time, model_name)
+        logging.info(
+            f"Batch transcribed {len(audio_paths)} files ({total_seconds:.0f}s, {len(windows)} windows) "
+            f"with model '{model_name}' in {time.time() - start_time:.1f}s"
+        )
+        return transcripts
+
+    def transcribe_audio(self, audio_path, partial_path=None, model_name=None):
+        """Transcribe audio file using Whisper."""
         logging.info(f"Starting transcription of: {audio_path}")
         try:
-            result = self.model.transcribe(audio_path)
-            if not result or not result.get("text"):
+            transcript = segments_to_text(self.transcribe_segments(audio_path, partial_path, model_name))
+            if not transcript:
                 raise ValueError("Transcription produced no text")
             logging.info("Transcription completed successfully")
-            return result["text"]
+            return transcript
         except Exception as e:
             logging.error(f"Error during transcription: {str(e)}")
             raise
 
+    def format_chunk(self, chunk, index):
+        """Format one transcript chunk into paragraphs, falling back to the original text."""
+        try:
+            with metrics.timer('llm_task_seconds', task='format'):
+                return self.llm.complete([
+                    {"role": "system", "content": "Format the text into clear paragraphs with double newlines between them."},
+                    {"role": "user", "content": f"Format this text into paragraphs:\n\n{chunk}"}
+                ])
+        except Exception as e:
+            logging.error(f"Error formatting chunk {index}, using original text: {str(e)}")
+            return chunk  # Use original text if formatting fails
+
+    def submit_formatting(self, transcript):
+        """Start formatting all chunks of transcript concurrently; returns futures in chunk order."""
+        chunks = self.chunk_text(transcript, max_tokens=4000)
+        logging.info(f"Formatting {len(chunks)} chunks...")
+        return [self.llm.submit(self.format_chunk, chunk, i) for i, chunk in enumerate(chunks, 1)]
+
     def format_transcript_with_paragraphs(self, transcript):
         """Format transcript into paragraphs using OpenAI."""
         logging.info("Formatting transcript into paragraphs...")
         
         try:
-            # Split transcript into smaller chunks
-            chunks = self.chunk_text(transcript, max_tokens=4000)  # Reduced chunk size
-            formatted_chunks = []
-            
-            for i, chunk in enumerate(chunks, 1):
-                logging.info(f"Formatting chunk {i}/{len(chunks)}...")
-                try:
-                    response = self.client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[
-                            {"role": "system", "content": "Format the text into clear paragraphs with double newlines between them."},
-                            {"role": "user", "content": f"Format this text into paragraphs:\n\n{chunk}"}
-                        ]
-                    )
-                    formatted_chunks.append(response.choices[0].message.content)
-                except Exception as e:
-                    logging.error(f"Error formatting chunk {i}, using original text: {str(e)}")
-                    formatted_chunks.append(chunk)  # Use original text if formatting fails
+            formatted_chunks = [future.result() for future in self.submit_formatting(transcript)]
             
             # Combine formatted chunks with proper spacing
             logging.info("Completed transcript formatting")
@@ -108,60 +459,64 @@ class VideoTranscriber:
 
     def generate_summary(self, transcript):
         """Generate a summary of the transcript using OpenAI."""
+        with metrics.timer('llm_task_seconds', task='summary'):
+            return self._generate_summary(transcript)
+
+    def _generate_summary(self, transcript):
         logging.info("Generating summary...")
         
         try:
-            chunks = self.chunk_text(transcript, max_tokens=4000)  # Reduced chunk size
-            summaries = []
-            
-            for i, chunk in enumerate(chunks, 1):
-                logging.info(f"Summarizing chunk {i}/{len(chunks)}...")
-                try:
-                    response = self.client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[
-                            {"role": "system", "content": "Create a brief summary of the text."},
-                            {"role": "user", "content": f"Summarize this text:\n\n{chunk}"}
-                        ]
-                    )
-                    summaries.append(response.choices[0].message.content)
-                except Exception as e:
-                    logging.error(f"Error summarizing chunk {i}, skipping: {str(e)}")
-            
-            if len(summaries) > 1:
-                try:
-                    logging.info("Combining section summaries...")
-                    combined_summary = "\n\n".join(summaries)
-                    response = self.client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[
-                            {"role": "system", "content": "Create a cohesive summary from these section summaries."},
-                            {"role": "user", "content": f"Combine these summaries:\n\n{combined_summary}"}
-                        ]
-                    )
-                    logging.info("Completed summary generation")
-                    return response.choices[0].message.content
-                except Exception as e:
-                    logging.error(f"Error combining summaries, using concatenated version: {str(e)}")
-                    return combined_summary
-            
-            logging.info("Completed summary generation")
-            return summaries[0] if summaries else "Summary generation failed"
+            summary, levels = self.summarizer.summarize(transcript)
+            if summary is None:
+                return "Summary generation failed"
+            logging.info(f"Completed summary generation ({len(levels)} levels)")
+            return summary
             
         except Exception as e:
             logging.error(f"Error in summary generation: {str(e)}")
             return "Summary generation failed"
 
-    def create_transcript_doc(self, video_info, transcript):
-        """Create a transcript file."""
+    def create_transcript_doc(self, video_info, transcript, formatter=None, checkpoint=None):
+        """Create a transcript file.
+
+        formatter is the StreamingFormatter that already started formatting
+        during transcription, if any. Formatting and summary requests run
+        concurrently on the shared LLM executor. With a checkpoint, the
+        formatted transcript and summary of an earlier attempt are reused and
+        fresh ones are saved before the document is created.
+        """
         logging.info(f"Creating transcript document for: {video_info['title']}")
         
         try:
-            # Format transcript with paragraphs
-            formatted_transcript = self.format_transcript_with_paragraphs(transcript)
+            formatted_transcript = checkpoint.load('formatted') if checkpoint else None
+            summary = checkpoint.load('summary') if checkpoint else None
+            if formatted_transcript is not None:
+                logging.info("Using checkpointed formatted transcript")
+                if formatter is not None:
+                    formatter.cancel()
+            elif formatter is not None:
+                # Start formatting the transcript into paragraphs
+                formatter.flush(final=True)
+            else:
+                format_futures = self.submit_formatting(transcript)
             
-            # Generate summary
-            summary = self.generate_summary(transcript)
+            # Generate summary while the formatting requests are in flight
+            if summary is not None:
+                logging.info("Using checkpointed summary")
+            else:
+                summary = self.generate_summary(transcript)
+                if checkpoint and summary != "Summary generation failed":
+                    checkpoint.save('summary', summary)
+            
+            if formatted_transcript is None:
+                if formatter is not None:
+                    formatted_transcript = formatter.finish()
+                else:
+                    formatted_transcript = "\n\n".join(future.result() for future in format_futures)
+                if checkpoint:
+                    checkpoint.save('formatted', formatted_transcript)
+            if self.llm.cache:
+                logging.info(f"LLM cache: {self.llm.cache.stats()}")
             
             # Create final document content
             doc_content = f"""# {video_info['title']}
@@ -175,19 +530,24 @@ class VideoTranscriber:
             
             if self.gdrive:
                 # Create Google Doc if Google Drive is configured
-                doc_id = self.gdrive.create_doc(
-                    video_info['title'],
-                    doc_content,
-                    video_info
-                )
+                with metrics.timer('document_seconds', target='drive'):
+                    doc_id = self.gdrive.create_doc(
+                        video_info['title'],
+                        doc_content,
+                        video_info
+                    )
                 logging.info(f"Created Google Doc with ID: {doc_id}")
                 return doc_id
             else:
                 # Save locally if Google Drive is not configured
                 safe_title = "".join(c for c in video_info['title'] if c.isalnum() or c in (' ', '-', '_')).rstrip()
-                file_path = os.path.join(TRANSCRIPTS_DIR, f"{safe_title}.md")
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(doc_content)
+                frontmatter = f"""---
+video_id: {video_info['id']}
+url: {video_info.get('url', '')}
+channel: {video_info.get('channel', '')}
+---
+"""
+                file_path = self.vault.write(safe_title, frontmatter + doc_content, video_info['id'])
                 logging.info(f"Saved transcript to: {file_path}")
                 return file_path
                 
@@ -200,3 +560,91 @@ class VideoTranscriber:
                 f.write(transcript)
             logging.info(f"Saved raw transcript to: {file_path}")
             return file_path
+
+
+class StreamingFormatter:
+    """Format transcript chunks in the background while Whisper is still running.
+
+    Segments are fed in as they are transcribed; whenever the buffered text
+    reaches max_tokens it is sent off for paragraph formatting on the
+    transcriber's LLM executor, so the formatted transcript is mostly done
+    when transcription finishes. Each segment is tokenized once; the tokens
+    are kept so the summary can plan the full transcript without encoding
+    it again.
+    """
+
+    def __init__(self, transcriber, max_tokens=4000, source='whisper', checkpoint=None):
+        self.transcriber = transcriber
+        self.source = source  # Where the segments came from, for reporting
+        self.checkpoint = checkpoint  # VideoCheckpoint for this video's stage results
+        self.max_tokens = max_tokens
+        self.segments = []
+        self._tokens = []  # Tokens of the transcript text, one segment per line
+        self._buffer = []
+        self._buffer_tokens = 0
+        self._futures = []
+
+    def add_segment(self, segment):
+        """Add a transcribed segment, submitting a formatting request when a chunk is full."""
+        self.segments.append(segment)
+        text = segment['text'].strip()
+        if not text:
+            return
+        planner = self.transcriber.chunk_planner
+        tokens = planner.encoding.encode(text)
+        if self._tokens:
+            self._tokens.extend(planner.encoding.encode("\n"))
+        self._tokens.extend(tokens)
+
+        if len(tokens) > self.max_tokens:
+            # A segment longer than a chunk (e.g. unpunctuated captions) is cut like any other text
+            for start, end in planner.plan(text, self.max_tokens):
+                self.flush()
+                self._buffer = [planner.encoding.decode(tokens[start:end]).strip()]
+                self._buffer_tokens = end - start
+            return
+        if self._buffer and self._buffer_tokens + len(tokens) > self.max_tokens:
+            self.flush()
+        self._buffer.append(text)
+        self._buffer_tokens += len(tokens)
+
+    def flush(self, final=False):
+        """Submit the buffered text for formatting without waiting for the result.
+
+        final is True for the last chunk, submitted once transcription is done.
+        """
+        if not self._buffer:
+            return
+        if self.checkpoint and self.checkpoint.has('formatted'):
+            # Already formatted by an earlier attempt
+            self._buffer = []
+            self._buffer_tokens = 0
+            return
+        chunk = " ".join(self._buffer)
+        index = len(self._futures) + 1
+        if final:
+            logging.info(f"Formatting final chunk {index}...")
+        else:
+            logging.info(f"Formatting chunk {index} while transcription continues...")
+        self._futures.append(self.transcriber.llm.submit(self.transcriber.format_chunk, chunk, index))
+        self._buffer = []
+        self._buffer_tokens = 0
+
+    @property
+    def transcript(self):
+        """Plain transcript text of all segments added so far."""
+        text = segments_to_text(self.segments)
+        self.transcriber.chunk_planner.remember(text, self._tokens)
+        return text
+
+    def finish(self):
+        """Format the remaining text and return the full formatted transcript."""
+        self.flush(final=True)
+        formatted = "\n\n".join(future.result() for future in self._futures)
+        logging.info("Completed transcript formatting")
+        return formatted
+
+    def cancel(self):
+        """Drop any formatting requests that have not started yet."""
+        for future in self._futures:
+            future.cancel()
@@ -0,0 +1,113 @@
+import os
+import re
+import logging
+import hashlib
+import threading
+
+# Frontmatter keys holding the YouTube video ID of a note
+_VIDEO_ID = re.compile(r'^(?:VideoID|video_id):[ \t]*(\S+)[ \t]*$', re.MULTILINE)
+
+
+class VaultWriter:
+    """Write Markdown notes into a directory without clobbering or churning them.
+
+    The directory is indexed once at construction (note name -> path, video
+    ID -> path; content hashes are computed on demand), so writers never
+    have to list or re-read the vault. A note for a video that already has
+    one replaces it in place, a different note with the same name gets a
+    numbered name instead of overwriting it, unchanged content is not
+    rewritten, and every write goes through a temporary file and rename so
+    a crash never leaves a half-written note.
+    """
+
+    # Frontmatter keys that change on every write and are ignored when comparing content
+    VOLATILE_KEYS = ('Processed',)
+
+    def __init__(self, root, extension='.md'):
+        self.root = root
+        self.extension = extension
+        self._by_name = {}      # lowercased name -> path
+        self._by_video = {}     # video ID -> path
+        self._hashes = {}       # path -> content hash, filled lazily
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._build_index()
+
+    def _build_index(self):
+        for entry in os.scandir(self.root):
+            if not entry.is_file() or not entry.name.endswith(self.extension):
+                continue
+            self._by_name[entry.name[:-len(self.extension)].lower()] = entry.path
+            video_id = self._read_video_id(entry.path)
+            if video_id:
+                self._by_video[video_id] = entry.path
+        logging.info(f"Indexed {len(self._by_name)} notes ({len(self._by_video)} with a video ID) in {self.root}")
+
+    def _read_video_id(self, path):
+        """Return the video ID from a note's frontmatter, reading only its head."""
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                head = f.read(4096)
+        except OSError:
+            return None
+        if head.startswith('---'):
+            end = head.find('\n---', 3)
+            head = head[:end] if end != -1 else head
+        match = _VIDEO_ID.search(head)
+        return match.group(1) if match else None
+
+    def _hash(self, content):
+        """Hash content, ignoring VOLATILE_KEYS lines."""
+        lines = [
+            line for line in content.splitlines()
+            if not any(line.startswith(f"{key}:") for key in self.VOLATILE_KEYS)
+        ]
+        return hashlib.sha256("\n".join(lines).encode('utf-8')).hexdigest()
+
+    def _stored_hash(self, path):
+        if path not in self._hashes:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._hashes[path] = self._hash(f.read())
+            except OSError:
+                return None
+        return self._hashes[path]
+
+    def _path_for(self, name, video_id):
+        """Pick the path of a note: the video's existing note, else a free name."""
+        if video_id and video_id in self._by_video:
+            return self._by_video[video_id]
+        candidate, n = name, 1
+        while candidate.lower() in self._by_name:
+            n += 1
+            candidate = f"{name}-{n}"
+        if n > 1:
+            logging.info(f"Note name '{name}' is taken, using '{candidate}'")
+        return os.path.join(self.root, f"{candidate}{self.extension}")
+
+    def write(self, name, content, video_id=None):
+        """Write a note and return its path.
+
+        name is the file name without extension; video_id ties the note to a
+        video so later writes for the same video update it.
+        """
+        content_hash = self._hash(content)
+        with self._lock:
+            path = self._path_for(name, video_id)
+            if os.path.exists(path) and self._stored_hash(path) == content_hash:
+                logging.info(f"Note unchanged, not rewriting: {path}")
+                return path
+
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+
+            stem = os.path.basename(path)[:-len(self.extension)]
+            self._by_name[stem.lower()] = path
+            if video_id:
+                self._by_video[video_id] = path
+            self._hashes[path] = content_hash
+        return path
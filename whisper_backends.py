@@ -0,0 +1,86 @@
+import logging
+import time
+
+# Backends are imported lazily so startup doesn't pay for torch/ctranslate2
+
+
+class OpenAIWhisperBackend:
+    """The reference openai-whisper implementation (PyTorch)."""
+
+    name = 'openai-whisper'
+    supports_batch = True
+
+    def __init__(self, model_name, threads=0, compute_type=None):
+        import whisper
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_name, device='cpu')
+
+    def transcribe(self, audio):
+        """Transcribe 16 kHz float32 audio, returning whisper's text/segments/language dict."""
+        return self.model.transcribe(audio, fp16=False)
+
+    def transcribe_batch(self, windows):
+        """Decode several audio windows of up to 30 seconds in one batched forward pass.
+
+        Returns a dict with text and language per window. Windows the model
+        considers silent come back with empty text, using the same no-speech
+        test as whisper.transcribe.
+        """
+        import torch
+        import whisper
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(window), self.model.dims.n_mels)
+            for window in windows
+        ]).to(self.model.device)
+        options = whisper.DecodingOptions(fp16=False, without_timestamps=True)
+        results = []
+        for result in whisper.decode(self.model, mels, options):
+            silent = result.no_speech_prob > 0.6 and result.avg_logprob < -1.0
+            results.append({'text': "" if silent else result.text, 'language': result.language})
+        return results
+
+
+class FasterWhisperBackend:
+    """faster-whisper (CTranslate2) with int8-quantized weights on the CPU.
+
+    Same models and output as openai-whisper, but usually several times
+    faster on CPUs and with a fraction of the memory.
+    """
+
+    name = 'faster-whisper'
+    supports_batch = False
+
+    def __init__(self, model_name, threads=0, compute_type='int8'):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_name, device='cpu', compute_type=compute_type, cpu_threads=threads)
+
+    def transcribe(self, audio):
+        """Transcribe 16 kHz float32 audio, returning a dict shaped like whisper's result."""
+        segments, info = self.model.transcribe(audio, beam_size=5)
+        segments = [
+            {'start': segment.start, 'end': segment.end, 'text': segment.text}
+            for segment in segments
+        ]
+        return {
+            'text': "".join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': info.language
+        }
+
+
+BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def load_backend(backend_name, model_name, threads=0, compute_type='int8'):
+    """Load a Whisper model with the named backend (a key of BACKENDS)."""
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown Whisper backend: {backend_name} (expected one of {', '.join(BACKENDS)})")
+    start_time = time.time()
+    backend = BACKENDS[backend_name](model_name, threads, compute_type)
+    logging.info(f"Loaded {backend_name} model '{model_name}' in {time.time() - start_time:.1f}s")
+    return backend
@@ -1,94 +1,323 @@
 import os
 import json
+import logging
 from datetime import datetime
 import time
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import yt_dlp
+import captions
+from state_store import VideoStateStore
+from spool import AudioSpool, SpoolFull
+from metrics import metrics
 from config import (
     YOUTUBE_API_KEY,
     PLAYLIST_ID,
-    PROCESSED_VIDEOS_FILE,
-    TRANSCRIPTS_DIR
+    PLAYLIST_IDS,
+    PLAYLIST_SYNC_MODE,
+    PLAYLIST_SYNC_FILE,
+    PLAYLIST_FULL_SYNC_INTERVAL,
+    AUDIO_FORMAT,
+    CAPTION_LANGUAGES,
+    CAPTION_ACCEPT_AUTO,
+    CAPTION_MIN_WORDS_PER_MINUTE,
+    CAPTION_MIN_COVERAGE,
+    TRANSCRIPTS_DIR,
+    AUDIO_SPOOL_DIR
 )
 
-class YouTubeMonitor:
-    def __init__(self):
-        self.youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
-        self.processed_videos = self._load_processed_videos()
-        
-        # Configure yt-dlp options with minimal settings
-        self.ydl_opts = {
+def build_ydl_opts(audio_format, output_dir=AUDIO_SPOOL_DIR):
+    """Build yt-dlp options for downloading audio in the given AUDIO_FORMAT mode."""
+    ydl_opts = {
+        'outtmpl': os.path.join(output_dir, '%(id)s.%(ext)s'),
+        'quiet': True,
+        'no_warnings': True,
+        'no_check_certificate': True,
+        'ignoreerrors': True,
+        'no_color': True,
+        'noprogress': True,
+        'noplaylist': True,
+        'hls_prefer_native': True,
+        'cachedir': False,
+        'rm_cachedir': True
+    }
+    if audio_format == 'mp3':
+        # Legacy path: re-encode every download to MP3
+        ydl_opts.update({
             'format': 'bestaudio/best',
             'postprocessors': [{
                 'key': 'FFmpegExtractAudio',
                 'preferredcodec': 'mp3',
                 'preferredquality': '192',
             }],
-            'outtmpl': os.path.join(TRANSCRIPTS_DIR, '%(id)s.%(ext)s'),
-            'quiet': True,
-            'no_warnings': True,
             'extract_audio': True,
-            'no_check_certificate': True,
-            'ignoreerrors': True,
-            'no_color': True,
-            'noprogress': True,
-            'noplaylist': True,
-            'prefer_ffmpeg': True,
-            'hls_prefer_native': True,
-            'cachedir': False,
-            'rm_cachedir': True
-        }
+            'prefer_ffmpeg': True
+        })
+    else:
+        # Keep the native stream (usually opus or m4a) and prefer the lowest
+        # bitrate that is still fine for speech; Whisper decodes it directly
+        ydl_opts.update({
+            'format': 'bestaudio[abr>=32]/bestaudio/best',
+            'format_sort': ['+abr']
+        })
+    return ydl_opts
 
-    def _load_processed_videos(self):
-        """Load the list of already processed videos."""
-        if os.path.exists(PROCESSED_VIDEOS_FILE):
-            with open(PROCESSED_VIDEOS_FILE, 'r') as f:
-                return json.load(f)
-        return []
+def downloaded_file(info):
+    """Return the path yt-dlp reports for a finished download (after post-processing), or None."""
+    for download in (info or {}).get('requested_downloads') or []:
+        path = download.get('filepath')
+        if path and os.path.exists(path):
+            return path
+    return None
 
-    def _save_processed_videos(self):
-        """Save the list of processed videos."""
-        with open(PROCESSED_VIDEOS_FILE, 'w') as f:
-            json.dump(self.processed_videos, f)
+def expected_download_size(info, audio_format):
+    """Estimate the bytes a download will put on disk from yt-dlp's format info, or 0 if unknown."""
+    formats = info.get('requested_formats') or [info]
+    size = sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in formats)
+    duration = info.get('duration') or 0
+    if not size and duration:
+        # No size reported: assume the stream's bitrate, or 128 kbps
+        size = int(duration * (info.get('abr') or info.get('tbr') or 128) * 1000 / 8)
+    if audio_format == 'mp3':
+        # The 192 kbps MP3 is written next to the original before that is deleted
+        size += int(duration * 192000 / 8)
+    return size
 
-    def get_playlist_videos(self):
-        """Get all videos from the configured playlist."""
-        videos = []
+class YouTubeMonitor:
+    # YouTube Data API quota cost of one playlistItems.list call
+    PLAYLIST_ITEMS_LIST_COST = 1
+
+    # Extensions a finished audio download can have, depending on AUDIO_FORMAT
+    # (formats without an audio-only stream come as .mp4)
+    AUDIO_EXTENSIONS = ('.opus', '.webm', '.m4a', '.ogg', '.mp3', '.mp4')
+
+    def __init__(self, playlist_ids=None):
+        # Use the discovery document bundled with the client library instead of fetching it
+        self.youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY, static_discovery=True, cache_discovery=False)
+        self.state = VideoStateStore()
+        self.playlist_ids = playlist_ids or PLAYLIST_IDS or [PLAYLIST_ID]
+        self.sync_states = {playlist_id: self._load_sync_state(playlist_id) for playlist_id in self.playlist_ids}
+        # The playlist being polled; the sync helpers below work on it
+        self.playlist_id = self.playlist_ids[0]
+        self.sync_state = self.sync_states[self.playlist_id]
+        
+        # Configure yt-dlp options with minimal settings
+        self.ydl_opts = build_ydl_opts(AUDIO_FORMAT)
+        # Audio is spooled apart from the transcript output; see AudioSpool for the budget
+        self.spool = AudioSpool()
+        # Video ID -> yt-dlp info from a caption lookup that fell back to Whisper, reused by the download
+        self._probed = {}
+
+    def _sync_file(self, playlist_id):
+        """Sync state file of a playlist; the first playlist keeps PLAYLIST_SYNC_FILE."""
+        if playlist_id == self.playlist_ids[0]:
+            return PLAYLIST_SYNC_FILE
+        root, ext = os.path.splitext(PLAYLIST_SYNC_FILE)
+        return f"{root}_{playlist_id}{ext}"
+
+    def _load_sync_state(self, playlist_id):
+        """Load the incremental playlist sync state (page ETags, cursor, pending videos)."""
+        sync_file = self._sync_file(playlist_id)
+        if os.path.exists(sync_file):
+            try:
+                with open(sync_file, 'r') as f:
+                    state = json.load(f)
+                if state.get('playlist_id') == playlist_id:
+                    return state
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable playlist sync state: {str(e)}")
+        return {'playlist_id': playlist_id, 'etags': {}, 'cursor': None, 'pending': {}, 'polls_since_full': None}
+
+    def _save_sync_state(self):
+        """Atomically persist the incremental playlist sync state."""
+        sync_file = self._sync_file(self.playlist_id)
+        tmp_path = f"{sync_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.sync_state, f)
+        os.replace(tmp_path, sync_file)
+
+    def _video_from_item(self, item):
+        """Convert a playlistItems resource into our video info dict."""
+        video_id = item['snippet']['resourceId']['videoId']
+        return {
+            'id': video_id,
+            'title': item['snippet']['title'],
+            'url': f'https://www.youtube.com/watch?v={video_id}',
+            'published_at': item['snippet']['publishedAt'],
+            'channel': item['snippet']['channelTitle'],
+            'playlist_id': self.playlist_id
+        }
+
+    def _fetch_page(self, page_token=None, conditional=True):
+        """Fetch one playlist page, returning (response, not_modified).
+
+        When we have an ETag for the page it is sent as If-None-Match, so an
+        unchanged page comes back as an empty 304.
+        """
         request = self.youtube.playlistItems().list(
             part="snippet",
-            playlistId=PLAYLIST_ID,
-            maxResults=50
+            playlistId=self.playlist_id,
+            maxResults=50,
+            pageToken=page_token
         )
+        etag = self.sync_state['etags'].get(page_token or '')
+        if conditional and etag:
+            request.headers['If-None-Match'] = etag
 
-        while request:
-            response = request.execute()
-            
-            for item in response['items']:
-                video_id = item['snippet']['resourceId']['videoId']
-                if video_id not in self.processed_videos:
-                    videos.append({
-                        'id': video_id,
-                        'title': item['snippet']['title'],
-                        'url': f'https://www.youtube.com/watch?v={video_id}',
-                        'published_at': item['snippet']['publishedAt'],
-                        'channel': item['snippet']['channelTitle']
-                    })
-            
-            request = self.youtube.playlistItems().list_next(request, response)
+        # playlistItems.list costs 1 unit; a 304 is counted too to stay conservative
+        self._poll_quota += self.PLAYLIST_ITEMS_LIST_COST
+        self._poll_pages += 1
+        metrics.inc('youtube_quota_units_total', self.PLAYLIST_ITEMS_LIST_COST)
+        try:
+            with metrics.timer('api_call_seconds', api='youtube', method='playlistItems.list'):
+                response = request.execute()
+        except HttpError as e:
+            if e.resp.status == 304:
+                self._poll_not_modified += 1
+                metrics.inc('api_calls_total', api='youtube', method='playlistItems.list', result='not_modified')
+                return None, True
+            metrics.inc('api_calls_total', api='youtube', method='playlistItems.list', result='error')
+            raise
+        metrics.inc('api_calls_total', api='youtube', method='playlistItems.list', result='success')
 
-        return videos
+        self.sync_state['etags'][page_token or ''] = response.get('etag')
+        return response, False
+
+    def _collect_new(self, response):
+        """Add unseen, unprocessed items of a page to the pending set; return how many were new."""
+        new_count = 0
+        pending = self.sync_state['pending']
+        for item in response['items']:
+            video = self._video_from_item(item)
+            if video['id'] in pending or self.state.is_processed(video['id']):
+                continue
+            pending[video['id']] = video
+            new_count += 1
+        return new_count
+
+    def _full_sync(self):
+        """Page through the whole playlist and rebuild the pending set."""
+        self.sync_state['pending'] = {}
+        self.sync_state['etags'] = {}
+        page_token = None
+        while True:
+            response, _ = self._fetch_page(page_token, conditional=False)
+            self._collect_new(response)
+            self.sync_state['cursor'] = page_token
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        self.sync_state['polls_since_full'] = 0
+
+    def _incremental_sync(self):
+        """Fetch only the parts of the playlist that can contain new items.
+
+        New items show up either at the top of the playlist or after the last
+        page we saw (the cursor), depending on the playlist's settings. Paging
+        from the top stops at the first page without new items, and the tail
+        is resumed from the cursor; unchanged pages return 304.
+        """
+        visited = set()
+
+        # Head: a 304 on the first page means nothing changed anywhere, since
+        # the page's ETag also covers the total item count
+        page_token = None
+        while True:
+            visited.add(page_token)
+            response, not_modified = self._fetch_page(page_token)
+            if not_modified:
+                return
+            new_count = self._collect_new(response)
+            next_token = response.get('nextPageToken')
+            if not next_token:
+                self.sync_state['cursor'] = page_token
+                return
+            if not new_count:
+                break
+            page_token = next_token
+
+        # Tail: resume from the last page seen and follow it to the end
+        page_token = self.sync_state.get('cursor')
+        if page_token in visited:
+            return
+        while True:
+            response, not_modified = self._fetch_page(page_token)
+            if not_modified:
+                return
+            self._collect_new(response)
+            self.sync_state['cursor'] = page_token
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return
+
+    def get_playlist_videos(self, mode=None, playlist_id=None):
+        """Get all unprocessed videos from a configured playlist (the first by default).
+
+        mode is 'incremental' or 'full' (defaults to PLAYLIST_SYNC_MODE). An
+        incremental poll falls back to a full sync when there is no saved
+        state yet and every PLAYLIST_FULL_SYNC_INTERVAL polls.
+        """
+        self.playlist_id = playlist_id or self.playlist_ids[0]
+        self.sync_state = self.sync_states[self.playlist_id]
+        mode = mode or PLAYLIST_SYNC_MODE
+        polls_since_full = self.sync_state.get('polls_since_full')
+        if mode != 'incremental' or polls_since_full is None or polls_since_full >= PLAYLIST_FULL_SYNC_INTERVAL:
+            mode = 'full'
+
+        self._poll_quota = 0
+        self._poll_pages = 0
+        self._poll_not_modified = 0
+
+        if mode == 'full':
+            self._full_sync()
+        else:
+            self._incremental_sync()
+            self.sync_state['polls_since_full'] += 1
+
+        # Drop anything that got processed since it was first seen
+        pending = self.sync_state['pending']
+        for video_id in [v for v in pending if self.state.is_processed(v)]:
+            del pending[video_id]
+        self._save_sync_state()
+
+        for video in pending.values():
+            video.setdefault('playlist_id', self.playlist_id)  # Saved before playlists were tracked
+
+        logging.info(
+            f"Playlist {self.playlist_id} poll ({mode}) used {self._poll_quota} quota units: "
+            f"{self._poll_pages} pages requested, {self._poll_not_modified} not modified, "
+            f"{len(pending)} unprocessed videos"
+        )
+        return list(pending.values())
+
+    def find_audio_file(self, video_id):
+        """Return the path of already downloaded audio for a video, or None."""
+        # Audio downloaded before the spool existed is still in TRANSCRIPTS_DIR
+        for directory in (self.spool.root, TRANSCRIPTS_DIR):
+            for ext in self.AUDIO_EXTENSIONS:
+                audio_path = os.path.join(directory, f'{video_id}{ext}')
+                if os.path.exists(audio_path):
+                    return audio_path
+        return None
+
+    def remove_audio(self, audio_path):
+        """Delete downloaded audio, freeing its spool space."""
+        self.spool.remove(audio_path)
 
     def get_video_audio_url(self, video_url, max_retries=3):
-        """Download video audio and return the path to the audio file."""
-        # Ensure transcripts directory exists
-        os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
-        
+        """Download video audio and return the path to the audio file.
+
+        The download is admitted to the audio spool with the size yt-dlp
+        reports before it starts, and may wait for space there.
+        """
         # Extract video ID from URL
         video_id = video_url.split('v=')[1]
-        audio_path = os.path.join(TRANSCRIPTS_DIR, f'{video_id}.mp3')
+        probed = self._probed.pop(video_id, None)
         
         # If file already exists, return it
-        if os.path.exists(audio_path):
+        audio_path = self.find_audio_file(video_id)
+        if audio_path:
+            self.spool.touch(audio_path)
             return audio_path
         
         retry_count = 0
@@ -97,20 +326,43 @@ class YouTubeMonitor:
         while retry_count < max_retries:
             try:
                 # Download the audio
+                start_time = time.time()
                 with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                    print(f"Downloading audio for video: {video_url}")
-                    ydl.download([video_url])
+                    # Resolve the format first, so its size is known before anything is written;
+                    # the first attempt reuses the info of the caption lookup, if there was one
+                    info = probed or ydl.extract_info(video_url, download=False)
+                    probed = None  # Retries resolve the formats afresh
+                    if not info:
+                        raise Exception("Could not get video info")
+                    expected = expected_download_size(info, AUDIO_FORMAT)
+                    with self.spool.admit(video_id, expected):
+                        print(f"Downloading audio for video: {video_url} (~{expected / (1024**2):.1f} MB)")
+                        start_time = time.time()
+                        result = ydl.process_ie_result(info, download=True)
+                        audio_path = downloaded_file(result) or self.find_audio_file(video_id)
+                        if audio_path:
+                            self.spool.add(audio_path)
                 
                 # Verify the file was created
-                if os.path.exists(audio_path):
-                    print(f"Successfully downloaded audio to: {audio_path}")
+                if audio_path:
+                    size = os.path.getsize(audio_path)
+                    elapsed = time.time() - start_time
+                    print(f"Successfully downloaded audio to: {audio_path} ({size / (1024**2):.1f} MB in {elapsed:.1f}s)")
+                    metrics.observe('download_seconds', elapsed)
+                    metrics.inc('download_bytes_total', size)
+                    metrics.inc('downloads_total', result='success')
                     return audio_path
                 else:
                     raise Exception("Download completed but file not found")
                     
+            except SpoolFull:
+                # Retrying right away wouldn't find space either; the video is retried later
+                metrics.inc('downloads_total', result='spool_full')
+                raise
             except Exception as e:
                 last_error = str(e)
                 retry_count += 1
+                metrics.inc('downloads_total', result='error')
                 
                 # Wait between retries with exponential backoff
                 wait_time = 5 * (2 ** (retry_count - 1))
@@ -120,12 +372,72 @@ class YouTubeMonitor:
         
         raise Exception(f"Error downloading video {video_url} after {max_retries} retries: {last_error}")
 
+    def get_video_captions(self, video_url):
+        """Fetch usable YouTube captions for a video.
+
+        Returns a dict with segments, language and source ('manual captions'
+        or 'auto captions'), or None when the video has no caption track that
+        passes the quality policy in config.
+        """
+        # Same options as the download, so the info resolves the same audio format and can be reused
+        opts = dict(self.ydl_opts, skip_download=True)
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(video_url, download=False)
+            if not info:
+                return None
+            # Kept for get_video_audio_url unless the captions are used
+            self._probed[info['id']] = info
+            track = captions.select_track(info, CAPTION_LANGUAGES, CAPTION_ACCEPT_AUTO)
+            if not track:
+                logging.info(f"No captions available for {video_url}")
+                metrics.inc('captions_total', result='missing')
+                return None
+            data = ydl.urlopen(track['url']).read().decode('utf-8')
+
+        segments = captions.parse_track(data, track['ext'])
+        acceptable, reason = captions.check_quality(
+            segments,
+            info.get('duration'),
+            track['kind'],
+            CAPTION_MIN_WORDS_PER_MINUTE,
+            CAPTION_MIN_COVERAGE
+        )
+        if not acceptable:
+            logging.info(f"Rejected {track['kind']} captions ({track['language']}) for {video_url}: {reason}")
+            metrics.inc('captions_total', result='rejected')
+            return None
+
+        self._probed.pop(info['id'], None)
+        logging.info(f"Using {reason} ({track['language']}) for {video_url}")
+        metrics.inc('captions_total', result=track['kind'])
+        return {
+            'segments': segments,
+            'language': track['language'],
+            'source': f"{track['kind']} captions"
+        }
+
     def mark_video_processed(self, video_id):
         """Mark a video as processed."""
-        if video_id not in self.processed_videos:
-            self.processed_videos.append(video_id)
-            self._save_processed_videos()
+        self.state.set_status(video_id, VideoStateStore.PUBLISHED)
+
+    def mark_video_status(self, video_id, status, error=None):
+        """Record a video's progress through the pipeline (see VideoStateStore)."""
+        self.state.set_status(video_id, status, error)
 
     def get_new_videos(self):
-        """Get all new videos that haven't been processed yet."""
-        return self.get_playlist_videos()
+        """Get all new videos that haven't been processed yet, from every configured playlist.
+
+        A playlist that fails to poll is skipped until the next call; the
+        error is raised only when every playlist failed.
+        """
+        videos = []
+        errors = []
+        for playlist_id in self.playlist_ids:
+            try:
+                videos.extend(self.get_playlist_videos(playlist_id=playlist_id))
+            except Exception as e:
+                logging.error(f"Error polling playlist {playlist_id}: {str(e)}")
+                errors.append(e)
+        if errors and len(errors) == len(self.playlist_ids):
+            raise errors[0]
+        return videos